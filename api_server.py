@@ -0,0 +1,151 @@
+"""
+HTTP API for background document processing
+
+    POST /jobs?ext=.pdf&crewai=1&name=a.pdf  (body: raw file bytes)  -> 202 {"job_id", "status"}
+    GET  /jobs/<job_id>                                              -> 200 job status and result
+    GET  /jobs/<job_id>/pages/<n>                                    -> 200 words and geometry of page n
+    GET  /health                                                     -> 200 queue statistics
+    GET  /metrics                                                    -> 200 Prometheus text metrics
+
+A full queue answers 429 with a Retry-After header. Job results carry page
+summaries only; a page's words and geometry are read from the OCR cache on
+request (404 once evicted or when caching is off). Extraction uses the
+server's own OPENAI_API_KEY.
+
+Usage:
+    python api_server.py --host 0.0.0.0 --port 8765
+"""
+
+import sys
+import json
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import metrics
+from job_queue import get_job_manager, QueueFullError
+from azure_settings import endpoint, key
+from lazy_imports import loaded, start_prewarm, mark_ready, startup_report
+from config import JOB_API_HOST, JOB_API_PORT, JOB_MAX_UPLOAD_BYTES, SUPPORTED_EXTENSIONS
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status_code, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"status": "error", "message": "Not found"})
+            return
+
+        params = parse_qs(url.query)
+        file_extension = params.get("ext", [""])[0].lower()
+        if file_extension and not file_extension.startswith("."):
+            file_extension = "." + file_extension
+        if file_extension not in SUPPORTED_EXTENSIONS:
+            self._send_json(400, {"status": "error", "message": f"Unsupported file extension '{file_extension}'"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            length = -1
+        if length <= 0:
+            self._send_json(400, {"status": "error", "message": "Missing or invalid Content-Length"})
+            return
+        if length > JOB_MAX_UPLOAD_BYTES:
+            self._send_json(413, {"status": "error",
+                                  "message": f"Upload exceeds the {JOB_MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"})
+            return
+        file_content = self.rfile.read(length)
+
+        enable_crewai = params.get("crewai", ["0"])[0].lower() in ("1", "true", "yes")
+        try:
+            job_id = get_job_manager().submit(file_content, file_extension, enable_crewai, params.get("name", [None])[0])
+        except QueueFullError as e:
+            self._send_json(429, {"status": "error", "message": str(e)}, headers={"Retry-After": "5"})
+            return
+
+        self._send_json(202, {"job_id": job_id, "status": "queued"}, headers={"Location": f"/jobs/{job_id}"})
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            endpoint_pool = loaded("endpoint_pool")
+            self._send_json(200, {"status": "ok", "queue": get_job_manager().stats(),
+                                  "endpoints": endpoint_pool.get_endpoint_pool().stats() if endpoint_pool else None,
+                                  "startup": startup_report()})
+            return
+
+        if path == "/metrics":
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        parts = path.split("/")
+        if len(parts) == 5 and parts[1] == "jobs" and parts[3] == "pages":
+            page = get_job_manager().page(parts[2], int(parts[4])) if parts[4].isdigit() else None
+            if page is None:
+                self._send_json(404, {"status": "error", "message": "Page not available"})
+            else:
+                self._send_json(200, page)
+            return
+
+        if path.startswith("/jobs/"):
+            job = get_job_manager().status(path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"status": "error", "message": "Unknown job id"})
+            else:
+                self._send_json(200, job)
+            return
+
+        self._send_json(404, {"status": "error", "message": "Not found"})
+
+    def log_request(self, code="-", size="-"):
+        # Status polling is frequent; only log submissions and errors
+        if self.command == "POST" or (isinstance(code, int) and code >= 400):
+            super().log_request(code, size)
+
+
+def serve(host=JOB_API_HOST, port=JOB_API_PORT):
+    """Start the workers and serve the API until interrupted"""
+    get_job_manager()
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.daemon_threads = True
+    print(f"✅ Job API listening on http://{host}:{port}")
+    mark_ready()
+    start_prewarm()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API for background document processing")
+    parser.add_argument("--host", default=JOB_API_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=JOB_API_PORT, help="Port to listen on")
+    args = parser.parse_args()
+
+    if not endpoint or not key:
+        print("❌ Please set AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT and AZURE_DOCUMENT_INTELLIGENCE_KEY in the .env file")
+        sys.exit(1)
+
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
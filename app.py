@@ -1,161 +1,171 @@
 import os
 import json
-import tempfile
+import time
+import uuid
 from pathlib import Path
 import streamlit as st
 from dotenv import load_dotenv
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import DocumentAnalysisFeature
-
-from PIL import Image
-import numpy as np
-import io
-from crewai_processor import process_with_crewai
-from config import PAGE_TITLE, PAGE_ICON, SHOW_SAMPLE_WORDS
+from azure_settings import endpoint, key
+from job_client import get_job_client, is_finished, QueueFullError
+from lazy_imports import lazy_import, loaded, start_prewarm, mark_ready, startup_report
+from result_store import get_result_store
+from config import (
+    PAGE_TITLE, PAGE_ICON, PREVIEW_MAX_PAGES, JOB_POLL_INTERVAL_SECONDS, RESULT_STORE_ENABLED
+)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Azure Document Intelligence client
-endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
-key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
+# Heavy modules (Azure SDK, CrewAI/LangChain, PyPDF2, PIL) are imported on first use
+ocr_processor = lazy_import("ocr_processor")
+crewai_processor = lazy_import("crewai_processor")
+preview = lazy_import("preview")
+# The session store (NumPy, msgpack) is loaded with a session's first result
+session_results = lazy_import("session_results")
+
+def get_session_result(session_id, name):
+    """A result stored for this session, or None (without loading the store before the first result)"""
+    if not st.session_state.get("has_results"):
+        return None
+    return session_results.get_session_results().get(session_id, name)
 
-# Ensure endpoint doesn't have trailing slash
-if endpoint and endpoint.endswith("/"):
-    endpoint = endpoint.rstrip("/")
+def store_session_result(session_id, name, value):
+    """Store a result for this session; clearing a session that has none doesn't load the store"""
+    if value is None and not st.session_state.get("has_results"):
+        return
+    st.session_state.has_results = True
+    session_results.get_session_results().put(session_id, name, value)
 
-def format_bounding_box(bounding_box):
-    """Format bounding box coordinates"""
-    if not bounding_box:
-        return "N/A"
-    reshaped_bounding_box = np.array(bounding_box).reshape(-1, 2)
-    return ", ".join(["[{}, {}]".format(x, y) for x, y in reshaped_bounding_box])
+def show_preview(placeholder, future, caption):
+    """
+    Display a background-rendered preview if it is ready
 
-def process_document(file_content, file_extension):
-    """Process the uploaded document using Azure Document Intelligence"""
+    Returns False (showing a placeholder) while it is still rendering; the
+    renderer caches it, so a later rerun displays it without waiting.
+    """
+    if not future.done():
+        placeholder.info("Rendering preview...")
+        return False
     try:
-        # Initialize client
-        document_analysis_client = DocumentIntelligenceClient(
-            endpoint=endpoint,
-            credential=AzureKeyCredential(key),
-            api_version="2024-11-30"
+        placeholder.image(future.result(), caption=caption, use_container_width=True)
+    except Exception as e:
+        placeholder.warning(f"Could not generate preview: {str(e)}")
+    return True
+
+def show_ocr_result(result):
+    """Display a finished OCR result"""
+    # Display document info
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Document Type", result["document_type"])
+    with col2:
+        st.metric("Total Pages", len(result["pages"]))
+
+    # Display image preprocessing savings
+    if result.get("preprocessing") and result["preprocessing"]["applied"]:
+        prep = result["preprocessing"]
+        st.caption(
+            f"Image preprocessed for upload: {prep['original_bytes'] / 1024:.0f} KB → "
+            f"{prep['processed_bytes'] / 1024:.0f} KB in {prep['seconds']:.2f}s"
         )
-        
-        # Debug: Log the request
-        print(f"Endpoint: {endpoint}")
-        print(f"File size: {len(file_content)} bytes")
-        
-        # Start analysis with file stream
-        poller = document_analysis_client.begin_analyze_document(
-            model_id="prebuilt-read",
-            body=file_content,
-            features=[DocumentAnalysisFeature.BARCODES]  # Enable QR/barcode extraction
+
+    # Display pages re-analyzed by confidence-based routing
+    if result.get("routing"):
+        routing = result["routing"]
+        replaced = [page for page in routing["pages"] if page["replaced"]]
+        st.caption(
+            f"Re-analyzed {len(routing['pages'])} low-confidence pages with {routing['model']} "
+            f"({', '.join(routing['features'])}); improved: "
+            + (", ".join(f"page {page['page_number']} ({page['reason']})" for page in replaced) or "none")
         )
-        result = poller.result()
-        
-        # Extract full document content
-        full_content = result.content if hasattr(result, 'content') else ""
-        
-        # Extract detailed text content with page information
-        extracted_text = ""
-        pages_data = []
-        
-        for page in result.pages:
-            page_info = {
-                "page_number": page.page_number,
-                "width": page.width,
-                "height": page.height,
-                "unit": page.unit,
-                "lines": [],
-                "words": []
-            }
-            
-            extracted_text += f"\n--- Page {page.page_number} ---\n"
-            
-            # Extract lines
-            for line in page.lines:
-                extracted_text += f"{line.content}\n"
-                page_info["lines"].append({
-                    "content": line.content,
-                    "bounding_box": format_bounding_box(line.polygon)
-                })
-            
-            # Extract words with confidence
-            for word in page.words:
-                page_info["words"].append({
-                    "content": word.content,
-                    "confidence": word.confidence
-                })
-            
-            pages_data.append(page_info)
-        
-        # Extract styles (handwritten detection)
-        styles_info = []
-        if hasattr(result, 'styles') and result.styles:
-            for style in result.styles:
-                styles_info.append({
-                    "is_handwritten": style.is_handwritten if hasattr(style, 'is_handwritten') else False
-                })
-        
-        # Extract barcodes and QR codes from Azure
-        barcodes_info = []
-        if hasattr(result, 'barcodes') and result.barcodes:
-            for barcode in result.barcodes:
-                barcodes_info.append({
-                    "type": barcode.kind if hasattr(barcode, 'kind') else "Unknown",
-                    "value": barcode.value if hasattr(barcode, 'value') else None,
-                    "confidence": barcode.confidence if hasattr(barcode, 'confidence') else None,
-                    "bounding_box": format_bounding_box(barcode.polygon) if hasattr(barcode, 'polygon') else None,
-                    "source": "azure"
-                })
-        
-        # Extract key-value pairs
-        key_value_pairs = []
-        if hasattr(result, 'key_value_pairs') and result.key_value_pairs:
-            for kv_pair in result.key_value_pairs:
-                key_content = kv_pair.key.content if kv_pair.key else None
-                value_content = kv_pair.value.content if kv_pair.value else None
-                key_value_pairs.append({
-                    "key": key_content,
-                    "value": value_content,
-                    "confidence": kv_pair.confidence if hasattr(kv_pair, 'confidence') else None
-                })
-        
-        return {
-            "status": "success",
-            "full_content": full_content,
-            "text": extracted_text,
-            "pages": pages_data,
-            "styles": styles_info,
-            "barcodes": barcodes_info,
-            "key_value_pairs": key_value_pairs,
-            "document_type": file_extension.upper(),
-            "raw_result": result
-        }
-    
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
 
-def save_uploaded_file(uploaded_file):
-    """Save uploaded file to a temporary location"""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded_file.name).suffix) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            return tmp_file.name
-    except Exception as e:
-        st.error(f"Error saving file: {e}")
-        return None
+    # Display styles/handwriting detection
+    if result["styles"]:
+        has_handwriting = any(s["is_handwritten"] for s in result["styles"])
+        st.info(f"Document contains {'handwritten' if has_handwriting else 'no handwritten'} content")
+
+    # Display key-value pairs
+    if result.get("key_value_pairs"):
+        st.subheader("🔑 Key-Value Pairs")
+        kv_df_data = []
+        for kv in result["key_value_pairs"]:
+            kv_df_data.append({
+                "Key": kv["key"],
+                "Value": kv["value"],
+                "Confidence": f"{kv['confidence']:.2%}" if kv['confidence'] else "N/A"
+            })
+        if kv_df_data:
+            st.dataframe(kv_df_data, use_container_width=True)
+
+    # Display barcodes and QR codes
+    if result.get("barcodes"):
+        st.subheader("📊 Barcodes & QR Codes")
+        for barcode in result["barcodes"]:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write(f"**Type:** {barcode['type']}")
+            with col2:
+                source = barcode.get('source', 'unknown')
+                st.write(f"**Source:** {source}")
+
+            # Display value or data (depending on source)
+            if barcode.get('data'):
+                st.write(f"**Data:** `{barcode['data']}`")
+            elif barcode.get('value'):
+                st.write(f"**Value:** `{barcode['value']}`")
+
+            # Display confidence if available
+            if barcode.get('confidence'):
+                st.write(f"**Confidence:** {barcode['confidence']:.2%}")
+
+            # Display location if available
+            if barcode.get('polygon'):
+                st.write(f"**Location:** {ocr_processor.format_bounding_box(barcode['polygon'])}")
+
+            st.divider()
+
+    # Display extracted text in dropdown
+    with st.expander("📝 Raw Extracted Text"):
+        st.text_area("", value=result["text"], height=300, key="extracted_text", disabled=True)
+
+def show_progress(progress):
+    """Display the partial results of a running job: pages read so far, then the streamed extraction"""
+    if progress["stage"] == "ocr":
+        if progress["pages"]:
+            st.caption(f"📄 {len(progress['pages'])} pages read so far")
+            with st.expander("📝 Text Extracted So Far"):
+                for page in progress["pages"]:
+                    st.markdown(f"**Page {page['page_number']}**")
+                    st.text(page["text"])
+        return
+
+    show_ocr_result(progress["ocr_result"])
+    st.divider()
+    st.subheader("🤖 CrewAI Analysis Results")
+    llm_output = progress.get("llm_output") or ""
+    partial = crewai_processor.parse_partial_json(llm_output)
+    if partial:
+        st.json(partial)
+    else:
+        st.caption("Waiting for the first extracted fields...")
+    if llm_output:
+        with st.expander("Raw LLM Output (streaming)"):
+            st.code(llm_output[-2000:])
 
 def main():
     st.set_page_config(page_title=PAGE_TITLE, page_icon=PAGE_ICON, layout="wide")
     st.title(f"{PAGE_ICON} {PAGE_TITLE}")
+    # Load the pipeline and build its clients in the background, so the first document isn't slow
+    start_prewarm()
     
-    # Initialize session state
-    if 'ocr_result' not in st.session_state:
-        st.session_state.ocr_result = None
-    if 'crew_result' not in st.session_state:
-        st.session_state.crew_result = None
+    # Initialize session state; results live in the shared, memory-bounded session result store
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    session_id = st.session_state.session_id
+    if 'job_id' not in st.session_state:
+        st.session_state.job_id = None
+    if 'timings' not in st.session_state:
+        st.session_state.timings = None
     if 'openai_api_key' not in st.session_state:
         st.session_state.openai_api_key = os.getenv('OPENAI_API_KEY', '')
     
@@ -181,6 +191,81 @@ def main():
         
         st.divider()
         st.subheader("Options")
+        
+        # Statistics of modules that are loaded already (showing them must not load the pipeline)
+        ocr_module, crewai_module, polling_module = loaded("ocr_processor"), loaded("crewai_processor"), loaded("lro_polling")
+        caches = (("OCR cache", ocr_module and ocr_module.get_ocr_cache()),
+                  ("LLM cache", crewai_module and crewai_module.get_llm_cache()))
+        for cache_name, cache in caches:
+            if cache:
+                cache_stats = cache.stats()
+                st.caption(
+                    f"{cache_name}: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                    f"({cache_stats['hit_rate']:.0%} hit rate), "
+                    f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1024 / 1024:.1f} MB)"
+                )
+        
+        extraction_stats = crewai_module.tier_stats() if crewai_module else {"documents": 0}
+        if extraction_stats["documents"]:
+            st.caption(
+                f"Rule-based extraction: {extraction_stats['rules_only']}/{extraction_stats['documents']} "
+                f"documents skipped the LLM ({extraction_stats['llm_skip_rate']:.0%})"
+            )
+        
+        preprocessing_module = loaded("image_preprocessing")
+        preprocessing = preprocessing_module.preprocessing_totals() if preprocessing_module else {"images": 0}
+        if preprocessing["images"]:
+            st.caption(
+                f"Image preprocessing: {preprocessing['preprocessed']}/{preprocessing['images']} images re-encoded, "
+                f"{preprocessing['bytes_saved'] / 1024 / 1024:.1f} MB saved in {preprocessing['seconds']:.1f}s"
+            )
+        
+        polling = polling_module.polling_report() if polling_module else {"operations": 0}
+        if polling["operations"]:
+            st.caption(
+                f"Azure polling: {polling['polls_per_operation']:.1f} status checks per document, "
+                f"{polling['idle_seconds']:.1f}s idle vs {polling['server_seconds']:.1f}s processing "
+                f"({polling['idle_share']:.0%} lost to polling)"
+            )
+        
+        startup = startup_report()
+        if startup["ready_seconds"] is not None:
+            loaded_modules = ", ".join(f"{m['module']} {m['seconds']:.1f}s" for m in startup["modules"]) or "none yet"
+            st.caption(f"Startup: first page in {startup['ready_seconds']:.1f}s; loaded on demand: {loaded_modules}; "
+                       f"pre-warm {startup['prewarm']['state']}")
+        
+        show_timings = st.checkbox("Show timing breakdown", value=False, help="Time spent per pipeline stage for the last document")
+        
+        session_module = loaded("session_results")
+        if session_module:
+            session_store = session_module.get_session_results()
+            session_usage = session_store.usage(session_id)
+            process_usage = session_store.stats()
+            st.caption(
+                f"Session memory: {session_usage['memory_bytes'] / 1024:.0f} KB in memory, "
+                f"{session_usage['disk_bytes'] / 1024:.0f} KB spilled to disk "
+                f"(all {process_usage['sessions']} sessions: {process_usage['memory_bytes'] / 1024 / 1024:.1f} / "
+                f"{process_usage['budget_bytes'] / 1024 / 1024:.0f} MB)"
+            )
+        
+        # Search documents processed earlier (by this app, the job API or batch runs)
+        if RESULT_STORE_ENABLED:
+            st.divider()
+            st.subheader("🔎 Search Processed Documents")
+            store = get_result_store()
+            store_stats = store.stats()
+            st.caption(f"{store_stats['documents']} documents, {store_stats['pages']} pages stored")
+            search_query = st.text_input("Text, field value or barcode", value="")
+            if search_query:
+                matches = store.find_by_field(search_query)
+                for match in matches:
+                    st.markdown(f"**{match['source'] or match['document_id']}** — {match['field']}: `{match['value']}`")
+                hits = store.search(search_query, limit=10)
+                for hit in hits:
+                    st.markdown(f"**{hit['source'] or hit['document_id']}**, page {hit['page_number']}")
+                    st.caption(hit["snippet"])
+                if not matches and not hits:
+                    st.info("No stored documents match")
     
     # Top section with toggle
     col1, col2 = st.columns([3, 1])
@@ -197,160 +282,135 @@ def main():
         type=["pdf", "png", "jpg", "jpeg"]
     )
     
+    pending_previews = []
     if uploaded_file is not None:
         # Display file info
         file_extension = Path(uploaded_file.name).suffix.lower()
         st.write(f"**File uploaded:** {uploaded_file.name}")
         
-        # Display the file if it's an image (at half size)
-        if file_extension in ['.png', '.jpg', '.jpeg']:
-            col1, col2 = st.columns([1, 1])
-            with col1:
-                # Reset file pointer to beginning to ensure image loads correctly
-                uploaded_file.seek(0)
-                image = Image.open(uploaded_file)
-                st.image(image, caption="Uploaded Image", use_container_width=True)
-        
-        # Display PDF preview (first page)
-        elif file_extension == '.pdf':
-            col1, col2 = st.columns([1, 1])
-            with col1:
-                try:
-                    from pdf2image import convert_from_bytes
-                    uploaded_file.seek(0)
-                    pdf_images = convert_from_bytes(uploaded_file.read(), first_page=1, last_page=1)
-                    if pdf_images:
-                        st.image(pdf_images[0], caption="PDF Preview (Page 1)", use_container_width=True)
-                except Exception as e:
-                    st.warning(f"Could not generate PDF preview: {str(e)}")
+        # Request the preview; it renders in the background and is cached by content hash,
+        # so reruns (e.g. toggling options) don't re-rasterize the document
+        renderer = preview.get_preview_renderer()
+        file_bytes = uploaded_file.getvalue()
+        content_key = renderer.content_key(file_bytes)
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            caption = "PDF Preview (Page 1)" if file_extension == '.pdf' else "Uploaded Image"
+            pending_previews.append((st.empty(), renderer.request(file_bytes, file_extension, 1, content_key), caption))
+            
+            # Further PDF pages are only rendered when asked for
+            if file_extension == '.pdf':
+                page_count = renderer.page_count(file_bytes, file_extension, content_key)
+                if page_count > 1 and st.checkbox(f"Show page thumbnails ({page_count} pages)"):
+                    thumb_cols = st.columns(4)
+                    for page_number in range(2, min(page_count, PREVIEW_MAX_PAGES) + 1):
+                        with thumb_cols[(page_number - 2) % 4]:
+                            pending_previews.append((
+                                st.empty(),
+                                renderer.request(file_bytes, file_extension, page_number, content_key),
+                                f"Page {page_number}"
+                            ))
         
-        # Process the document when the user clicks the button
+        # Queue the document when the user clicks the button; workers process it in the background
         if st.button("Process Document"):
-            with st.spinner("Processing document..."):
-                # Save the uploaded file temporarily
-                temp_file_path = save_uploaded_file(uploaded_file)
-                
-                if temp_file_path:
-                    try:
-                        # Read the file content
-                        with open(temp_file_path, "rb") as f:
-                            file_content = f.read()
-                        
-                        # Process the document
-                        result = process_document(file_content, file_extension)
-                        
-                        # Store in session state
-                        st.session_state.ocr_result = result
-                        
-                        if result["status"] == "success":
-                            st.success("✅ OCR Processing Complete!")
-                            
-                            # If CrewAI is enabled, process automatically
-                            if enable_crewai:
-                                st.info("🤖 Running CrewAI analysis...")
-                                try:
-                                    crew_result = process_with_crewai(result)
-                                    st.session_state.crew_result = crew_result
-                                except Exception as e:
-                                    st.error(f"CrewAI processing error: {str(e)}")
-                                    st.session_state.crew_result = None
-                            
-                            # Display document info
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric("Document Type", result["document_type"])
-                            with col2:
-                                st.metric("Total Pages", len(result["pages"]))
-                            
-                            # Display styles/handwriting detection
-                            if result["styles"]:
-                                has_handwriting = any(s["is_handwritten"] for s in result["styles"])
-                                st.info(f"Document contains {'handwritten' if has_handwriting else 'no handwritten'} content")
-                            
-                            # Display key-value pairs
-                            if result.get("key_value_pairs"):
-                                st.subheader("🔑 Key-Value Pairs")
-                                kv_df_data = []
-                                for kv in result["key_value_pairs"]:
-                                    kv_df_data.append({
-                                        "Key": kv["key"],
-                                        "Value": kv["value"],
-                                        "Confidence": f"{kv['confidence']:.2%}" if kv['confidence'] else "N/A"
-                                    })
-                                if kv_df_data:
-                                    st.dataframe(kv_df_data, use_container_width=True)
-                            
-                            # Display barcodes and QR codes
-                            if result.get("barcodes"):
-                                st.subheader("📊 Barcodes & QR Codes")
-                                for barcode in result["barcodes"]:
-                                    col1, col2 = st.columns(2)
-                                    with col1:
-                                        st.write(f"**Type:** {barcode['type']}")
-                                    with col2:
-                                        source = barcode.get('source', 'unknown')
-                                        st.write(f"**Source:** {source}")
-                                    
-                                    # Display value or data (depending on source)
-                                    if barcode.get('data'):
-                                        st.write(f"**Data:** `{barcode['data']}`")
-                                    elif barcode.get('value'):
-                                        st.write(f"**Value:** `{barcode['value']}`")
-                                    
-                                    # Display confidence if available
-                                    if barcode.get('confidence'):
-                                        st.write(f"**Confidence:** {barcode['confidence']:.2%}")
-                                    
-                                    # Display location if available
-                                    if barcode.get('bounding_box'):
-                                        st.write(f"**Location:** {barcode['bounding_box']}")
-                                    
-                                    st.divider()
-                            
-                            # Display extracted text in dropdown
-                            with st.expander("📝 Raw Extracted Text"):
-                                st.text_area("", value=result["text"], height=300, key="extracted_text", disabled=True)
-                            
-                            
-                        else:
-                            st.error(f"Error processing document: {result.get('message', 'Unknown error')}")
-                    
-                    except Exception as e:
-                        st.error(f"An error occurred: {str(e)}")
-                    
-                    finally:
-                        # Clean up the temporary file
-                        try:
-                            os.unlink(temp_file_path)
-                        except:
-                            pass
+            try:
+                st.session_state.job_id = get_job_client().submit(
+                    file_bytes, file_extension, enable_crewai, uploaded_file.name
+                )
+                store_session_result(session_id, "ocr_result", None)
+                store_session_result(session_id, "crew_result", None)
+                st.session_state.timings = None
+            except QueueFullError as e:
+                st.warning(f"⏳ {str(e)}")
+            except Exception as e:
+                st.error(f"Could not submit document: {str(e)}")
+    
+    # Check on the submitted job; while it runs the page reruns every poll interval
+    job_running = False
+    if st.session_state.job_id:
+        job = get_job_client().status(st.session_state.job_id)
+        if job is None:
+            st.session_state.job_id = None
+            st.warning("The processing job is no longer available, please process the document again")
+        elif is_finished(job):
+            st.session_state.job_id = None
+            if job["status"] == "succeeded":
+                store_session_result(session_id, "ocr_result", job["result"]["ocr_result"])
+                store_session_result(session_id, "crew_result", job["result"]["crew_result"])
+                st.session_state.timings = job["result"].get("timings")
+            else:
+                store_session_result(session_id, "ocr_result", {"status": "error", "message": job.get("message") or "Unknown error"})
+        else:
+            job_running = True
+            if job["status"] == "queued":
+                st.info("⏳ Document queued, waiting for a worker...")
+            elif job["enable_crewai"]:
+                st.info("🤖 Running OCR and CrewAI analysis...")
+            else:
+                st.info("Processing document...")
+            if job.get("progress"):
+                show_progress(job["progress"])
     
-    # Display crew results if they exist in session state
-    if st.session_state.crew_result is not None:
-        if st.session_state.crew_result.get("status") == "success":
+    # Display OCR results if they exist for this session
+    result = get_session_result(session_id, "ocr_result")
+    if result is not None:
+        if result["status"] == "success":
+            if result.get("cached"):
+                st.success("✅ OCR Processing Complete! (cached result)")
+            elif result.get("reused_pages"):
+                st.success(
+                    f"✅ OCR Processing Complete! ({result['reused_pages']} of {len(result['pages'])} "
+                    "pages unchanged from an earlier upload)"
+                )
+            else:
+                st.success("✅ OCR Processing Complete!")
+            show_ocr_result(result)
+        else:
+            st.error(f"Error processing document: {result.get('message', 'Unknown error')}")
+    
+    # Display crew results if they exist for this session
+    crew_result = get_session_result(session_id, "crew_result")
+    if crew_result is not None:
+        if crew_result.get("status") == "success":
             st.divider()
             st.subheader("🤖 CrewAI Analysis Results")
+            if crew_result.get("source") == "rules":
+                st.caption("⚡ Extracted with deterministic rules (CrewAI skipped)")
             
-            crew_output = st.session_state.crew_result.get("result", "")
+            crew_output = crew_result.get("result", "")
             
             # Try to parse and display as JSON
             try:
-                # Extract JSON from the output if it contains markdown code blocks
-                if "```json" in str(crew_output):
-                    json_str = str(crew_output).split("```json")[1].split("```")[0].strip()
-                elif "```" in str(crew_output):
-                    json_str = str(crew_output).split("```")[1].split("```")[0].strip()
-                else:
-                    json_str = str(crew_output)
-                
-                parsed_json = json.loads(json_str)
+                # Extract JSON from the output (with or without markdown code blocks)
+                parsed_json = crewai_processor.parse_json_output(crew_output)
                 st.json(parsed_json)
             except (json.JSONDecodeError, IndexError):
                 # If JSON parsing fails, display as text
                 st.code(crew_output, language="json")
         else:
-            st.error(f"❌ CrewAI processing failed: {st.session_state.crew_result.get('message', 'Unknown error')}")
+            st.error(f"❌ CrewAI processing failed: {crew_result.get('message', 'Unknown error')}")
             st.info("Make sure you have set the OPENAI_API_KEY in your .env file.")
+    
+    # Display the per-stage timing breakdown of the last document
+    if show_timings and st.session_state.timings:
+        st.divider()
+        st.subheader("⏱️ Timing Breakdown")
+        st.dataframe(
+            [{"Stage": t["stage"], "Seconds": t["seconds"], "Calls": t["calls"]} for t in st.session_state.timings],
+            use_container_width=True
+        )
+        st.caption("Stages running in parallel (e.g. PDF page ranges) add up to more than the elapsed time")
+    
+    # Fill in previews last; those still rendering are picked up by the next rerun
+    previews_rendering = False
+    for placeholder, future, caption in pending_previews:
+        if not show_preview(placeholder, future, caption):
+            previews_rendering = True
+    
+    mark_ready()
+    if job_running or previews_rendering:
+        time.sleep(JOB_POLL_INTERVAL_SECONDS)
+        st.rerun()
 
 if __name__ == "__main__":
     if not endpoint or not key:
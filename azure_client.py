@@ -0,0 +1,279 @@
+"""
+Shared Azure Document Intelligence client
+One long-lived client per endpoint and process, with connection reuse, adaptive
+rate limiting, Retry-After aware retries and a circuit breaker
+"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.core.pipeline.policies import HTTPPolicy
+from azure.core.pipeline.transport import RequestsTransport
+from azure.ai.documentintelligence import DocumentIntelligenceClient
+import metrics
+from azure_settings import endpoint, key
+from config import (
+    AZURE_DI_API_VERSION,
+    AZURE_DI_MAX_CONNECTIONS,
+    AZURE_DI_RATE_LIMIT_TPS,
+    AZURE_DI_MIN_RATE_TPS,
+    AZURE_DI_MAX_RETRIES,
+    AZURE_DI_RETRY_BACKOFF_SECONDS,
+    AZURE_DI_RETRY_BACKOFF_MAX_SECONDS,
+    AZURE_DI_REQUEST_DEADLINE_SECONDS,
+    AZURE_DI_CIRCUIT_FAILURE_THRESHOLD,
+    AZURE_DI_CIRCUIT_RESET_SECONDS
+)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the endpoint is considered degraded"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with additive-increase/multiplicative-decrease rate control
+
+    The rate is halved whenever the service throttles us and recovers slowly on
+    success. A Retry-After from the service pauses every caller until it expires.
+    """
+
+    def __init__(self, rate, min_rate=1.0, capacity=None):
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, deadline=None, consume=True):
+        """
+        Block until a token is available (or only until any pause has expired if consume is False)
+
+        Raises:
+            TimeoutError: If the wait would go past deadline (a time.monotonic() value)
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and (not consume or self._tokens >= 1):
+                    if consume:
+                        self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate if consume else 0)
+
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise TimeoutError("Rate limiter wait exceeds the request deadline")
+            time.sleep(wait)
+
+    def pause_remaining(self):
+        """Seconds until a Retry-After pause expires (0 when not paused)"""
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def throttled(self, retry_after=None):
+        """Record a throttling response: halve the rate and honour Retry-After for all callers"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        """Record a successful response: recover the rate additively"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate)
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated consecutive failures
+
+    After failure_threshold consecutive failures the circuit opens and requests
+    raise CircuitOpenError for reset_seconds. A single probe request is then let
+    through; success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    raise CircuitOpenError("Azure Document Intelligence endpoint is degraded; failing fast")
+                self.state = "half_open"
+            elif self.state == "half_open":
+                raise CircuitOpenError("Azure Document Intelligence endpoint is being probed; failing fast")
+
+    def allows_request(self):
+        """Whether a request would be let through now (closed, or open long enough to be probed)"""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self._opened_at >= self.reset_seconds
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+def parse_retry_after(headers):
+    """Return the server-requested delay in seconds from Retry-After style headers, or None"""
+    for header, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("Retry-After", 1)):
+        value = headers.get(header)
+        if not value:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+class AdaptiveRetryPolicy(HTTPPolicy):
+    """
+    Pipeline policy replacing the SDK's default retries
+
+    Every attempt passes the circuit breaker and the shared token bucket
+    (analyze POSTs consume a token, polling GETs only respect throttling
+    pauses). 429/5xx responses and connection errors are retried with full
+    jitter exponential backoff, never sooner than Retry-After, until
+    max_retries or the per-request deadline is reached.
+    """
+
+    def __init__(self, rate_limiter, circuit_breaker, max_retries=AZURE_DI_MAX_RETRIES,
+                 backoff_seconds=AZURE_DI_RETRY_BACKOFF_SECONDS,
+                 backoff_max_seconds=AZURE_DI_RETRY_BACKOFF_MAX_SECONDS,
+                 deadline_seconds=AZURE_DI_REQUEST_DEADLINE_SECONDS):
+        super().__init__()
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.deadline_seconds = deadline_seconds
+        self.retries = 0
+
+    def _backoff(self, attempt, retry_after):
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_seconds * (2 ** attempt)))
+        return max(delay, retry_after or 0)
+
+    def send(self, request):
+        deadline = time.monotonic() + self.deadline_seconds
+        is_analyze = request.http_request.method == "POST"
+        attempt = 0
+
+        while True:
+            self.rate_limiter.acquire(deadline=deadline, consume=is_analyze)
+            self.circuit_breaker.before_request()
+
+            try:
+                response = self.next.send(request)
+            except (ServiceRequestError, ServiceResponseError):
+                self.circuit_breaker.record_failure()
+                retry_reason = "connection"
+                delay = self._backoff(attempt, None)
+                if attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    raise
+            except Exception:
+                self.circuit_breaker.record_failure()
+                raise
+            else:
+                status = response.http_response.status_code
+                if status not in RETRYABLE_STATUS_CODES:
+                    self.circuit_breaker.record_success()
+                    self.rate_limiter.succeeded()
+                    return response
+
+                retry_reason = str(status)
+                retry_after = parse_retry_after(response.http_response.headers)
+                if status in (429, 503):
+                    self.rate_limiter.throttled(retry_after)
+                if status == 429:
+                    # Throttled, but the endpoint itself is healthy
+                    self.circuit_breaker.record_success()
+                else:
+                    self.circuit_breaker.record_failure()
+
+                delay = self._backoff(attempt, retry_after)
+                if attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    # Hand the error response back; the SDK raises HttpResponseError for it
+                    return response
+
+            attempt += 1
+            self.retries += 1
+            metrics.increment("azure_retries_total", method=request.http_request.method, reason=retry_reason)
+            print(f"Retrying {request.http_request.method} request (attempt {attempt}) in {delay:.2f}s")
+            time.sleep(delay)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(client_endpoint=None, client_key=None):
+    """
+    Return the long-lived DocumentIntelligenceClient for an endpoint
+
+    Clients are created once per endpoint and process and reuse a pooled
+    HTTP session, so repeated analyses skip the TLS handshake.
+    """
+    client_endpoint = (client_endpoint or endpoint).rstrip("/")
+    client_key = client_key or key
+
+    with _clients_lock:
+        client = _clients.get(client_endpoint)
+        if client is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=AZURE_DI_MAX_CONNECTIONS,
+                pool_maxsize=AZURE_DI_MAX_CONNECTIONS
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            retry_policy = AdaptiveRetryPolicy(
+                TokenBucket(AZURE_DI_RATE_LIMIT_TPS, min_rate=AZURE_DI_MIN_RATE_TPS),
+                CircuitBreaker(AZURE_DI_CIRCUIT_FAILURE_THRESHOLD, AZURE_DI_CIRCUIT_RESET_SECONDS)
+            )
+            client = DocumentIntelligenceClient(
+                endpoint=client_endpoint,
+                credential=AzureKeyCredential(client_key),
+                api_version=AZURE_DI_API_VERSION,
+                transport=RequestsTransport(session=session, session_owner=False),
+                retry_policy=retry_policy
+            )
+            client.adaptive_retry_policy = retry_policy
+            _clients[client_endpoint] = client
+
+    return client
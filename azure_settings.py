@@ -0,0 +1,49 @@
+"""
+Document Intelligence endpoint and key settings from the environment
+Kept free of Azure SDK imports, so credentials can be checked before the SDK is loaded
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Azure Document Intelligence credentials
+endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
+key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
+
+# Ensure endpoint doesn't have trailing slash
+if endpoint and endpoint.endswith("/"):
+    endpoint = endpoint.rstrip("/")
+
+
+def parse_endpoints():
+    """
+    (endpoint, key) pairs of every configured Document Intelligence resource
+
+    AZURE_DOCUMENT_INTELLIGENCE_ENDPOINTS lists several resources (comma
+    separated) with one key each, or a single key shared by all, in
+    AZURE_DOCUMENT_INTELLIGENCE_KEYS. Without it the single endpoint/key
+    pair is used.
+    """
+    urls = [url.strip().rstrip("/") for url in os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINTS", "").split(",")]
+    urls = [url for url in urls if url]
+    if not urls:
+        return [(endpoint, key)] if endpoint and key else []
+
+    keys = [k.strip() for k in os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEYS", "").split(",") if k.strip()]
+    if not keys and key:
+        keys = [key]
+    if len(keys) == 1:
+        keys = keys * len(urls)
+    if len(keys) != len(urls):
+        raise ValueError("AZURE_DOCUMENT_INTELLIGENCE_KEYS needs one key, or one key per endpoint")
+    return list(zip(urls, keys))
+
+
+endpoints = parse_endpoints()
+
+# With only the endpoint list configured, the first resource stands in for the single endpoint
+if endpoints and not (endpoint and key):
+    endpoint, key = endpoints[0]
@@ -0,0 +1,227 @@
+"""
+Non-interactive batch processing of document directories
+Runs many Azure analyses concurrently, streams results as NDJSON and resumes from a checkpoint
+
+Usage:
+    python batch_processor.py documents/ --output results.ndjson --workers 8 --crewai
+    python batch_processor.py manifest.txt --output results.ndjson --store
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ocr_processor import process_document, to_cacheable, endpoint, key
+from crewai_processor import get_extraction_batcher, extraction_data
+from result_store import get_result_store, document_key
+from config import BATCH_MAX_CONCURRENCY, SUPPORTED_EXTENSIONS, RESULT_STORE_BATCH_SIZE
+
+
+def iter_input_files(source):
+    """
+    Yield document paths from a directory (recursively) or a manifest file
+
+    A manifest is either a text file with one path per line or an NDJSON
+    file whose records have a "path" field. Relative paths are resolved
+    against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    yield os.path.join(root, name)
+        return
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            yield path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def load_checkpoint(checkpoint_path):
+    """Return the set of paths already completed by a previous run"""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def process_file(file_path, enable_crewai=False, full_result=False):
+    """
+    Run OCR (and optionally extraction: rules first, then CrewAI) on one file and return an NDJSON record
+
+    Small documents from concurrent workers share batched LLM calls (see ExtractionBatcher).
+    """
+    started = time.time()
+    record = {"path": file_path}
+
+    with open(file_path, "rb") as f:
+        file_content = f.read()
+
+    result = process_document(file_content, os.path.splitext(file_path)[1])
+    record["ocr_seconds"] = round(time.time() - started, 3)
+
+    if result["status"] != "success":
+        record.update({"status": "error", "stage": "ocr", "message": result.get("message", "Unknown error")})
+        return record
+
+    ocr_result = to_cacheable(result)
+    record["document_key"] = document_key(file_content)
+    record.update({
+        "status": "success",
+        "cached": bool(result.get("cached")),
+        "pages": len(ocr_result["pages"]),
+        "full_content": ocr_result["full_content"],
+        "barcodes": ocr_result["barcodes"],
+        "key_value_pairs": ocr_result["key_value_pairs"]
+    })
+    if full_result:
+        record["ocr_result"] = ocr_result
+
+    if enable_crewai:
+        crew_started = time.time()
+        crew_result = get_extraction_batcher().extract(ocr_result)
+        record["crew_seconds"] = round(time.time() - crew_started, 3)
+        if crew_result["status"] == "success":
+            record["crew_result"] = str(crew_result["result"])
+            record["extraction"] = extraction_data(crew_result)
+            record["token_usage"] = crew_result.get("token_usage")
+            record["extraction_source"] = crew_result.get("source")
+            if crew_result.get("batched"):
+                record["extraction_batch_size"] = crew_result["batched"]
+        else:
+            record.update({"status": "error", "stage": "crewai", "message": crew_result.get("message", "Unknown error")})
+
+    return record
+
+
+def run_batch(source, output_path, checkpoint_path=None, workers=BATCH_MAX_CONCURRENCY,
+              enable_crewai=False, full_result=False, store=False):
+    """
+    Process every document from source with at most `workers` analyses in flight
+
+    Each finished document is appended to output_path as one JSON line.
+    Successful paths are appended to the checkpoint file, so an interrupted
+    run picks up where it stopped. Failed documents are retried on resume.
+    With store=True, results are also written to the result store in
+    transactions of RESULT_STORE_BATCH_SIZE documents.
+
+    Returns:
+        dict: Run summary with processed/failed/skipped counts
+    """
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    completed = load_checkpoint(checkpoint_path)
+    summary = {"processed": 0, "failed": 0, "skipped": 0}
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            open(output_path, "a", encoding="utf-8") as output, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+
+        in_flight = {}
+        pending_store = []
+        checkpoint_paths = []
+
+        def flush_store():
+            # Paths are checkpointed only once their results are stored
+            if pending_store:
+                get_result_store().save_many(pending_store)
+                pending_store.clear()
+            for file_path in checkpoint_paths:
+                checkpoint.write(file_path + "\n")
+            checkpoint_paths.clear()
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+        def drain(return_when):
+            done, _ = wait(in_flight, return_when=return_when)
+            for future in done:
+                file_path = in_flight.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {"path": file_path, "status": "error", "stage": "read", "message": str(e)}
+
+                ocr_result = record.get("ocr_result") if full_result else record.pop("ocr_result", None)
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+
+                if record["status"] == "success":
+                    summary["processed"] += 1
+                    checkpoint_paths.append(file_path)
+                    if store:
+                        pending_store.append({
+                            "key": record["document_key"],
+                            "source": file_path,
+                            "ocr_result": ocr_result,
+                            "extraction": record.get("extraction"),
+                            "extraction_source": record.get("extraction_source")
+                        })
+                    if len(checkpoint_paths) >= (RESULT_STORE_BATCH_SIZE if store else 1):
+                        flush_store()
+                else:
+                    summary["failed"] += 1
+                    print(f"❌ {file_path}: {record.get('message')}", file=sys.stderr)
+
+        for file_path in iter_input_files(source):
+            if file_path in completed:
+                summary["skipped"] += 1
+                continue
+
+            # Keep the submission queue bounded so huge manifests aren't loaded up front
+            if len(in_flight) >= workers * 2:
+                drain(FIRST_COMPLETED)
+
+            future = executor.submit(process_file, file_path, enable_crewai, full_result or store)
+            in_flight[future] = file_path
+
+        while in_flight:
+            drain(FIRST_COMPLETED)
+        flush_store()
+
+    elapsed = time.time() - started
+    summary["seconds"] = round(elapsed, 2)
+    summary["docs_per_second"] = round(summary["processed"] / elapsed, 3) if elapsed else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch OCR (and optional CrewAI) processing of documents")
+    parser.add_argument("source", help="Directory of documents or manifest file (one path per line or NDJSON with 'path')")
+    parser.add_argument("--output", default="batch_results.ndjson", help="NDJSON file results are appended to")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--workers", type=int, default=BATCH_MAX_CONCURRENCY, help="Maximum documents in flight")
+    parser.add_argument("--crewai", action="store_true", help="Also run CrewAI extraction on each document")
+    parser.add_argument("--full-result", action="store_true", help="Include the full normalized OCR result per document")
+    parser.add_argument("--store", action="store_true", help="Also save results to the searchable result store")
+    args = parser.parse_args()
+
+    if not endpoint or not key:
+        print("❌ Please set AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT and AZURE_DOCUMENT_INTELLIGENCE_KEY in the .env file")
+        sys.exit(1)
+
+    summary = run_batch(
+        args.source,
+        args.output,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        enable_crewai=args.crewai,
+        full_result=args.full_result,
+        store=args.store
+    )
+
+    print(f"✅ Done: {summary['processed']} processed, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped (already in checkpoint) in {summary['seconds']}s "
+          f"({summary['docs_per_second']} docs/s)")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Packing of small OCR results into one LLM extraction call
+Plans token-budgeted batches, formats the delimited document sections and splits
+the returned JSON array back into one result per document
+"""
+
+import json
+
+
+def plan_batches(token_counts, token_budget, max_documents):
+    """
+    Group documents (given by their estimated token counts) into batches
+
+    Documents keep their order; a batch is closed when the next document
+    would exceed token_budget or when it holds max_documents. Returns
+    lists of indexes into token_counts.
+    """
+    batches, current, current_tokens = [], [], 0
+    for index, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_documents):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def format_document_sections(contents):
+    """Numbered, clearly delimited sections (numbering starts at 1) appended after the static prompt"""
+    return "\n\n".join(
+        f"=== DOCUMENT {number} ===\n{content}\n=== END OF DOCUMENT {number} ==="
+        for number, content in enumerate(contents, 1)
+    )
+
+
+def parse_batch_output(output, count):
+    """
+    Split a batched answer into one object per document
+
+    The answer is a JSON array (after a ReAct "Final Answer:" when present)
+    of {"document": n, "data": {...}} objects; elements without a valid
+    "document" number are matched by position. Returns a list of count
+    dicts (without "document"), with None for documents the answer misses.
+
+    Raises:
+        json.JSONDecodeError: If the output has no JSON array
+    """
+    text = str(output)
+    answer = text.rfind("Final Answer:")
+    start = text.find("[", answer if answer >= 0 else 0)
+    if start < 0:
+        raise json.JSONDecodeError("No JSON array in output", text, 0)
+    items = json.JSONDecoder().raw_decode(text, start)[0]
+    if not isinstance(items, list):
+        raise json.JSONDecodeError("Output is not a JSON array", text, start)
+
+    results = [None] * count
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        item = dict(item)
+        number = item.pop("document", None)
+        index = number - 1 if isinstance(number, int) and 1 <= number <= count else position
+        if index < count and results[index] is None:
+            results[index] = item
+    return results
+
+
+def split_token_usage(usage, weights):
+    """Share one call's token usage between documents in proportion to weights (e.g. their token counts)"""
+    total = sum(weights) or len(weights)
+    return [
+        {
+            "input_tokens": round(usage["input_tokens"] * (weight or 1) / total),
+            "output_tokens": round(usage["output_tokens"] * (weight or 1) / total)
+        }
+        for weight in weights
+    ]
@@ -0,0 +1,286 @@
+"""
+End-to-end pipeline benchmark against local mock services
+Starts the mock Azure Document Intelligence and chat completions servers from
+mock_services.py, points the pipeline at them and reports throughput, per-stage
+latency percentiles and peak memory for the single-document, batch and large-PDF paths.
+Each scenario runs in its own process, so its peak memory isn't inflated by earlier ones
+
+Usage:
+    python benchmark.py
+    python benchmark.py --scenario batch --documents 40 --workers 8 --throttle-rate 0.05
+    python benchmark.py --no-crewai --json benchmark_results.json
+    python benchmark.py --scenario batch --endpoints 3 --slow-endpoint-latency 6
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from PyPDF2 import PdfWriter
+import config
+import metrics
+import lro_polling
+from mock_services import MockAzureDocumentIntelligence, FakeChatCompletions, start_in_background
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+SCENARIOS = ["single", "batch", "large_pdf"]
+
+
+def make_pdf(page_count):
+    """A blank PDF with page_count pages; a random title keeps the bytes unique per document"""
+    writer = PdfWriter()
+    for _ in range(page_count):
+        writer.add_blank_page(width=612, height=792)
+    writer.add_metadata({"/Title": uuid.uuid4().hex})
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process (and finished children) in MB, or None if unknown
+
+    This is the peak over the process's lifetime, hence one process per scenario.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(np.array(values, dtype=np.float64), [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+def summarize(name, timings, elapsed, errors):
+    """timings: one {"stage": seconds} dict per successful document"""
+    stages = sorted({stage for timing in timings for stage in timing})
+    return {
+        "scenario": name,
+        "documents": len(timings),
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "docs_per_second": round(len(timings) / elapsed, 3) if elapsed else 0.0,
+        "latency": {stage: percentiles([timing[stage] for timing in timings if stage in timing]) for stage in stages}
+    }
+
+
+def run_documents(name, documents, enable_crewai):
+    """Run each document through OCR (and extraction) one after another"""
+    from ocr_processor import process_document
+    from crewai_processor import extract_document_data
+
+    timings, errors = [], 0
+    started = time.time()
+    for file_content in documents:
+        timing = {}
+        stage_started = time.time()
+        result = process_document(file_content, ".pdf", use_cache=False)
+        timing["ocr"] = time.time() - stage_started
+        if result["status"] != "success":
+            errors += 1
+            continue
+
+        if enable_crewai:
+            stage_started = time.time()
+            crew_result = extract_document_data(result)
+            timing["extraction"] = time.time() - stage_started
+            if crew_result["status"] != "success":
+                errors += 1
+                continue
+
+        timing["total"] = sum(timing.values())
+        timings.append(timing)
+    return summarize(name, timings, time.time() - started, errors)
+
+
+def run_batch_scenario(documents, workers, enable_crewai):
+    """Run documents through batch_processor.run_batch from a temporary directory"""
+    from batch_processor import run_batch
+
+    work_dir = tempfile.mkdtemp(prefix="ocr-benchmark-")
+    try:
+        for i, file_content in enumerate(documents):
+            with open(os.path.join(work_dir, f"document_{i:05d}.pdf"), "wb") as f:
+                f.write(file_content)
+        output_path = os.path.join(work_dir, "results.ndjson")
+
+        started = time.time()
+        summary = run_batch(work_dir, output_path, workers=workers, enable_crewai=enable_crewai)
+        elapsed = time.time() - started
+
+        timings = []
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["status"] != "success":
+                    continue
+                timing = {"ocr": record["ocr_seconds"]}
+                if "crew_seconds" in record:
+                    timing["extraction"] = record["crew_seconds"]
+                timing["total"] = sum(timing.values())
+                timings.append(timing)
+        return summarize("batch", timings, elapsed, summary["failed"])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_scenario(scenario, args):
+    """Run one scenario in this process; returns its summary with per-span percentiles, polling and pool stats"""
+    if not args.with_cache:
+        config.OCR_CACHE_ENABLED = False
+        config.LLM_CACHE_ENABLED = False
+    enable_crewai = not args.no_crewai
+
+    with metrics.collect_spans() as spans:
+        if scenario == "single":
+            documents = [make_pdf(args.pages) for _ in range(args.documents)]
+            result = run_documents("single", documents, enable_crewai)
+        elif scenario == "batch":
+            documents = [make_pdf(args.pages) for _ in range(args.documents)]
+            result = run_batch_scenario(documents, args.workers, enable_crewai)
+        else:
+            documents = [make_pdf(args.large_pdf_pages) for _ in range(args.large_pdf_documents)]
+            result = run_documents("large_pdf", documents, enable_crewai)
+    result["spans"] = {stage: percentiles(seconds) for stage, seconds in sorted(spans.items())}
+    result["peak_rss_mb"] = peak_rss_mb()
+
+    from endpoint_pool import get_endpoint_pool
+
+    result["polling"] = lro_polling.polling_report()
+    result["endpoint_pool"] = get_endpoint_pool().stats()
+    result["metrics"] = metrics.snapshot()
+    return result
+
+
+def run_in_subprocess(scenario):
+    """Run one scenario in a fresh interpreter (the mocks stay in this one) and return its result"""
+    fd, output_path = tempfile.mkstemp(prefix="ocr-benchmark-", suffix=".json")
+    os.close(fd)
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:],
+                                    "--child-scenario", scenario, "--child-output", output_path])
+        if completed.returncode != 0:
+            raise RuntimeError(f"Scenario {scenario} failed (exit code {completed.returncode})")
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(output_path)
+
+
+def print_report(results, mocks):
+    for result in results:
+        print(f"\n📊 {result['scenario']}: {result['documents']} documents in {result['seconds']}s "
+              f"({result['docs_per_second']} docs/s), {result['errors']} errors, "
+              f"peak RSS {result['peak_rss_mb']} MB")
+        for stage, stats in result["latency"].items():
+            if stats:
+                print(f"   {stage:<20} p50 {stats['p50']:>7.3f}s   p95 {stats['p95']:>7.3f}s   p99 {stats['p99']:>7.3f}s")
+        if result["spans"]:
+            print("   Spans:")
+            for stage, stats in result["spans"].items():
+                print(f"   {stage:<20} p50 {stats['p50']:>7.3f}s   p95 {stats['p95']:>7.3f}s")
+        polling = result["polling"]
+        if polling["operations"]:
+            print(f"   Polling: {polling['polls_per_operation']:.2f} status checks per analysis, "
+                  f"{polling['idle_seconds']:.2f}s idle vs {polling['server_seconds']:.2f}s server processing "
+                  f"({polling['idle_share']:.1%} lost to polling)")
+        pool = result["endpoint_pool"]
+        if len(pool["endpoints"]) > 1:
+            print(f"   Endpoint pool: {pool['requests']} analyses, {pool['hedges']} hedged")
+            for member in pool["endpoints"]:
+                print(f"     {member['endpoint']:<24} {member['requests']:>5} analyses, {member['failures']} failed, "
+                      f"{member['hedge_wins']} hedges won")
+    for url, stats in mocks["azure"].items():
+        print(f"\nMock Azure {url}: {stats}")
+    print(f"Fake LLM:   {mocks['llm']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OCR/CrewAI pipeline against local mock services")
+    parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    parser.add_argument("--documents", type=int, default=20, help="Documents per single/batch scenario")
+    parser.add_argument("--pages", type=int, default=2, help="Pages per document in single/batch scenarios")
+    parser.add_argument("--large-pdf-pages", type=int, default=60)
+    parser.add_argument("--large-pdf-documents", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=config.BATCH_MAX_CONCURRENCY, help="Batch concurrency")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mock analysis seconds per document")
+    parser.add_argument("--latency-per-page", type=float, default=0.05, help="Extra mock analysis seconds per page")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of Azure requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After the mock sends while an analysis runs")
+    parser.add_argument("--endpoints", type=int, default=1, help="Mock Azure resources in the endpoint pool")
+    parser.add_argument("--slow-endpoint-latency", type=float,
+                        help="Analysis seconds of the last mock resource (a slow or throttled region)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake chat completion seconds")
+    parser.add_argument("--no-crewai", action="store_true", help="Benchmark OCR only")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the OCR/LLM result caches enabled")
+    parser.add_argument("--json", help="Also write the results to this file")
+    # Set by run_in_subprocess: run one scenario against the parent's mocks and write its result to a file
+    parser.add_argument("--child-scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_scenario:
+        result = run_scenario(args.child_scenario, args)
+        with open(args.child_output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    azure_mocks = {}
+    for i in range(max(1, args.endpoints)):
+        latency = args.latency
+        if args.slow_endpoint_latency is not None and i == args.endpoints - 1:
+            latency = args.slow_endpoint_latency
+        azure = MockAzureDocumentIntelligence(
+            ("127.0.0.1", 0), latency_seconds=latency, latency_per_page=args.latency_per_page,
+            throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=i
+        )
+        azure_mocks[start_in_background(azure)] = azure
+    llm = FakeChatCompletions(("127.0.0.1", 0), latency_seconds=args.llm_latency)
+    llm_url = start_in_background(llm) + "/v1"
+
+    # The pipeline reads its endpoints and settings at import time, so configure them before importing it
+    os.environ["AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT"] = next(iter(azure_mocks))
+    os.environ["AZURE_DOCUMENT_INTELLIGENCE_ENDPOINTS"] = ",".join(azure_mocks)
+    os.environ["AZURE_DOCUMENT_INTELLIGENCE_KEY"] = "benchmark"
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["OPENAI_API_BASE"] = llm_url
+    os.environ["OPENAI_BASE_URL"] = llm_url
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+    results = []
+    for scenario in scenarios:
+        print(f"⏱️  Running {scenario}...")
+        results.append(run_in_subprocess(scenario))
+
+    mocks = {"azure": {url: dict(azure.stats) for url, azure in azure_mocks.items()}, "llm": dict(llm.stats)}
+    print_report(results, mocks)
+    if args.json:
+        settings = {name: value for name, value in vars(args).items() if not name.startswith("child_")}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results, "mocks": mocks}, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
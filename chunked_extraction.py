@@ -0,0 +1,134 @@
+"""
+Chunking of long OCR results for map-reduce LLM extraction
+Splits documents along page and line boundaries into token-budgeted chunks
+and merges the per-chunk JSON results back into one object
+"""
+
+import json
+import numpy as np
+from page_geometry import page_line_confidences
+from prompt_compaction import count_tokens
+
+
+def split_into_chunks(ocr_result, max_tokens):
+    """
+    Split an OCR result into chunks of at most max_tokens (count_tokens)
+
+    Whole pages are packed together while they fit; a page that is too large
+    on its own is split between lines. Falls back to splitting full_content
+    by lines when the result has no page records. Pages may also be given
+    directly as {"pages": [...]} (e.g. the output of compact_pages).
+
+    Returns:
+        list: dicts with "text", "pages" (page numbers) and "confidence"
+        (mean OCR word confidence of the chunk's lines, or None)
+    """
+    pages = ocr_result.get("pages")
+    if not isinstance(pages, list) or not pages:
+        pages = [{
+            "page_number": 1,
+            "lines": [{"content": line} for line in ocr_result.get("full_content", "").splitlines()]
+        }]
+
+    chunks = []
+    current = {"lines": [], "tokens": 0, "pages": [], "confidences": []}
+
+    def flush():
+        if current["lines"]:
+            confidences = np.array(current["confidences"], dtype=np.float32)
+            known = confidences[~np.isnan(confidences)]
+            chunks.append({
+                "text": "\n".join(current["lines"]),
+                "pages": current["pages"],
+                "confidence": float(known.mean()) if len(known) else None
+            })
+        current.update({"lines": [], "tokens": 0, "pages": [], "confidences": []})
+
+    for page in pages:
+        lines = [line["content"] for line in page.get("lines", [])]
+        confidences = page_line_confidences(page)
+        line_tokens = [count_tokens(line) for line in lines]
+        page_tokens = sum(line_tokens)
+
+        # Start a new chunk at the page boundary if the whole page won't fit
+        if current["lines"] and current["tokens"] + page_tokens > max_tokens:
+            flush()
+
+        for line, tokens, confidence in zip(lines, line_tokens, confidences):
+            if current["lines"] and current["tokens"] + tokens > max_tokens:
+                flush()
+            current["lines"].append(line)
+            current["tokens"] += tokens
+            current["confidences"].append(confidence)
+            if page["page_number"] not in current["pages"]:
+                current["pages"].append(page["page_number"])
+
+    flush()
+    return chunks
+
+
+def _value_key(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def _merge_values(current, current_confidence, incoming, incoming_confidence):
+    """
+    Merge two values for the same key according to the conflict rules
+
+    current_confidence mirrors the shape of current: a dict of per-key
+    confidences for objects, otherwise the confidence of the chunk the value
+    came from. Returns (merged_value, merged_confidence).
+    """
+    if current is None:
+        return incoming, incoming_confidence
+    if incoming is None:
+        return current, current_confidence
+
+    # Objects merge key by key
+    if isinstance(current, dict) and isinstance(incoming, dict):
+        merged = dict(current)
+        if isinstance(current_confidence, dict):
+            confidences = dict(current_confidence)
+        else:
+            # An object stored whole carries its chunk's confidence; give it to each of its keys
+            confidences = {key: current_confidence for key in current}
+        for key, value in incoming.items():
+            merged[key], confidences[key] = _merge_values(
+                merged.get(key), confidences.get(key), value, incoming_confidence
+            )
+        return merged, confidences
+
+    # Arrays (or an array and a scalar) combine, without duplicates
+    if isinstance(current, list) or isinstance(incoming, list):
+        combined = []
+        seen = set()
+        for item in (current if isinstance(current, list) else [current]) + \
+                (incoming if isinstance(incoming, list) else [incoming]):
+            item_key = _value_key(item)
+            if item_key not in seen:
+                seen.add(item_key)
+                combined.append(item)
+        return combined, current_confidence
+
+    # Conflicting scalars: the chunk with the higher OCR confidence wins, ties keep the earlier page
+    if not isinstance(current_confidence, dict) and (incoming_confidence or 0) > (current_confidence or 0):
+        return incoming, incoming_confidence
+    return current, current_confidence
+
+
+def merge_extractions(partials):
+    """
+    Merge per-chunk JSON objects (in page order) into one
+
+    partials is a list of (parsed_json, chunk_confidence). Conflict rules:
+    - missing or null values are filled from any chunk that has them
+    - nested objects are merged key by key
+    - arrays are concatenated with duplicates removed
+    - differing scalar values resolve to the chunk with the highest OCR
+      confidence, and to the earliest chunk on a tie
+    """
+    merged, confidences = {}, {}
+    for parsed, confidence in partials:
+        if isinstance(parsed, dict):
+            merged, confidences = _merge_values(merged, confidences, parsed, confidence or 0)
+    return merged
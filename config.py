@@ -4,20 +4,124 @@ Customize these settings to match your needs
 """
 
 # Azure Document Intelligence Settings
-# Using azure-ai-formrecognizer SDK (stable version)
+AZURE_DI_MODEL = "prebuilt-read"
+AZURE_DI_API_VERSION = "2024-11-30"
+AZURE_DI_FEATURES = ["barcodes"]  # DocumentAnalysisFeature values (e.g. "barcodes", "ocrHighResolution")
+
+# Azure Client Settings (one shared client per process)
+AZURE_DI_MAX_CONNECTIONS = 16  # Size of the reused HTTP connection pool
+AZURE_DI_RATE_LIMIT_TPS = 15  # Analyze requests per second (Azure S0 tier default)
+AZURE_DI_MIN_RATE_TPS = 1  # Lower bound when the rate is reduced after throttling
+AZURE_DI_MAX_RETRIES = 5  # Retries per HTTP request on 429/5xx/connection errors
+AZURE_DI_RETRY_BACKOFF_SECONDS = 0.5  # Base delay for jittered exponential backoff
+AZURE_DI_RETRY_BACKOFF_MAX_SECONDS = 30
+AZURE_DI_REQUEST_DEADLINE_SECONDS = 120  # Give up retrying a request after this long
+AZURE_DI_CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures before failing fast
+AZURE_DI_CIRCUIT_RESET_SECONDS = 30  # How long to fail fast before probing the endpoint again
+
+# Azure Document Intelligence Polling Settings
+AZURE_DI_ADAPTIVE_POLLING = True  # Predict completion time instead of the SDK's fixed polling interval
+AZURE_DI_POLL_MIN_SECONDS = 0.25  # Shortest delay between status checks
+AZURE_DI_POLL_MAX_SECONDS = 5.0  # Longest delay between status checks
+AZURE_DI_POLL_BACKOFF = 1.5  # Delay multiplier after each "running" answer
+AZURE_DI_POLL_FIRST_FRACTION = 0.8  # First status check at this share of the predicted processing time
+AZURE_DI_POLL_PRIOR_SECONDS = 1.0  # Predicted processing time before any history: base ...
+AZURE_DI_POLL_PRIOR_SECONDS_PER_PAGE = 0.3  # ... plus per page ...
+AZURE_DI_POLL_PRIOR_SECONDS_PER_MB = 0.5  # ... plus per MB uploaded
+
+# Endpoint pool (several resources via AZURE_DOCUMENT_INTELLIGENCE_ENDPOINTS)
+AZURE_DI_HEDGING_ENABLED = True  # Duplicate an analysis on a second endpoint once it runs past its percentile latency
+AZURE_DI_HEDGE_PERCENTILE = 95  # Latency percentile (of the best healthy endpoint, scaled to the document's size) that triggers a hedge
+AZURE_DI_HEDGE_MIN_SAMPLES = 20  # Completed analyses (per endpoint, or across the pool) needed before analyses are hedged
+AZURE_DI_HEDGE_MIN_DELAY_SECONDS = 1.0  # Never hedge sooner than this
+AZURE_DI_HEDGE_MAX_SHARE = 0.1  # At most this share of analyses is hedged, so a slow period doesn't double the load
+AZURE_DI_HEDGE_WORKERS = 32  # Threads running hedged analyses
+AZURE_DI_ENDPOINT_LATENCY_WINDOW = 200  # Recent analyses per endpoint the percentile is taken over
+
+# Confidence-Based Page Routing (pages the fast model read poorly are analyzed again)
+OCR_ROUTING_ENABLED = True
+OCR_ROUTING_MODEL = "prebuilt-read"  # Model for the second pass (e.g. "prebuilt-layout")
+OCR_ROUTING_FEATURES = ["barcodes", "ocrHighResolution"]  # Features for the second pass
+OCR_ROUTING_MIN_MEAN_CONFIDENCE = 0.85  # Pages with a lower mean word confidence are re-analyzed
+OCR_ROUTING_LOW_WORD_CONFIDENCE = 0.6  # Words below this confidence count as poorly read ...
+OCR_ROUTING_MAX_LOW_WORD_SHARE = 0.15  # ... and pages with a larger share of them are re-analyzed
+OCR_ROUTING_HANDWRITTEN = True  # Re-analyze pages with handwritten content
+OCR_ROUTING_MAX_PAGES = 10  # At most this many pages (lowest confidence first) are re-analyzed per document
+
+# Large PDF Splitting Settings
+PDF_SPLIT_ENABLED = True  # Analyze large PDFs as concurrent page ranges
+PDF_SPLIT_PAGE_THRESHOLD = 10  # PDFs with this many pages or fewer are sent whole
+PDF_SPLIT_PAGES_PER_CHUNK = 5  # Pages per concurrently analyzed range
+PDF_SPLIT_MAX_CONCURRENCY = 4  # Page ranges analyzed at the same time per document
+
+# Image Preprocessing Settings (applied to PNG/JPG uploads before sending to Azure)
+IMAGE_PREPROCESSING_ENABLED = True
+IMAGE_PREPROCESS_MIN_BYTES = 512 * 1024  # Smaller images are sent as-is
+IMAGE_MAX_DIMENSION = 3000  # Longest side in pixels; the read model gains little above this
+IMAGE_GRAYSCALE = False  # Convert to grayscale before encoding
+IMAGE_JPEG_QUALITY = 85  # Re-encoding quality (1-95)
+IMAGE_PREPROCESS_WORKERS = 2  # Worker processes for encoding (0 = run in the calling thread)
+
+# OCR Result Cache Settings
+OCR_CACHE_ENABLED = True  # Reuse results for byte-identical uploads instead of calling Azure again
+OCR_CACHE_PATH = ".cache/ocr_results.sqlite3"
+OCR_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Least recently used entries are evicted above this size
+OCR_CACHE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60  # Entries older than this are re-analyzed
+OCR_PAGE_CACHE_ENABLED = True  # Cache PDF results per page, so revised PDFs only send their changed pages
+OCR_PAGE_CACHE_PATH = ".cache/ocr_pages.sqlite3"
+OCR_PAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024
 
 # CrewAI Agent Settings
 AGENT_VERBOSE = True  # Set to False to reduce console output
 AGENT_ALLOW_DELEGATION = False  # Set to True to allow agents to delegate tasks
 
+# LLM Settings
+LLM_MODEL = "gpt-4o-mini"
+LLM_TEMPERATURE = 0
+LLM_STREAMING = True  # Stream response tokens so partial extractions can be shown while the LLM writes
+CREW_POOL_SIZE = 4  # Pre-built LLM clients/agents; also the maximum concurrent CrewAI runs per process
+
+# LLM Response Cache Settings (only used when LLM_TEMPERATURE is 0, i.e. deterministic)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = ".cache/llm_responses.sqlite3"
+LLM_CACHE_MAX_BYTES = 50 * 1024 * 1024
+LLM_CACHE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+# Batched Extraction Settings (batch_processor --crewai): small documents share one LLM call
+BATCH_EXTRACTION_ENABLED = True
+BATCH_EXTRACTION_TOKEN_BUDGET = 3000  # Estimated document tokens per batched call
+BATCH_EXTRACTION_MAX_DOCUMENT_TOKENS = 400  # Only documents up to this size are batched
+BATCH_EXTRACTION_MAX_DOCUMENTS = 8  # Documents per batched call
+BATCH_EXTRACTION_LINGER_SECONDS = 1.0  # How long a document waits for others to fill its batch
+
+# Rule-Based Extraction Settings (fast path tried before CrewAI)
+RULE_EXTRACTION_ENABLED = True
+RULE_MIN_CONFIDENCE = 0.8  # Fields below this confidence are escalated to CrewAI
+
 # Document Processing Settings
 MAX_CONTENT_LENGTH = 2000  # Maximum characters to send to CrewAI (to avoid token limits)
+CHUNKED_EXTRACTION_ENABLED = True  # Extract longer documents as concurrent chunks instead of truncating
+CHUNK_TOKEN_BUDGET = 1000  # Estimated document tokens per chunk
+PROMPT_COMPACTION_ENABLED = True  # Strip Arabic text, extra whitespace, page separators and repeated headers/footers
+HEADER_FOOTER_MIN_PAGE_RATIO = 0.6  # A top/bottom line repeated on this share of pages is a header/footer
 SHOW_SAMPLE_WORDS = 5  # Number of sample words to show per page
 
 # UI Settings
 PAGE_TITLE = "Document OCR with Azure AI"
 PAGE_ICON = "📄"
 
+# Preview Settings
+PREVIEW_DPI = 72  # Resolution PDF pages are rasterized at for previews
+PREVIEW_MAX_WIDTH = 800  # Previews are downscaled to at most this many pixels wide
+PREVIEW_CACHE_ENTRIES = 64  # Rendered previews kept in memory (least recently used are dropped)
+PREVIEW_MAX_PAGES = 12  # Maximum page thumbnails shown for multi-page PDFs
+PREVIEW_WORKERS = 2  # Background rendering threads
+
+# Session Result Settings (per Streamlit process)
+SESSION_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024  # Compressed results above this are spilled to disk, least recently used first
+SESSION_SPILL_DIR = ".cache/sessions"
+SESSION_RESULT_TTL_SECONDS = 6 * 60 * 60  # Results of sessions idle this long are dropped
+
 # Agent Configurations
 DOCUMENT_ANALYZER_CONFIG = {
     "role": "Document Analyzer",
@@ -30,3 +134,34 @@ DATA_EXTRACTOR_CONFIG = {
     "goal": "Extract structured data and key information from the document",
     "backstory": "You specialize in identifying and extracting key data points, entities, and relationships from documents."
 }
+
+# Batch Processing Settings
+BATCH_MAX_CONCURRENCY = 8  # Maximum number of documents analyzed at the same time
+SUPPORTED_EXTENSIONS = [".pdf", ".png", ".jpg", ".jpeg"]
+
+# Result Store Settings
+RESULT_STORE_ENABLED = True  # Keep processed documents in a searchable local database
+RESULT_STORE_PATH = "data/results.sqlite3"
+RESULT_STORE_BATCH_SIZE = 50  # Documents written per transaction by batch runs
+
+# Metrics Settings
+METRICS_ENABLED = True  # Per-stage timers and counters (no-ops when False)
+METRICS_JSON_LOGS = False  # Print one JSON timing line per processed document
+
+# Job Queue and API Settings
+JOB_QUEUE_BACKEND = "memory"  # "memory" (in-process) or "sqlite" (durable across restarts)
+JOB_QUEUE_PATH = ".cache/jobs.sqlite3"
+JOB_QUEUE_MAX_SIZE = 32  # Submissions are rejected (HTTP 429) while this many jobs are waiting
+JOB_WORKERS = 4  # Background threads processing jobs
+JOB_RESULT_TTL_SECONDS = 60 * 60  # Finished jobs are kept this long for polling
+JOB_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+JOB_API_HOST = "127.0.0.1"
+JOB_API_PORT = 8765
+JOB_API_URL = ""  # e.g. "http://127.0.0.1:8765"; empty runs jobs inside the Streamlit process
+JOB_POLL_INTERVAL_SECONDS = 0.5  # How often the app refreshes a running job or previews still rendering
+JOB_PROGRESS_INTERVAL_SECONDS = 0.25  # Workers publish streamed pages/tokens at most this often
+JOB_LEASE_SECONDS = 60  # SQLite queue: a running job whose process stops renewing it for this long is requeued
+
+# Startup Settings
+PREWARM_ENABLED = True  # Load heavy modules and build clients in a background thread once the app/API has started
+PREWARM_MODULES = ["ocr_processor", "crewai_processor", "preview"]  # Imported by the pre-warm, in this order
@@ -1,68 +1,57 @@
 import os
+import re
 import json
-from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
+import queue
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+import metrics
+from batched_extraction import plan_batches, format_document_sections, parse_batch_output, split_token_usage
+from chunked_extraction import split_into_chunks, merge_extractions
+from lazy_imports import lazy_import, import_module
+from prompt_compaction import compact_pages, count_tokens
+from result_cache import ResultCache
+from rule_extractor import extract_with_rules
 from config import (
     AGENT_VERBOSE,
     AGENT_ALLOW_DELEGATION,
-    MAX_CONTENT_LENGTH
+    MAX_CONTENT_LENGTH,
+    CHUNKED_EXTRACTION_ENABLED,
+    CHUNK_TOKEN_BUDGET,
+    PROMPT_COMPACTION_ENABLED,
+    RULE_EXTRACTION_ENABLED,
+    RULE_MIN_CONFIDENCE,
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    LLM_STREAMING,
+    CREW_POOL_SIZE,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_MAX_AGE_SECONDS,
+    BATCH_EXTRACTION_ENABLED,
+    BATCH_EXTRACTION_TOKEN_BUDGET,
+    BATCH_EXTRACTION_MAX_DOCUMENT_TOKENS,
+    BATCH_EXTRACTION_MAX_DOCUMENTS,
+    BATCH_EXTRACTION_LINGER_SECONDS
 )
 
-def create_document_processing_crew(ocr_result):
-    """
-    Create a CrewAI crew for SME customer onboarding at a digital bank in UAE
-    Context: Maker/Checker step of onboarding process
-    """
-    
-    # Initialize LLM with OpenAI API key from environment
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0,
-        api_key=os.getenv('OPENAI_API_KEY')
-    )
-    
-    # Agent 1: Document Classifier
-    document_classifier = Agent(
-        role='JSON Builder',
-        goal='Transform arbitrary OCR output into a single JSON object whose key_values map contains normalized keys and their best corresponding values.',
-        backstory="""Organizations upload many kinds of documents (licenses, permits, IDs, certificates, invoices, forms, letters, etc.). 
-        These vary in layout, language, and structure. OCR provides raw text plus (sometimes) hints like detected barcodes/QR codes. 
-        We need a robust, schema-agnostic way to turn any OCR output into a clean JSON of key–value pairs that "makes sense" to downstream systems, without requiring a bespoke schema per document type.
-                    """,
-        verbose=AGENT_VERBOSE,
-        allow_delegation=AGENT_ALLOW_DELEGATION,
-        llm=llm
-    )
-    
-    
-    # Prepare the document content
-    document_text = ocr_result.get('text', '')
-    full_content = ocr_result.get('full_content', document_text)
-    pages_count = len(ocr_result.get('pages', []))
-    document_type = ocr_result.get('document_type', 'Unknown')
-    # Define tasks for UAE SME onboarding
-    
-    # Task 1: Document Classification
-    classification_task = Task(
-        description=f"""
-        You are a data extraction and normalization agent. Given OCR output for ANY document (licenses, permits, IDs, invoices, certificates, letters, forms, etc., in any language), return ONE JSON object that flexibly reflects the document's content.
+# CrewAI and LangChain take seconds to import; they are loaded when the first crew or LLM client is built
+crewai = lazy_import("crewai")
+langchain_openai = lazy_import("langchain_openai")
 
-        ### OUTPUT CONTRACT
-        - Return EXACTLY ONE JSON object (no markdown, no prose).
-        - The JSON must be valid and parseable.
-        - The schema is FLEXIBLE and CONTENT-DRIVEN. Include only sections that make sense for the given document.
-
-        ### REQUIRED MINIMUM
-        {{
-        "data": {{ ... }},          key–value pairs extracted from the document (flat and/or nested)
-        }}
+EXPECTED_OUTPUT = "A well formatted valid JSON object with the precise key-value pairs extracted from the document"
+BATCH_EXPECTED_OUTPUT = "A valid JSON array with one {\"document\": n, \"data\": {...}} object per document section, in order"
 
-        ### EXTRACTION RULES
+# Rules shared by the single-document and batched prompts
+EXTRACTION_GUIDELINES = """### EXTRACTION RULES
         - Ignore and remove all arabic text
         - Build `data` first: a clean set of key–value pairs that capture the most important information. 
         - Keys in snake_case, concise, English where inferable (e.g., license_number, company_name, formation_number, address, issue_date, expiry_date, directors, activities, code, authority_name).
         - Use arrays for real multiples (e.g., directors, activities, addresses).
-        - Nest only when a clear grouping exists (e.g., address objects with {{line_1, city, country}}; party objects with {{role, name}}).
+        - Nest only when a clear grouping exists (e.g., address objects with {line_1, city, country}; party objects with {role, name}).
         - Do NOT invent values. If uncertain, omit the key.
         - If no value under a certain header/key, input NULL but return the key/header.
         - Preserve identifiers exactly (e.g., punctuation in "2202163.01").
@@ -73,7 +62,68 @@ def create_document_processing_crew(ocr_result):
         ### DISAMBIGUATION HEURISTICS
         1) Proximity to strong label cues > visual prominence > frequency.
         2) If multiple candidates for the same field: choose the clearest, most consistently labeled value.
-        3) Resolve duplicates by preferring values repeated across sections or corroborated by multiple cues.
+        3) Resolve duplicates by preferring values repeated across sections or corroborated by multiple cues."""
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+# Receives the streamed tokens of the extraction running in the current context (see run_extraction)
+_token_sink = contextvars.ContextVar("token_sink", default=None)
+
+def get_llm_cache():
+    """Return the process-wide LLM response cache, or None if responses aren't cacheable"""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED or LLM_TEMPERATURE != 0:
+        return None
+    if _llm_cache is None:
+        # Concurrent extractions (batch workers, chunked map calls) may get here at once
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = ResultCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_AGE_SECONDS)
+    return _llm_cache
+
+def llm_cache_key(task_description, model=LLM_MODEL, temperature=LLM_TEMPERATURE, expected_output=EXPECTED_OUTPUT):
+    """Hash the whitespace-normalized prompt together with the model settings"""
+    normalized_prompt = re.sub(r"\s+", " ", task_description).strip()
+    payload = json.dumps([normalized_prompt, expected_output, model, temperature])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def prepare_pages(ocr_result):
+    """Pages to build prompts from: compacted (see prompt_compaction) when enabled"""
+    if PROMPT_COMPACTION_ENABLED:
+        return compact_pages(ocr_result)
+    return ocr_result.get('pages') or [{
+        "page_number": 1,
+        "lines": [{"content": line} for line in ocr_result.get('full_content', '').splitlines()]
+    }]
+
+def document_content(ocr_result):
+    """Document text to send to the LLM (compacted when enabled)"""
+    if PROMPT_COMPACTION_ENABLED:
+        return "\n".join(line["content"] for page in prepare_pages(ocr_result) for line in page["lines"])
+    document_text = ocr_result.get('text', '')
+    return ocr_result.get('full_content', document_text)
+
+def build_task_description(ocr_result, content=None):
+    """Build the extraction task prompt for an OCR result (or for one chunk's content)"""
+    # Prepare the document content
+    if content is None:
+        content = document_content(ocr_result)[:MAX_CONTENT_LENGTH]
+
+    return f"""
+        You are a data extraction and normalization agent. Given OCR output for ANY document (licenses, permits, IDs, invoices, certificates, letters, forms, etc., in any language), return ONE JSON object that flexibly reflects the document's content.
+
+        ### OUTPUT CONTRACT
+        - Return EXACTLY ONE JSON object (no markdown, no prose).
+        - The JSON must be valid and parseable.
+        - The schema is FLEXIBLE and CONTENT-DRIVEN. Include only sections that make sense for the given document.
+
+        ### REQUIRED MINIMUM
+        {{
+        "data": {{ ... }},          key–value pairs extracted from the document (flat and/or nested)
+        }}
+
+        {EXTRACTION_GUIDELINES}
 
         ### QUALITY GATES (before returning)
         - Output is ONE valid JSON object.
@@ -82,39 +132,378 @@ def create_document_processing_crew(ocr_result):
         - No commentary outside JSON.
         
         Document Content:
-        {full_content[:MAX_CONTENT_LENGTH]}
-        """,
+        {content}
+        """
+
+# Static part of every batched prompt; kept byte-identical so provider-side prompt caching applies
+BATCH_TASK_PREFIX = f"""
+        You are a data extraction and normalization agent. Given OCR output for SEVERAL independent documents (licenses, permits, IDs, invoices, certificates, letters, forms, etc., in any language), extract each document on its own and return ONE JSON array with one object per document.
+
+        ### OUTPUT CONTRACT
+        - Return EXACTLY ONE JSON array (no markdown, no prose), with one element per document section, in the order given.
+        - Each element is {{"document": <section number>, "data": {{ ... }}}}, where `data` holds the key–value pairs of THAT document only (flat and/or nested).
+        - Never move values between documents. A document with nothing to extract still gets {{"document": n, "data": {{}}}}.
+        - The JSON must be valid and parseable.
+
+        {EXTRACTION_GUIDELINES}
+
+        ### QUALITY GATES (before returning)
+        - Output is ONE valid JSON array with exactly one element per document section.
+        - No arabic
+        - Each `data` contains the key facts available in its document.
+        - No commentary outside JSON.
+
+        Documents (each between "=== DOCUMENT n ===" and "=== END OF DOCUMENT n ==="):
+"""
+
+def build_batch_task_description(contents):
+    """Build one prompt for several small documents: the static prefix, then the numbered document sections"""
+    return BATCH_TASK_PREFIX + format_document_sections(contents)
+
+_token_stream_handler = None
+
+def token_stream_handler():
+    """Callback handler forwarding streamed LLM tokens to the sink of the extraction that is running"""
+    global _token_stream_handler
+    if _token_stream_handler is None:
+        # Defined on first use, since its base class comes from LangChain
+        class TokenStreamHandler(import_module("langchain_core.callbacks").BaseCallbackHandler):
+            def on_llm_new_token(self, token, **kwargs):
+                sink = _token_sink.get()
+                if sink is not None:
+                    sink(token)
+        
+        _token_stream_handler = TokenStreamHandler()
+    return _token_stream_handler
+
+def create_llm():
+    """Initialize the LLM with the OpenAI API key from the environment"""
+    return langchain_openai.ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        api_key=os.getenv('OPENAI_API_KEY'),
+        streaming=LLM_STREAMING,
+        callbacks=[token_stream_handler()] if LLM_STREAMING else None
+    )
+
+def create_document_classifier(llm):
+    """Agent 1: Document Classifier"""
+    return crewai.Agent(
+        role='JSON Builder',
+        goal='Transform arbitrary OCR output into a single JSON object whose key_values map contains normalized keys and their best corresponding values.',
+        backstory="""Organizations upload many kinds of documents (licenses, permits, IDs, certificates, invoices, forms, letters, etc.). 
+        These vary in layout, language, and structure. OCR provides raw text plus (sometimes) hints like detected barcodes/QR codes. 
+        We need a robust, schema-agnostic way to turn any OCR output into a clean JSON of key–value pairs that "makes sense" to downstream systems, without requiring a bespoke schema per document type.
+                    """,
+        verbose=AGENT_VERBOSE,
+        allow_delegation=AGENT_ALLOW_DELEGATION,
+        llm=llm
+    )
+
+def create_crew(document_classifier, task_description, expected_output=EXPECTED_OUTPUT):
+    """Wrap one per-document task around an existing agent"""
+    # Task 1: Document Classification
+    classification_task = crewai.Task(
+        description=task_description,
         agent=document_classifier,
-        expected_output="A well formatted valid JSON object with the precise key-value pairs extracted from the document"
+        expected_output=expected_output
     )
     
-    
     # Create the crew with single agent
-    crew = Crew(
+    return crewai.Crew(
         agents=[document_classifier],
         tasks=[classification_task],
-        process=Process.sequential,
+        process=crewai.Process.sequential,
         verbose=True
     )
+
+class CrewPool:
+    """
+    Long-lived pool of pre-built LLM clients and agents
+    
+    Each slot holds its own ChatOpenAI client (and HTTP connection pool) and
+    its own Agent, built once and reused across documents. A slot is used by
+    one thread at a time, so no mutable crew state is shared between
+    concurrent runs; at most `size` extractions run at once and further
+    callers wait for a free slot.
+    """
+    
+    def __init__(self, size=CREW_POOL_SIZE, api_key=None):
+        self.size = size
+        self.api_key = api_key
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _acquire(self, timeout=None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            build = self._created < self.size
+            if build:
+                self._created += 1
+        
+        if build:
+            try:
+                return create_document_classifier(create_llm())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No CrewAI agent became available in time")
+    
+    @contextmanager
+    def agent(self, timeout=None):
+        """Check out an agent for the duration of one run"""
+        document_classifier = self._acquire(timeout)
+        try:
+            yield document_classifier
+        finally:
+            self._idle.put(document_classifier)
     
-    return crew
+    def prewarm(self, count=None):
+        """Build up to `count` slots ahead of the first request"""
+        agents = []
+        for _ in range(min(count or self.size, self.size)):
+            with self._lock:
+                if self._created >= self.size:
+                    break
+                self._created += 1
+            agents.append(create_document_classifier(create_llm()))
+        for document_classifier in agents:
+            self._idle.put(document_classifier)
+    
+    def kickoff(self, task_description, timeout=None, expected_output=EXPECTED_OUTPUT):
+        """Run one extraction on a pooled agent; only the task is built per document"""
+        with self.agent(timeout) as document_classifier:
+            return create_crew(document_classifier, task_description, expected_output).kickoff()
+
+_crew_pool = None
+_crew_pool_lock = threading.Lock()
+
+def get_crew_pool():
+    """Return the process-wide crew pool, rebuilt if the OpenAI API key changed"""
+    global _crew_pool
+    api_key = os.getenv('OPENAI_API_KEY')
+    with _crew_pool_lock:
+        if _crew_pool is None or _crew_pool.api_key != api_key:
+            _crew_pool = CrewPool(api_key=api_key)
+        return _crew_pool
+
+def _json_start(text, partial=False):
+    """
+    Index of the first "{" of the answer (after a ReAct "Final Answer:" when present), or -1
+
+    With partial, a ReAct response still in its "Thought:" part has no answer yet.
+    """
+    answer = text.rfind("Final Answer:")
+    if answer < 0 and partial and text.lstrip().startswith("Thought:"):
+        return -1
+    return text.find("{", answer if answer >= 0 else 0)
+
+def parse_json_output(output):
+    """Parse the JSON object from crew output, with or without markdown code fences or surrounding text"""
+    text = str(output)
+    start = _json_start(text)
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object in output", text, 0)
+    return json.JSONDecoder().raw_decode(text, start)[0]
+
+def parse_partial_json(text):
+    """
+    Parse the complete part of a JSON object that is still being streamed
+    
+    The text is cut after the last complete value and the open objects and
+    arrays are closed, so finished fields can be shown before the rest
+    arrives. Returns None until the object of the answer has started.
+    """
+    start = _json_start(text, partial=True)
+    if start < 0:
+        return None
+    
+    stack = []  # Open containers; for objects, whether the next string is a key
+    safe_end, safe_closers = None, ""
+    in_string = escape = is_key = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if not is_key:
+                    safe_end, safe_closers = i + 1, _closers(stack)
+            continue
+        
+        if ch == '"':
+            in_string = True
+            is_key = bool(stack) and stack[-1][0] == "{" and stack[-1][1]
+        elif ch in "{[":
+            stack.append([ch, ch == "{"])
+            safe_end, safe_closers = i + 1, _closers(stack)
+        elif ch in "}]":
+            stack.pop()
+            if not stack:
+                try:
+                    return json.loads(text[start:i + 1])
+                except json.JSONDecodeError:
+                    return None
+            safe_end, safe_closers = i + 1, _closers(stack)
+        elif ch == ":":
+            stack[-1][1] = False
+        elif ch == ",":
+            # Numbers and literals are only known to be complete once a comma follows
+            safe_end, safe_closers = i, _closers(stack)
+            stack[-1][1] = stack[-1][0] == "{"
+    
+    try:
+        return json.loads(text[start:safe_end] + safe_closers)
+    except json.JSONDecodeError:
+        return None
+
+def _closers(stack):
+    return "".join("}" if container == "{" else "]" for container, _ in reversed(stack))
+
+def extraction_data(crew_result):
+    """The parsed JSON object of a successful extraction, or None"""
+    if not crew_result or crew_result.get("status") != "success":
+        return None
+    try:
+        parsed = parse_json_output(crew_result["result"])
+    except (json.JSONDecodeError, IndexError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def token_usage(task_description, result):
+    """Input/output token counts for one call (as reported by CrewAI when available)"""
+    usage = getattr(result, "token_usage", None)
+    if usage is not None and getattr(usage, "total_tokens", 0):
+        return {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens}
+    return {"input_tokens": count_tokens(task_description), "output_tokens": count_tokens(str(result))}
 
-def process_with_crewai(ocr_result):
+def run_extraction(task_description, on_token=None, expected_output=EXPECTED_OUTPUT):
+    """
+    Run one extraction prompt, served from the LLM cache when possible
+    
+    on_token is called with each response token as the LLM streams it (or
+    once with the whole cached response). expected_output is the task's
+    answer description (BATCH_EXPECTED_OUTPUT for batched prompts).
+    
+    Returns:
+        dict: "result" (crew output), "cached" and "token_usage" for the call
+    """
+    # Identical prompts at temperature 0 give identical answers, so reuse them
+    cache = get_llm_cache()
+    cache_key = llm_cache_key(task_description, expected_output=expected_output) if cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        metrics.increment("cache_requests_total", cache="llm", result="miss" if cached is None else "hit")
+        if cached is not None:
+            print("LLM cache hit, skipping crew kickoff")
+            if on_token:
+                on_token(cached["result"])
+            return {"result": cached["result"], "cached": True, "token_usage": {"input_tokens": 0, "output_tokens": 0}}
+    
+    print("Starting kickoff on pooled CrewAI agent...")
+    sink = _token_sink.set(on_token)
+    try:
+        with metrics.span("llm.kickoff"):
+            result = get_crew_pool().kickoff(task_description, expected_output=expected_output)
+    finally:
+        _token_sink.reset(sink)
+    
+    usage = token_usage(task_description, result)
+    metrics.increment("llm_calls_total")
+    metrics.increment("llm_tokens_total", usage["input_tokens"], direction="input")
+    metrics.increment("llm_tokens_total", usage["output_tokens"], direction="output")
+    print(f"Crew kickoff completed successfully (input tokens: {usage['input_tokens']}, output tokens: {usage['output_tokens']})")
+    if cache:
+        cache.set(cache_key, {"result": str(result)})
+    return {"result": result, "cached": False, "token_usage": usage}
+
+def sum_token_usage(calls):
+    return {
+        "input_tokens": sum(call["token_usage"]["input_tokens"] for call in calls),
+        "output_tokens": sum(call["token_usage"]["output_tokens"] for call in calls)
+    }
+
+def process_chunked(ocr_result, pages):
+    """
+    Map-reduce extraction for documents longer than MAX_CONTENT_LENGTH
+    
+    The document is split along page/line boundaries into CHUNK_TOKEN_BUDGET
+    chunks, which are extracted concurrently on the crew pool. The partial
+    JSON objects are then merged (see chunked_extraction.merge_extractions).
+    """
+    with metrics.span("llm.prompt_build"):
+        chunks = split_into_chunks({"pages": pages}, CHUNK_TOKEN_BUDGET)
+    print(f"Extracting {len(chunks)} chunks concurrently")
+    
+    def extract_chunk(chunk):
+        with metrics.span("llm.prompt_build"):
+            task_description = build_task_description(ocr_result, chunk["text"])
+        return run_extraction(task_description)
+    
+    with ThreadPoolExecutor(max_workers=CREW_POOL_SIZE) as executor:
+        calls = list(executor.map(metrics.propagate(extract_chunk), chunks))
+    
+    partials = []
+    for chunk, call in zip(chunks, calls):
+        try:
+            partials.append((parse_json_output(call["result"]), chunk["confidence"]))
+        except (json.JSONDecodeError, IndexError):
+            print(f"Skipping unparseable output for pages {chunk['pages']}")
+    
+    if not partials:
+        raise ValueError("No chunk produced a parseable JSON result")
+    
+    return {
+        "status": "success",
+        "result": json.dumps(merge_extractions(partials), indent=2, ensure_ascii=False),
+        "cached": all(call["cached"] for call in calls),
+        "chunks": len(chunks),
+        "token_usage": sum_token_usage(calls)
+    }
+
+def process_with_crewai(ocr_result, on_token=None):
     """
     Process the OCR result with CrewAI
+    
+    on_token receives the streamed response of single-call extractions;
+    chunked extractions run concurrently and are not streamed.
     """
     try:
-        print("Creating CrewAI crew...")
-        crew = create_document_processing_crew(ocr_result)
-        print("Crew created successfully. Starting kickoff...")
+        with metrics.span("llm.prompt_build"):
+            pages = prepare_pages(ocr_result)
+            content = "\n".join(line["content"] for page in pages for line in page["lines"])
         
-        result = crew.kickoff()
+        if PROMPT_COMPACTION_ENABLED:
+            raw_tokens = count_tokens(ocr_result.get('full_content', ocr_result.get('text', '')))
+            print(f"Prompt compaction: {raw_tokens} -> {count_tokens(content)} document tokens")
         
-        print("Crew kickoff completed successfully")
-        return {
+        if CHUNKED_EXTRACTION_ENABLED and len(content) > MAX_CONTENT_LENGTH:
+            return process_chunked(ocr_result, pages)
+        
+        with metrics.span("llm.prompt_build"):
+            task_description = build_task_description(ocr_result, content[:MAX_CONTENT_LENGTH])
+        call = run_extraction(task_description, on_token)
+        response = {
             "status": "success",
-            "result": result
+            "result": call["result"],
+            "token_usage": call["token_usage"]
         }
+        if call["cached"]:
+            response["cached"] = True
+        return response
     except Exception as e:
         print(f"Error in process_with_crewai: {str(e)}")
         import traceback
@@ -123,3 +512,257 @@ def process_with_crewai(ocr_result):
             "status": "error",
             "message": str(e)
         }
+
+_tier_stats = {"documents": 0, "rules_only": 0, "escalated": 0}
+_tier_stats_lock = threading.Lock()
+
+def tier_stats():
+    """Share of documents handled by the rule-based fast path without an LLM call"""
+    with _tier_stats_lock:
+        stats = dict(_tier_stats)
+    stats["llm_skip_rate"] = stats["rules_only"] / stats["documents"] if stats["documents"] else 0.0
+    return stats
+
+def rules_tier(ocr_result):
+    """
+    Run the rule-based fast path and count the document in the tier stats
+    
+    Returns (rules, response): response is the final rules-only result, or
+    None when the document has to be escalated to CrewAI. rules is None
+    when rule extraction is disabled.
+    """
+    if not RULE_EXTRACTION_ENABLED:
+        return None, None
+    
+    with metrics.span("extraction.rules"):
+        rules = extract_with_rules(ocr_result, RULE_MIN_CONFIDENCE)
+    rules_only = rules["document_type"] is not None and not rules["uncertain"]
+    with _tier_stats_lock:
+        _tier_stats["documents"] += 1
+        _tier_stats["rules_only" if rules_only else "escalated"] += 1
+    metrics.increment("extraction_documents_total", tier="rules" if rules_only else "escalated")
+    
+    if rules_only:
+        print(f"Rule-based extraction succeeded for {rules['document_type']}, skipping CrewAI")
+        return rules, {
+            "status": "success",
+            "result": json.dumps({"data": rules["data"]}, indent=2, ensure_ascii=False),
+            "source": "rules",
+            "rule_confidence": rules["confidence"]
+        }
+    
+    print(f"Escalating to CrewAI (document type: {rules['document_type'] or 'unrecognised'}, "
+          f"uncertain fields: {', '.join(rules['uncertain']) or 'none'})")
+    return rules, None
+
+def apply_rules(crew_result, rules):
+    """Override the LLM's values with the confident rule values (copied verbatim from the OCR text)"""
+    if rules is None:
+        return {**crew_result, "source": "llm"}
+    if crew_result["status"] != "success":
+        return crew_result
+    
+    confident = {
+        field: value for field, value in rules["data"].items()
+        if field not in rules["uncertain"] and rules["confidence"][field] >= RULE_MIN_CONFIDENCE
+    }
+    try:
+        parsed = parse_json_output(crew_result["result"])
+    except (json.JSONDecodeError, IndexError):
+        return {**crew_result, "source": "llm"}
+    
+    if not confident or not isinstance(parsed, dict) or not isinstance(parsed.get("data", {}), dict):
+        return {**crew_result, "source": "llm"}
+    
+    parsed.setdefault("data", {}).update(confident)
+    return {
+        **crew_result,
+        "result": json.dumps(parsed, indent=2, ensure_ascii=False),
+        "source": "rules+llm",
+        "rule_confidence": {field: rules["confidence"][field] for field in confident}
+    }
+
+def extract_document_data(ocr_result, on_token=None):
+    """
+    Tiered extraction: deterministic rules first, CrewAI only when needed
+    
+    Recognised document types whose fields are all found with at least
+    RULE_MIN_CONFIDENCE are answered by the rules alone. Otherwise the
+    document is escalated to process_with_crewai, and the confident rule
+    values override the LLM's for those fields (they are copied verbatim
+    from the OCR text). Returns the same shape as process_with_crewai, plus
+    "source" ("rules", "rules+llm" or "llm"). on_token receives streamed
+    LLM tokens (see process_with_crewai).
+    """
+    rules, response = rules_tier(ocr_result)
+    if response is not None:
+        return response
+    return apply_rules(process_with_crewai(ocr_result, on_token), rules)
+
+def batchable_content(ocr_result):
+    """The document's prompt content if it is small enough to share a batched call, else None"""
+    if not BATCH_EXTRACTION_ENABLED:
+        return None
+    with metrics.span("llm.prompt_build"):
+        content = document_content(ocr_result)
+    if len(content) > MAX_CONTENT_LENGTH or count_tokens(content) > BATCH_EXTRACTION_MAX_DOCUMENT_TOKENS:
+        return None
+    return content
+
+def run_batched_extraction(ocr_results, contents):
+    """
+    Extract several small documents with one LLM call
+    
+    The prompt is BATCH_TASK_PREFIX followed by the delimited documents.
+    The call's token usage is shared between the documents by size.
+    Documents the answer misses (or all of them, if it can't be parsed)
+    are extracted on their own.
+    
+    Returns:
+        list: process_with_crewai results, with "batched" (documents in the call), in input order
+    """
+    if len(ocr_results) == 1:
+        return [process_with_crewai(ocr_results[0])]
+    
+    with metrics.span("llm.prompt_build"):
+        task_description = build_batch_task_description(contents)
+    print(f"Extracting {len(contents)} small documents in one batched call")
+    try:
+        call = run_extraction(task_description, expected_output=BATCH_EXPECTED_OUTPUT)
+        items = parse_batch_output(call["result"], len(contents))
+    except Exception as e:
+        print(f"Batched extraction failed ({e}), extracting the documents one by one")
+        return [process_with_crewai(ocr_result) for ocr_result in ocr_results]
+    
+    metrics.increment("llm_batched_documents_total", len(contents))
+    usages = split_token_usage(call["token_usage"], [count_tokens(content) for content in contents])
+    results = []
+    for ocr_result, item, usage in zip(ocr_results, items, usages):
+        if item is None or not isinstance(item.get("data", {}), dict):
+            print("Document missing from the batched answer, extracting it on its own")
+            results.append(process_with_crewai(ocr_result))
+            continue
+        result = {
+            "status": "success",
+            "result": json.dumps(item, indent=2, ensure_ascii=False),
+            "token_usage": usage,
+            "batched": len(contents)
+        }
+        if call["cached"]:
+            result["cached"] = True
+        results.append(result)
+    return results
+
+def extract_documents(ocr_results):
+    """
+    Tiered extraction of many documents, packing small ones into shared LLM calls
+    
+    Escalated documents of at most BATCH_EXTRACTION_MAX_DOCUMENT_TOKENS are
+    packed, in order, into calls of up to BATCH_EXTRACTION_TOKEN_BUDGET
+    document tokens and BATCH_EXTRACTION_MAX_DOCUMENTS documents; larger
+    ones are extracted on their own. Calls run concurrently on the crew pool.
+    
+    Returns:
+        list: extract_document_data results in input order
+    """
+    results = [None] * len(ocr_results)
+    tiers = [rules_tier(ocr_result) for ocr_result in ocr_results]
+    small, single = [], []
+    for index, (rules, response) in enumerate(tiers):
+        if response is not None:
+            results[index] = response
+            continue
+        content = batchable_content(ocr_results[index])
+        if content is None:
+            single.append(index)
+        else:
+            small.append((index, content))
+    
+    batches = plan_batches([count_tokens(content) for _, content in small],
+                           BATCH_EXTRACTION_TOKEN_BUDGET, BATCH_EXTRACTION_MAX_DOCUMENTS)
+    jobs = [[index] for index in single] + [[small[i][0] for i in batch] for batch in batches]
+    contents = dict(small)
+    
+    def run(indexes):
+        if len(indexes) == 1 and indexes[0] not in contents:
+            return [process_with_crewai(ocr_results[indexes[0]])]
+        return run_batched_extraction([ocr_results[i] for i in indexes], [contents[i] for i in indexes])
+    
+    with ThreadPoolExecutor(max_workers=CREW_POOL_SIZE) as executor:
+        for indexes, crew_results in zip(jobs, executor.map(metrics.propagate(run), jobs)):
+            for index, crew_result in zip(indexes, crew_results):
+                results[index] = apply_rules(crew_result, tiers[index][0])
+    return results
+
+class ExtractionBatcher:
+    """
+    Coalesces extractions requested from many threads into batched LLM calls
+    
+    extract() takes the place of extract_document_data for concurrent
+    workers (e.g. batch_processor) and blocks until the document's result
+    is ready. A small escalated document waits up to linger_seconds for
+    others to fill its batch; the thread that fills a batch, or whose wait
+    runs out first, runs the call for every document in it.
+    """
+    
+    def __init__(self, token_budget=BATCH_EXTRACTION_TOKEN_BUDGET, max_documents=BATCH_EXTRACTION_MAX_DOCUMENTS,
+                 linger_seconds=BATCH_EXTRACTION_LINGER_SECONDS):
+        self.token_budget = token_budget
+        self.max_documents = max_documents
+        self.linger_seconds = linger_seconds
+        self._pending = []  # (ocr_result, content, rules, future) waiting for a batch
+        self._pending_tokens = 0
+        self._lock = threading.Lock()
+    
+    def _take(self):
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        return batch
+    
+    def _run(self, batch):
+        try:
+            crew_results = run_batched_extraction([entry[0] for entry in batch], [entry[1] for entry in batch])
+            for (_, _, rules, future), crew_result in zip(batch, crew_results):
+                future.set_result(apply_rules(crew_result, rules))
+        except Exception as e:
+            for entry in batch:
+                if not entry[3].done():
+                    entry[3].set_exception(e)
+    
+    def extract(self, ocr_result):
+        rules, response = rules_tier(ocr_result)
+        if response is not None:
+            return response
+        content = batchable_content(ocr_result)
+        if content is None:
+            return apply_rules(process_with_crewai(ocr_result), rules)
+        
+        tokens = count_tokens(content)
+        future = Future()
+        ready = []
+        with self._lock:
+            if self._pending and self._pending_tokens + tokens > self.token_budget:
+                ready.append(self._take())
+            self._pending.append((ocr_result, content, rules, future))
+            self._pending_tokens += tokens
+            if len(self._pending) >= self.max_documents:
+                ready.append(self._take())
+        for batch in ready:
+            self._run(batch)
+        
+        if not wait([future], timeout=self.linger_seconds).done:
+            with self._lock:
+                batch = self._take() if any(entry[3] is future for entry in self._pending) else None
+            if batch:
+                self._run(batch)
+        return future.result()
+
+_extraction_batcher = None
+_extraction_batcher_lock = threading.Lock()
+
+def get_extraction_batcher():
+    """Return the process-wide extraction batcher"""
+    global _extraction_batcher
+    with _extraction_batcher_lock:
+        if _extraction_batcher is None:
+            _extraction_batcher = ExtractionBatcher()
+        return _extraction_batcher
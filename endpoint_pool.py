@@ -0,0 +1,250 @@
+"""
+Pool of Azure Document Intelligence resources
+Each analysis goes to the healthy endpoint with the fewest requests in flight; an analysis still
+running past the pool's observed p95 latency is hedged with a duplicate on a second endpoint
+"""
+
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import metrics
+from azure_settings import endpoints as configured_endpoints
+from azure_client import get_client, CircuitBreaker
+from lro_polling import CompletionHistory
+from config import (
+    AZURE_DI_HEDGING_ENABLED,
+    AZURE_DI_HEDGE_PERCENTILE,
+    AZURE_DI_HEDGE_MIN_SAMPLES,
+    AZURE_DI_HEDGE_MIN_DELAY_SECONDS,
+    AZURE_DI_HEDGE_MAX_SHARE,
+    AZURE_DI_HEDGE_WORKERS,
+    AZURE_DI_ENDPOINT_LATENCY_WINDOW,
+    AZURE_DI_CIRCUIT_FAILURE_THRESHOLD,
+    AZURE_DI_CIRCUIT_RESET_SECONDS
+)
+
+
+class PoolEndpoint:
+    """One resource of the pool: requests in flight, recent latencies and analysis failures"""
+
+    def __init__(self, url, key, window=AZURE_DI_ENDPOINT_LATENCY_WINDOW):
+        self.url = url
+        self.key = key
+        self.outstanding = 0
+        # Observed seconds divided by the size-based prior, so documents of any size are comparable
+        self.latency_ratios = deque(maxlen=window)
+        # Analyses that fail end to end (bad key, failed operations, retries used up), not single HTTP attempts
+        self.breaker = CircuitBreaker(AZURE_DI_CIRCUIT_FAILURE_THRESHOLD, AZURE_DI_CIRCUIT_RESET_SECONDS)
+        self.requests = 0
+        self.failures = 0
+        self.hedge_wins = 0
+
+    @property
+    def client(self):
+        return get_client(self.url, self.key)
+
+    def healthy(self):
+        """Not failing analyses, not failing HTTP requests and not paused by a Retry-After"""
+        policy = self.client.adaptive_retry_policy
+        return (self.breaker.allows_request()
+                and policy.circuit_breaker.allows_request()
+                and policy.rate_limiter.pause_remaining() == 0)
+
+
+class EndpointPool:
+    """
+    Least-outstanding-requests routing with optional hedging
+
+    analyze() picks the healthy endpoint with the fewest analyses in
+    flight (any endpoint when none is healthy) and runs the analysis on
+    the caller's thread. An analysis still running after the percentile
+    latency of the best healthy endpoint (scaled to the document's size)
+    is duplicated on another healthy endpoint and the first result wins,
+    so a slow endpoint is hedged against the fast ones. The slower
+    duplicate is left to finish in the background; at most
+    max_hedge_share of analyses are hedged.
+    """
+
+    def __init__(self, endpoints, hedging=AZURE_DI_HEDGING_ENABLED, percentile=AZURE_DI_HEDGE_PERCENTILE,
+                 min_samples=AZURE_DI_HEDGE_MIN_SAMPLES, min_delay=AZURE_DI_HEDGE_MIN_DELAY_SECONDS,
+                 max_hedge_share=AZURE_DI_HEDGE_MAX_SHARE, workers=AZURE_DI_HEDGE_WORKERS):
+        if not endpoints:
+            raise ValueError("No Azure Document Intelligence endpoint configured")
+        self.endpoints = [PoolEndpoint(url, key) for url, key in endpoints]
+        self.hedging = hedging and len(self.endpoints) > 1
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_hedge_share = max_hedge_share
+        self.workers = workers
+        self.requests = 0
+        self.hedges = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _acquire(self, exclude=None):
+        """Reserve the least busy endpoint; a hedge (exclude given) only goes to a healthy one"""
+        with self._lock:
+            candidates = [member for member in self.endpoints if member is not exclude]
+            healthy = [member for member in candidates if member.healthy()]
+            if exclude is not None:
+                if not healthy or self.hedges >= self.max_hedge_share * self.requests:
+                    return None
+                self.hedges += 1
+            candidates = healthy or candidates
+            fewest = min(member.outstanding for member in candidates)
+            member = random.choice([member for member in candidates if member.outstanding == fewest])
+            member.outstanding += 1
+            member.requests += 1
+        return member
+
+    def _call(self, member, operation, prior, won):
+        started = time.monotonic()
+        try:
+            result = operation(member.client, won)
+        except Exception:
+            member.breaker.record_failure()
+            with self._lock:
+                member.outstanding -= 1
+                member.failures += 1
+            metrics.increment("azure_endpoint_analyses_total", endpoint=member.url, outcome="error")
+            raise
+        if result is None and won.is_set():
+            # Abandoned because the other attempt won; its latency says nothing about this endpoint
+            with self._lock:
+                member.outstanding -= 1
+            return None
+        member.breaker.record_success()
+        with self._lock:
+            member.outstanding -= 1
+            member.latency_ratios.append((time.monotonic() - started) / prior)
+        metrics.increment("azure_endpoint_analyses_total", endpoint=member.url, outcome="success")
+        return result
+
+    def hedge_delay(self, prior):
+        """
+        Seconds after which an analysis is hedged, or None while the pool's history is too short
+
+        The threshold is the percentile latency of the best healthy
+        endpoint with min_samples analyses, or of all endpoints together
+        while none has that many.
+        """
+        with self._lock:
+            ratios = [np.array(member.latency_ratios) for member in self.endpoints
+                      if len(member.latency_ratios) >= self.min_samples and member.healthy()]
+            pooled = np.array([ratio for member in self.endpoints for ratio in member.latency_ratios])
+        if ratios:
+            ratio = min(float(np.percentile(member_ratios, self.percentile)) for member_ratios in ratios)
+        elif len(pooled) >= self.min_samples:
+            ratio = float(np.percentile(pooled, self.percentile))
+        else:
+            return None
+        return max(self.min_delay, ratio * prior)
+
+    def _claim_win(self, won):
+        """True for the first finished attempt of an analysis"""
+        with self._lock:
+            if won.is_set():
+                return False
+            won.set()
+            return True
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="azure-hedge")
+        return self._executor
+
+    def _hedge(self, primary, operation, prior, delay, primary_done, launched, won):
+        """Run the duplicate once the primary is delay seconds late; returns its result if it won, else None"""
+        if primary_done.wait(delay):
+            return None
+        secondary = self._acquire(exclude=primary)
+        if secondary is None:
+            return None
+        launched.set()
+        print(f"Analysis on {primary.url} passed the pool's p{self.percentile} ({delay:.1f}s); "
+              f"hedging on {secondary.url}")
+        result = self._call(secondary, operation, prior, won)
+        if result is None or not self._claim_win(won):
+            return None
+        with self._lock:
+            secondary.hedge_wins += 1
+        metrics.increment("azure_hedged_analyses_total", winner="hedge")
+        return result
+
+    def analyze(self, operation, page_count=1, size_bytes=0):
+        """
+        Run operation(client, abandoned) on the pool and return its result
+
+        operation performs one complete analysis with the given
+        DocumentIntelligenceClient and may be called twice when hedged.
+        It should stop waiting and return None once the abandoned event
+        is set (the other attempt won). page_count and size_bytes scale
+        the hedging delay.
+        """
+        prior = CompletionHistory.prior(page_count, size_bytes)
+        primary = self._acquire()
+        with self._lock:
+            self.requests += 1
+        won = threading.Event()
+        delay = self.hedge_delay(prior) if self.hedging else None
+        if delay is None:
+            return self._call(primary, operation, prior, won)
+
+        # The primary runs on this thread; only the duplicate uses the executor
+        primary_done, launched = threading.Event(), threading.Event()
+        hedge = self._get_executor().submit(metrics.propagate(self._hedge), primary, operation, prior, delay,
+                                            primary_done, launched, won)
+        try:
+            result = self._call(primary, operation, prior, won)
+        except Exception:
+            primary_done.set()
+            # An error is raised only when the duplicate (if any) failed as well
+            try:
+                result = hedge.result()
+            except Exception:
+                result = None
+            if result is None:
+                raise
+            return result
+        primary_done.set()
+        if result is not None and self._claim_win(won):
+            if launched.is_set():
+                metrics.increment("azure_hedged_analyses_total", winner="primary")
+            return result
+        return hedge.result()
+
+    def stats(self):
+        with self._lock:
+            members = [
+                {
+                    "endpoint": member.url,
+                    "outstanding": member.outstanding,
+                    "requests": member.requests,
+                    "failures": member.failures,
+                    "hedge_wins": member.hedge_wins,
+                    "samples": len(member.latency_ratios)
+                }
+                for member in self.endpoints
+            ]
+            totals = {"requests": self.requests, "hedges": self.hedges}
+        for stats, member in zip(members, self.endpoints):
+            stats["healthy"] = member.healthy()
+        return {**totals, "endpoints": members}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_endpoint_pool():
+    """Return the process-wide pool of the configured endpoints"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EndpointPool(configured_endpoints)
+    return _pool
@@ -6,12 +6,8 @@ This script demonstrates how to use the OCR and CrewAI processing programmatical
 import os
 import json
 from dotenv import load_dotenv
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
-import base64
-from crewai_processor import process_with_crewai
-from config import AZURE_DI_MODEL
+from ocr_processor import process_document, get_ocr_cache, endpoint, key, to_cacheable
+from crewai_processor import extract_document_data
 
 # Load environment variables
 load_dotenv()
@@ -26,46 +22,31 @@ def process_document_file(file_path):
     Returns:
         dict: Extracted document data
     """
-    # Initialize client
-    endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
-    key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
-    
     if not endpoint or not key:
         raise ValueError("Azure credentials not found. Please set them in .env file")
     
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=endpoint, credential=AzureKeyCredential(key)
-    )
-    
     # Read the file
     with open(file_path, "rb") as f:
         file_content = f.read()
     
-    # Convert to base64
-    base64_source = base64.b64encode(file_content).decode("utf-8")
-    
-    # Start analysis
+    # Start analysis (served from the shared OCR cache for previously seen files)
     print(f"Processing document: {file_path}")
-    poller = document_intelligence_client.begin_analyze_document(
-        AZURE_DI_MODEL,
-        analyze_request=AnalyzeDocumentRequest(base64_source=base64_source)
-    )
-    result = poller.result()
-    
-    # Extract content
-    full_content = result.content if hasattr(result, 'content') else ""
-    
-    print(f"✓ Document processed successfully")
-    print(f"  Pages: {len(result.pages)}")
-    print(f"  Characters extracted: {len(full_content)}")
-    
-    # Prepare result
-    ocr_result = {
-        "status": "success",
-        "full_content": full_content,
-        "pages": len(result.pages),
-        "document_type": os.path.splitext(file_path)[1].upper()
-    }
+    result = process_document(file_content, os.path.splitext(file_path)[1])
+    
+    if result["status"] != "success":
+        raise RuntimeError(f"Document processing failed: {result.get('message', 'Unknown error')}")
+    
+    print(f"✓ Document processed successfully{' (cached)' if result.get('cached') else ''}")
+    print(f"  Pages: {len(result['pages'])}")
+    print(f"  Characters extracted: {len(result['full_content'])}")
+    
+    ocr_cache = get_ocr_cache()
+    if ocr_cache:
+        cache_stats = ocr_cache.stats()
+        print(f"  OCR cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+    
+    # Prepare result (drop the SDK object so it can be saved as JSON)
+    ocr_result = to_cacheable(result)
     
     return ocr_result
 
@@ -101,10 +82,10 @@ def main():
     
     if choice == 'y':
         print("\n🤖 Processing with CrewAI...")
-        crew_result = process_with_crewai(ocr_result)
+        crew_result = extract_document_data(ocr_result)
         
         if crew_result["status"] == "success":
-            print("\n✓ CrewAI processing completed!\n")
+            print(f"\n✓ CrewAI processing completed! (source: {crew_result.get('source')})\n")
             print("=== Analysis Results ===")
             print(crew_result["result"])
             
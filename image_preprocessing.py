@@ -0,0 +1,141 @@
+"""
+Image preprocessing before upload to Azure Document Intelligence
+Applies EXIF orientation, downscales, optionally converts to grayscale and
+re-encodes as JPEG so large phone photos upload faster
+"""
+
+import io
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+import metrics
+from config import (
+    IMAGE_PREPROCESSING_ENABLED,
+    IMAGE_PREPROCESS_MIN_BYTES,
+    IMAGE_MAX_DIMENSION,
+    IMAGE_GRAYSCALE,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_PREPROCESS_WORKERS
+)
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg"]
+
+_pool = None
+_pool_lock = threading.Lock()
+_totals_lock = threading.Lock()
+_totals = {"images": 0, "preprocessed": 0, "bytes_saved": 0, "seconds": 0.0}
+
+
+def preprocessing_signature():
+    """Describe the settings that change preprocessed output (part of the OCR cache key)"""
+    if not IMAGE_PREPROCESSING_ENABLED:
+        return "off"
+    return f"{IMAGE_PREPROCESS_MIN_BYTES}/{IMAGE_MAX_DIMENSION}/{int(IMAGE_GRAYSCALE)}/{IMAGE_JPEG_QUALITY}"
+
+
+def preprocess_image(file_content, max_dimension=IMAGE_MAX_DIMENSION, grayscale=IMAGE_GRAYSCALE,
+                     quality=IMAGE_JPEG_QUALITY):
+    """
+    Shrink an image for upload
+
+    Returns:
+        tuple: (bytes_to_send, stats) where stats records original/processed
+        sizes, bytes saved, seconds spent, whether the re-encoded image was
+        used and the (x, y) scale from the sent image's pixels to the
+        original's (upright, after EXIF orientation)
+    """
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(file_content))
+
+    # Bake the EXIF orientation into the pixels
+    image = ImageOps.exif_transpose(image)
+    original_size = image.size
+
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    # JPEG has no alpha: put transparent areas on white instead of letting convert() turn them black
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+
+    if grayscale:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    processed = buffer.getvalue()
+
+    # Keep the original when re-encoding doesn't help
+    applied = len(processed) < len(file_content)
+    output = processed if applied else file_content
+    processed_size = image.size if applied else original_size
+
+    return output, {
+        "original_bytes": len(file_content),
+        "processed_bytes": len(output),
+        "bytes_saved": len(file_content) - len(output),
+        "original_size": list(original_size),
+        "processed_size": list(processed_size),
+        "scale": [original_size[0] / processed_size[0], original_size[1] / processed_size[1]],
+        "applied": applied,
+        "seconds": round(time.perf_counter() - started, 4)
+    }
+
+
+def _get_pool():
+    """Return the shared worker-process pool for CPU-bound encoding"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers avoid forking a process that is running threads
+            _pool = ProcessPoolExecutor(
+                max_workers=IMAGE_PREPROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pool
+
+
+def prepare_upload(file_content, file_extension):
+    """
+    Preprocess an image upload if enabled and worthwhile
+
+    Encoding runs in the shared worker pool (when IMAGE_PREPROCESS_WORKERS > 0)
+    so concurrent batch jobs don't serialize on it. Non-images, small images
+    and images Pillow can't read are returned unchanged with stats of None.
+    """
+    if (not IMAGE_PREPROCESSING_ENABLED
+            or file_extension.lower() not in IMAGE_EXTENSIONS
+            or len(file_content) < IMAGE_PREPROCESS_MIN_BYTES):
+        return file_content, None
+
+    try:
+        if IMAGE_PREPROCESS_WORKERS > 0:
+            output, stats = _get_pool().submit(preprocess_image, file_content).result()
+        else:
+            output, stats = preprocess_image(file_content)
+    except Exception as e:
+        print(f"Image preprocessing skipped: {str(e)}")
+        return file_content, None
+
+    with _totals_lock:
+        _totals["images"] += 1
+        _totals["preprocessed"] += int(stats["applied"])
+        _totals["bytes_saved"] += stats["bytes_saved"]
+        _totals["seconds"] += stats["seconds"]
+
+    metrics.increment("image_bytes_saved_total", stats["bytes_saved"])
+    print(f"Image preprocessing: {stats['original_bytes']} -> {stats['processed_bytes']} bytes in {stats['seconds']}s")
+    return output, stats
+
+
+def preprocessing_totals():
+    """Return process-wide preprocessing counters (images, bytes saved, seconds spent)"""
+    with _totals_lock:
+        return dict(_totals)
@@ -0,0 +1,75 @@
+"""
+Clients for submitting documents to the job API and polling their status
+The Streamlit app uses the HTTP client when JOB_API_URL is set, otherwise
+the same interface backed by in-process workers
+"""
+
+import json
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+from config import JOB_API_URL
+from job_queue import get_job_manager, QueueFullError, FINISHED_STATUSES
+
+
+class HttpJobClient:
+    """Client for a running api_server.py"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, data=None):
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method)
+        if data is not None:
+            request.add_header("Content-Type", "application/octet-stream")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise QueueFullError(f"Job API is busy, retry in {e.headers.get('Retry-After', 'a few')} seconds")
+            if e.code == 404 and method == "GET":
+                return None
+            raise RuntimeError(f"Job API returned {e.code}: {e.read().decode('utf-8', 'replace')}")
+
+    def submit(self, file_content, file_extension, enable_crewai=False, file_name=None):
+        """Queue a document and return its job id (raises QueueFullError when the server is at capacity)"""
+        params = {"ext": file_extension, "crewai": int(bool(enable_crewai))}
+        if file_name:
+            params["name"] = file_name
+        query = urlencode(params)
+        return self._request("POST", f"/jobs?{query}", data=file_content)["job_id"]
+
+    def status(self, job_id):
+        """Return the job's status and result, or None for an unknown id"""
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def page(self, job_id, page_number):
+        """Return the words and geometry of one page of a finished job, or None when no longer cached"""
+        return self._request("GET", f"/jobs/{job_id}/pages/{page_number}")
+
+
+class LocalJobClient:
+    """Same interface as HttpJobClient, using this process's job workers"""
+
+    def __init__(self):
+        self._manager = get_job_manager()
+
+    def submit(self, file_content, file_extension, enable_crewai=False, file_name=None):
+        return self._manager.submit(file_content, file_extension, enable_crewai, file_name)
+
+    def status(self, job_id):
+        return self._manager.status(job_id)
+
+    def page(self, job_id, page_number):
+        return self._manager.page(job_id, page_number)
+
+
+def is_finished(job):
+    return job is not None and job["status"] in FINISHED_STATUSES
+
+
+def get_job_client(api_url=JOB_API_URL):
+    """Return an HTTP client when api_url is set, otherwise an in-process client"""
+    return HttpJobClient(api_url) if api_url else LocalJobClient()
@@ -0,0 +1,471 @@
+"""
+Background job queue for document processing
+Workers run OCR (and optionally extraction) outside the UI; the queue is in-process by
+default or SQLite-backed so queued and finished jobs survive a restart
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+import metrics
+from lazy_imports import lazy_import
+from result_store import get_result_store, document_key
+from config import (
+    RESULT_STORE_ENABLED,
+    JOB_QUEUE_BACKEND,
+    JOB_QUEUE_PATH,
+    JOB_QUEUE_MAX_SIZE,
+    JOB_WORKERS,
+    JOB_RESULT_TTL_SECONDS,
+    JOB_PROGRESS_INTERVAL_SECONDS,
+    JOB_LEASE_SECONDS
+)
+
+# Loaded by the first job (or the pre-warm), so clients that only submit and poll stay light
+ocr_processor = lazy_import("ocr_processor")
+crewai_processor = lazy_import("crewai_processor")
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+def new_job(file_content, file_extension, enable_crewai, file_name=None):
+    return {
+        "job_id": uuid.uuid4().hex,
+        "status": "queued",
+        "file_name": file_name,
+        "file_extension": file_extension.lower(),
+        "enable_crewai": bool(enable_crewai),
+        "file_content": file_content,
+        "result": None,
+        "progress": None,
+        "message": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None
+    }
+
+
+class MemoryJobQueue:
+    """In-process queue; jobs are lost when the process exits"""
+
+    def __init__(self, max_size=JOB_QUEUE_MAX_SIZE, result_ttl_seconds=JOB_RESULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.result_ttl_seconds = result_ttl_seconds
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        with self._lock:
+            self._expire()
+            if self._queue.qsize() >= self.max_size:
+                raise QueueFullError(f"Job queue is full ({self.max_size} jobs waiting)")
+            self._jobs[job["job_id"]] = job
+            self._queue.put(job["job_id"])
+
+    def claim(self, timeout=None):
+        """Take the oldest queued job and mark it running, or return None after timeout"""
+        try:
+            job_id = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update({"status": "running", "started_at": time.time()})
+            return dict(job)
+
+    def report_progress(self, job_id, progress):
+        """Publish partial results of a running job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job["progress"] = progress
+
+    def update_progress(self, job_id, **fields):
+        """Change some fields of a running job's published progress"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["progress"] is not None:
+                job["progress"] = {**job["progress"], **fields}
+
+    def finish(self, job_id, status, result=None, message=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                # The upload and partial results are no longer needed once the job is done
+                job.update({
+                    "status": status, "result": result, "progress": None, "message": message,
+                    "file_content": None, "finished_at": time.time()
+                })
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {"queued": self._queue.qsize(), "max_size": self.max_size, "jobs": counts}
+
+    def _expire(self):
+        now = time.time()
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATUSES and now - job["finished_at"] > self.result_ttl_seconds
+        ]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobQueue:
+    """
+    Durable queue backed by SQLite
+
+    Several worker processes may share the same database file. A running
+    job is leased to the process working on it; when that process stops
+    renewing the lease (it exited or crashed), the job is claimed again.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, max_size=JOB_QUEUE_MAX_SIZE, result_ttl_seconds=JOB_RESULT_TTL_SECONDS,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_size = max_size
+        self.result_ttl_seconds = result_ttl_seconds
+        self.lease_seconds = lease_seconds
+        # Jobs are leased to one queue instance; other processes requeue them only once the lease expires
+        self.owner = uuid.uuid4().hex
+        self._available = threading.Condition()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                file_name TEXT,
+                file_extension TEXT NOT NULL,
+                enable_crewai INTEGER NOT NULL,
+                file_content BLOB,
+                result TEXT,
+                progress TEXT,
+                message TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                lease_expires REAL
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("file_name", "TEXT"), ("progress", "TEXT"), ("owner", "TEXT"), ("lease_expires", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at)")
+        self._conn.commit()
+        threading.Thread(target=self._renew_leases, name="job-lease-heartbeat", daemon=True).start()
+
+    def put(self, job):
+        with self._lock:
+            self._expire()
+            queued = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_size:
+                raise QueueFullError(f"Job queue is full ({self.max_size} jobs waiting)")
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, file_name, file_extension, enable_crewai, file_content, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job["job_id"], job["file_name"], job["file_extension"], int(job["enable_crewai"]),
+                 sqlite3.Binary(job["file_content"]), job["created_at"])
+            )
+            self._conn.commit()
+        with self._available:
+            self._available.notify()
+
+    def claim(self, timeout=None):
+        """
+        Take the oldest queued job and lease it to this queue, or return None after timeout
+
+        A running job whose lease has expired (its process stopped or
+        crashed) is claimed again like a queued one.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.time()
+                claimable = ("(status = 'queued' OR (status = 'running' "
+                             "AND (lease_expires IS NULL OR lease_expires < ?)))")
+                row = self._conn.execute(
+                    f"SELECT job_id FROM jobs WHERE {claimable} ORDER BY created_at LIMIT 1", (now,)
+                ).fetchone()
+                if row is not None:
+                    claimed = self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, progress = NULL, owner = ?, "
+                        f"lease_expires = ? WHERE job_id = ? AND {claimable}",
+                        (now, self.owner, now + self.lease_seconds, row[0], now)
+                    ).rowcount
+                    self._conn.commit()
+                    if claimed:
+                        return self._get(row[0], include_content=True)
+                    continue
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            # Another process may add jobs, so wake up periodically as well as on notify
+            with self._available:
+                self._available.wait(1.0 if remaining is None else min(remaining, 1.0))
+
+    def _renew_leases(self):
+        """Extend the leases of this queue's running jobs while the process is alive"""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status = 'running'",
+                        (time.time() + self.lease_seconds, self.owner)
+                    )
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Could not renew job leases: {str(e)}")
+
+    def report_progress(self, job_id, progress):
+        """Publish partial results of a running job"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ? WHERE job_id = ? AND status = 'running' AND owner = ?",
+                (json.dumps(progress, ensure_ascii=False), job_id, self.owner)
+            )
+            self._conn.commit()
+
+    def update_progress(self, job_id, **fields):
+        """Change some fields of a running job's published progress, leaving the rest (e.g. ocr_result) as stored"""
+        paths = ", ".join("?, ?" for _ in fields)
+        values = [value for name, value in fields.items() for value in (f"$.{name}", value)]
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET progress = json_set(progress, {paths}) "
+                "WHERE job_id = ? AND status = 'running' AND owner = ? AND progress IS NOT NULL",
+                (*values, job_id, self.owner)
+            )
+            self._conn.commit()
+
+    def finish(self, job_id, status, result=None, message=None):
+        # A job requeued after its lease expired belongs to its new owner
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, progress = NULL, message = ?, file_content = NULL, "
+                "finished_at = ?, owner = NULL, lease_expires = NULL WHERE job_id = ? AND owner = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 message, time.time(), job_id, self.owner)
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get(job_id)
+
+    def _get(self, job_id, include_content=False):
+        row = self._conn.execute(
+            "SELECT job_id, status, file_name, file_extension, enable_crewai, file_content, result, progress, "
+            "message, created_at, started_at, finished_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "file_name": row[2],
+            "file_extension": row[3],
+            "enable_crewai": bool(row[4]),
+            "file_content": bytes(row[5]) if include_content and row[5] is not None else None,
+            "result": json.loads(row[6]) if row[6] else None,
+            "progress": json.loads(row[7]) if row[7] else None,
+            "message": row[8],
+            "created_at": row[9],
+            "started_at": row[10],
+            "finished_at": row[11]
+        }
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            return {"queued": counts.get("queued", 0), "max_size": self.max_size, "jobs": counts}
+
+    def _expire(self):
+        self._conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            FINISHED_STATUSES + (time.time() - self.result_ttl_seconds,)
+        )
+
+
+class ProgressReporter:
+    """
+    Collects a running job's partial results and publishes them to the queue
+
+    Progress is {"stage": "ocr", "pages": [{"page_number", "text"}, ...]}
+    while pages are read, then {"stage": "extraction", "ocr_result",
+    "llm_output"} while the LLM streams its answer. The OCR result is
+    published once when extraction starts; later publishes only update
+    llm_output. Publishing is throttled to JOB_PROGRESS_INTERVAL_SECONDS;
+    stage changes are published at once.
+    """
+
+    def __init__(self, job_queue, job_id, interval=JOB_PROGRESS_INTERVAL_SECONDS):
+        self.queue = job_queue
+        self.job_id = job_id
+        self.interval = interval
+        self._pages = []
+        self._ocr_result = None
+        self._tokens = []
+        self._published = 0.0
+
+    def add_page(self, page):
+        self._pages.append({
+            "page_number": page["page_number"],
+            "text": "\n".join(line["content"] for line in page["lines"])
+        })
+        self._publish()
+
+    def start_extraction(self, ocr_result):
+        self._pages = []
+        self._ocr_result = ocr_result
+        self._publish(force=True)
+
+    def add_token(self, token):
+        self._tokens.append(token)
+        self._publish()
+
+    def _publish(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._published < self.interval:
+            return
+        self._published = now
+        try:
+            if self._ocr_result is None:
+                self.queue.report_progress(self.job_id, {"stage": "ocr", "pages": list(self._pages)})
+            elif force:
+                self.queue.report_progress(self.job_id, {"stage": "extraction", "ocr_result": self._ocr_result,
+                                                         "llm_output": "".join(self._tokens)})
+            else:
+                self.queue.update_progress(self.job_id, llm_output="".join(self._tokens))
+        except Exception as e:
+            print(f"Could not report progress of job {self.job_id}: {str(e)}")
+
+
+def run_job(job, progress=None):
+    """Process one job's document and return (status, result, message), streaming partial results to progress"""
+    with metrics.trace_document(job["job_id"]) as trace:
+        metrics.record("job.queue_wait", job["started_at"] - job["created_at"])
+        ocr_result = ocr_processor.process_document(job["file_content"], job["file_extension"],
+                                                    on_page=progress.add_page if progress else None)
+        if ocr_result["status"] != "success":
+            return "failed", None, ocr_result.get("message", "Unknown error")
+
+        # Extraction and the result store get the full result; the job keeps what clients display
+        full_result = ocr_processor.to_cacheable(ocr_result)
+        cache_key = ocr_processor.ocr_cache_key(job["file_content"]) if ocr_processor.get_ocr_cache() else None
+        result = {"ocr_result": ocr_processor.client_result(full_result, cache_key), "crew_result": None}
+        if job["enable_crewai"]:
+            if progress:
+                progress.start_extraction(result["ocr_result"])
+            try:
+                result["crew_result"] = crewai_processor.extract_document_data(
+                    full_result, on_token=progress.add_token if progress else None)
+                if "result" in result["crew_result"]:
+                    # CrewOutput objects can't be serialized for the SQLite queue, the API or session storage
+                    result["crew_result"]["result"] = str(result["crew_result"]["result"])
+            except Exception as e:
+                result["crew_result"] = {"status": "error", "message": str(e)}
+
+        if RESULT_STORE_ENABLED:
+            # Storing is best effort; the job result is still returned if it fails
+            try:
+                with metrics.span("store.save"):
+                    get_result_store().save(
+                        document_key(job["file_content"]), job.get("file_name"), full_result,
+                        crewai_processor.extraction_data(result["crew_result"]),
+                        (result["crew_result"] or {}).get("source")
+                    )
+            except Exception as e:
+                print(f"Could not store result of job {job['job_id']}: {str(e)}")
+    result["timings"] = trace.breakdown()
+    return "succeeded", result, None
+
+
+class JobManager:
+    """Accepts jobs and runs them on a pool of background worker threads"""
+
+    def __init__(self, job_queue, workers=JOB_WORKERS):
+        self.queue = job_queue
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, file_content, file_extension, enable_crewai=False, file_name=None):
+        """Queue a document and return its job id (raises QueueFullError when at capacity)"""
+        job = new_job(file_content, file_extension, enable_crewai, file_name)
+        self.queue.put(job)
+        return job["job_id"]
+
+    def status(self, job_id):
+        """Return the job without its upload, or None for an unknown id"""
+        job = self.queue.get(job_id)
+        if job is not None:
+            job.pop("file_content", None)
+        return job
+
+    def stats(self):
+        return self.queue.stats()
+
+    def page(self, job_id, page_number):
+        """Words and geometry of one page of a finished job (from the OCR cache), or None"""
+        job = self.queue.get(job_id)
+        ocr_result = ((job or {}).get("result") or {}).get("ocr_result") or {}
+        return ocr_processor.cached_page(ocr_result.get("cache_key"), page_number)
+
+    def _work(self):
+        while True:
+            job = self.queue.claim(timeout=5)
+            if job is None:
+                continue
+            try:
+                status, result, message = run_job(job, ProgressReporter(self.queue, job["job_id"]))
+            except Exception as e:
+                status, result, message = "failed", None, str(e)
+            self.queue.finish(job["job_id"], status, result, message)
+            print(f"Job {job['job_id']} {status} in {time.time() - job['started_at']:.2f}s")
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Return the process-wide job manager, starting its workers on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            if JOB_QUEUE_BACKEND == "sqlite":
+                job_queue = SQLiteJobQueue()
+            else:
+                job_queue = MemoryJobQueue()
+            _manager = JobManager(job_queue)
+    return _manager
@@ -0,0 +1,192 @@
+"""
+Deferred loading of heavy modules and startup-time reporting
+Modules that pull in CrewAI/LangChain, the Azure SDK, PyPDF2 or PIL are imported on first use;
+an optional background pre-warm loads them and builds clients right after startup
+
+Usage:
+    python lazy_imports.py              # Import-time breakdown of app.py by package
+    python lazy_imports.py api_server --top 30
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+import threading
+from collections import defaultdict
+import metrics
+from config import PREWARM_ENABLED, PREWARM_MODULES
+
+# Reference point for the startup report: the app/API imports this module first
+_started = time.perf_counter()
+_ready_seconds = None
+_load_times = {}  # module name -> seconds its first import took (including the modules it imported)
+_prewarm = {"state": "disabled" if not PREWARM_ENABLED else "idle", "seconds": None, "steps": [], "errors": []}
+_lock = threading.Lock()
+
+
+def import_module(name):
+    """Import a module, recording how long its first import took"""
+    first = name not in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    if first:
+        seconds = time.perf_counter() - started
+        with _lock:
+            _load_times.setdefault(name, seconds)
+        metrics.record("startup.import", seconds, module=name)
+        print(f"Loaded {name} in {seconds:.2f}s")
+    return module
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(import_module(self._name), attribute)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+
+def lazy_import(name):
+    """Return a stand-in for module name; nothing is imported until an attribute is used"""
+    return LazyModule(name)
+
+
+def loaded(name):
+    """
+    The module if it has been fully imported already, else None
+
+    Used for statistics that are empty until the module is first used, so
+    showing them doesn't load it.
+    """
+    module = sys.modules.get(name)
+    # A module being imported by another thread (e.g. the pre-warm) is already in sys.modules
+    if module is None or getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return None
+    return module
+
+
+def mark_ready():
+    """Record the time from startup to the first served page or request (only the first call counts)"""
+    global _ready_seconds
+    with _lock:
+        if _ready_seconds is None:
+            _ready_seconds = time.perf_counter() - _started
+            metrics.record("startup.ready", _ready_seconds)
+
+
+def startup_report():
+    """Seconds to the first page/request, per lazily loaded module (slowest first) and the pre-warm state"""
+    with _lock:
+        modules = sorted(_load_times.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "ready_seconds": _ready_seconds,
+            "modules": [{"module": name, "seconds": round(seconds, 3)} for name, seconds in modules],
+            "prewarm": {**_prewarm, "steps": list(_prewarm["steps"]), "errors": list(_prewarm["errors"])}
+        }
+
+
+def _warm_clients():
+    """Build the Document Intelligence clients, result caches and one CrewAI agent"""
+    pool = import_module("endpoint_pool").get_endpoint_pool()
+    for member in pool.endpoints:
+        member.client
+
+    ocr_processor = import_module("ocr_processor")
+    ocr_processor.get_ocr_cache()
+    ocr_processor.get_page_cache()
+
+    crewai_processor = import_module("crewai_processor")
+    crewai_processor.get_llm_cache()
+    if os.getenv("OPENAI_API_KEY"):
+        crewai_processor.get_crew_pool().prewarm(1)
+
+
+def prewarm_steps():
+    """(name, callable) pairs run by the pre-warm: the PREWARM_MODULES imports, then the clients"""
+    steps = [(name, lambda name=name: import_module(name)) for name in PREWARM_MODULES]
+    steps.append(("clients", _warm_clients))
+    return steps
+
+
+def _run_prewarm(steps):
+    started = time.perf_counter()
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Pre-warm step {name} failed: {e}")
+            with _lock:
+                _prewarm["errors"].append(f"{name}: {e}")
+            continue
+        with _lock:
+            _prewarm["steps"].append({"step": name, "seconds": round(time.perf_counter() - step_started, 3)})
+    with _lock:
+        _prewarm["state"] = "done"
+        _prewarm["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Pre-warm finished in {_prewarm['seconds']:.2f}s")
+
+
+def start_prewarm(steps=None):
+    """
+    Run the pre-warm in a background thread, once per process
+
+    The first request then finds the modules imported and the clients
+    built. Does nothing when PREWARM_ENABLED is False. A request that
+    needs a module the pre-warm is still importing waits for that import
+    (Python's import lock) instead of importing it twice.
+    """
+    with _lock:
+        if _prewarm["state"] != "idle":
+            return
+        _prewarm["state"] = "running"
+    threading.Thread(target=_run_prewarm, args=(steps or prewarm_steps(),), name="prewarm", daemon=True).start()
+
+
+def import_time_breakdown(module, top=20):
+    """
+    Import module in a fresh interpreter with -X importtime
+
+    Returns (total_seconds, [(package, seconds)]): the time spent in each
+    top-level package's own modules, slowest first.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed")
+
+    packages = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us)
+    total = sum(packages.values()) / 1e6
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total, [(package, microseconds / 1e6) for package, microseconds in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown of a module by package")
+    parser.add_argument("module", nargs="?", default="app", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=20, help="Number of packages to list")
+    args = parser.parse_args()
+
+    total, packages = import_time_breakdown(args.module, args.top)
+    print(f"⏱️  import {args.module}: {total:.2f}s")
+    for package, seconds in packages:
+        print(f"   {package:<32} {seconds:>7.3f}s  {seconds / total:>5.1%}" if total else f"   {package}")
+
+
+if __name__ == "__main__":
+    main()
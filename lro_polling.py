@@ -0,0 +1,191 @@
+"""
+Adaptive polling for Azure Document Intelligence analyze operations
+The first status check is timed from the predicted completion time (file size, page count and
+observed history) instead of the SDK's fixed interval, then polls back off from a short delay
+"""
+
+import json
+import time
+import threading
+from datetime import datetime
+from azure.core.polling.base_polling import LROBasePolling
+import metrics
+from pdf_splitter import count_pdf_pages
+from config import (
+    AZURE_DI_POLL_MIN_SECONDS,
+    AZURE_DI_POLL_MAX_SECONDS,
+    AZURE_DI_POLL_BACKOFF,
+    AZURE_DI_POLL_FIRST_FRACTION,
+    AZURE_DI_POLL_PRIOR_SECONDS,
+    AZURE_DI_POLL_PRIOR_SECONDS_PER_PAGE,
+    AZURE_DI_POLL_PRIOR_SECONDS_PER_MB
+)
+
+FINISHED_STATUSES = ("succeeded", "failed", "canceled")
+
+
+def document_profile(file_content, page_count=None):
+    """(kind, page_count, size_bytes) used to predict how long an analysis takes"""
+    if file_content[:5] == b"%PDF-":
+        return "pdf", page_count or count_pdf_pages(file_content) or 1, len(file_content)
+    return "image", page_count or 1, len(file_content)
+
+
+def service_processing_seconds(body):
+    """Processing time reported by the service (lastUpdatedDateTime - createdDateTime), or None"""
+    try:
+        created, updated = (datetime.fromisoformat(body[field].replace("Z", "+00:00"))
+                            for field in ("createdDateTime", "lastUpdatedDateTime"))
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+    return max((updated - created).total_seconds(), 0.0)
+
+
+def _page_bucket(page_count):
+    if page_count <= 1:
+        return "1"
+    if page_count <= 4:
+        return "2-4"
+    if page_count <= 10:
+        return "5-10"
+    return "11+"
+
+
+class CompletionHistory:
+    """
+    Predicts analysis durations from a size-based prior, corrected by history
+
+    For each (kind, page bucket) an exponential moving average of
+    observed / prior is kept, so the prediction follows what the service
+    actually does for similar documents.
+    """
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self._ratios = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def prior(page_count, size_bytes):
+        return (AZURE_DI_POLL_PRIOR_SECONDS
+                + AZURE_DI_POLL_PRIOR_SECONDS_PER_PAGE * page_count
+                + AZURE_DI_POLL_PRIOR_SECONDS_PER_MB * size_bytes / (1024 * 1024))
+
+    def predict(self, kind, page_count, size_bytes):
+        with self._lock:
+            ratio = self._ratios.get((kind, _page_bucket(page_count)), 1.0)
+        return self.prior(page_count, size_bytes) * ratio
+
+    def observe(self, kind, page_count, size_bytes, seconds):
+        ratio = seconds / self.prior(page_count, size_bytes)
+        key = (kind, _page_bucket(page_count))
+        with self._lock:
+            previous = self._ratios.get(key)
+            self._ratios[key] = ratio if previous is None else previous + self.alpha * (ratio - previous)
+
+
+completion_history = CompletionHistory()
+
+_polling_totals = {"operations": 0, "polls": 0, "server_seconds": 0.0, "idle_seconds": 0.0}
+_polling_totals_lock = threading.Lock()
+
+
+def polling_report():
+    """
+    Time spent waiting on Azure, split into estimated server-side processing
+    and idle time between completion and the status check that noticed it
+    """
+    with _polling_totals_lock:
+        report = dict(_polling_totals)
+    waited = report["server_seconds"] + report["idle_seconds"]
+    report["polls_per_operation"] = report["polls"] / report["operations"] if report["operations"] else 0.0
+    report["idle_share"] = report["idle_seconds"] / waited if waited else 0.0
+    return report
+
+
+class AdaptivePollingMixin:
+    """Delay schedule and bookkeeping of AdaptiveLROPolling"""
+
+    def __init__(self, kind, page_count, size_bytes, history=None, **kwargs):
+        super().__init__(timeout=AZURE_DI_POLL_MIN_SECONDS, **kwargs)
+        self._kind = kind
+        self._page_count = page_count
+        self._size_bytes = size_bytes
+        self._history = history or completion_history
+        self._predicted = self._history.predict(kind, page_count, size_bytes)
+        self._submitted = time.monotonic()
+        self._last_running = None
+        self._polls = 0
+        self._recorded = False
+
+    def initialize(self, *args, **kwargs):
+        # The operation exists from the moment the analyze request is accepted
+        self._submitted = time.monotonic()
+        return super().initialize(*args, **kwargs)
+
+    def first_delay(self):
+        """Wait for most of the predicted processing time before the first status check"""
+        delay = self._predicted * AZURE_DI_POLL_FIRST_FRACTION - (time.monotonic() - self._submitted)
+        return min(max(delay, AZURE_DI_POLL_MIN_SECONDS), AZURE_DI_POLL_MAX_SECONDS * 4)
+
+    def _extract_delay(self):
+        # Running-status Retry-After hints are ignored: they are coarser than the backoff below
+        return min(AZURE_DI_POLL_MIN_SECONDS * AZURE_DI_POLL_BACKOFF ** max(self._polls - 1, 0),
+                   AZURE_DI_POLL_MAX_SECONDS)
+
+    def _response_body(self):
+        try:
+            return json.loads(self._pipeline_response.http_response.text())
+        except Exception:
+            return None
+
+    def _observe_status(self):
+        now = time.monotonic()
+        self._polls += 1
+        status = str(self.status()).lower()
+        if status not in FINISHED_STATUSES:
+            self._last_running = now
+            return
+        if self._recorded:
+            return
+        self._recorded = True
+
+        # Completion lies between the last "running" answer (or the submit) and this check
+        earliest = (self._last_running or self._submitted) - self._submitted
+        latest = now - self._submitted
+        reported = service_processing_seconds(self._response_body())
+        if reported is not None:
+            # The service's own timestamps; they are often whole seconds, so keep them within the observed bounds
+            server_seconds = min(max(reported, earliest), latest)
+        elif self._last_running is None:
+            # No timestamps and finished by the first check: the processing time is at most the wait so far
+            server_seconds = latest
+        else:
+            # Finished between the last "running" answer and this one; assume halfway
+            server_seconds = (earliest + latest) / 2
+        idle_seconds = latest - server_seconds
+        if status == "succeeded":
+            self._history.observe(self._kind, self._page_count, self._size_bytes, max(server_seconds, 0.05))
+
+        with _polling_totals_lock:
+            _polling_totals["operations"] += 1
+            _polling_totals["polls"] += self._polls
+            _polling_totals["server_seconds"] += server_seconds
+            _polling_totals["idle_seconds"] += idle_seconds
+        metrics.increment("azure_polls_total", self._polls)
+        metrics.record("azure.server_processing", server_seconds)
+        metrics.record("azure.poll_idle", idle_seconds)
+
+
+class AdaptiveLROPolling(AdaptivePollingMixin, LROBasePolling):
+    """LROBasePolling with a predicted first poll and short backoff"""
+
+    def run(self):
+        if not self.finished():
+            self._sleep(self.first_delay())
+        super().run()
+
+    def update_status(self):
+        super().update_status()
+        self._observe_status()
+
@@ -0,0 +1,262 @@
+"""
+Lightweight instrumentation for the OCR/CrewAI pipeline
+Stage timers (spans) and counters, exported as Prometheus text and structured JSON logs.
+When METRICS_ENABLED is False every call returns immediately.
+"""
+
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from config import METRICS_ENABLED, METRICS_JSON_LOGS
+
+METRIC_PREFIX = "ocr_pipeline_"
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_NOOP = nullcontext()
+_current_trace = contextvars.ContextVar("document_trace", default=None)
+_collectors = []
+_collectors_lock = threading.Lock()
+
+
+class MetricsRegistry:
+    """Process-wide counters and stage-duration histograms"""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=()):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """Counters and per-stage totals as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "stages": [
+                    {"name": name, "labels": dict(labels), "count": h["count"], "seconds": round(h["sum"], 6)}
+                    for (name, labels), h in sorted(self._histograms.items())
+                ]
+            }
+
+    def prometheus_text(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            histograms = [(key, {**h, "buckets": list(h["buckets"])}) for key, h in histograms]
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram["buckets"]):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+registry = MetricsRegistry()
+
+
+class DocumentTrace:
+    """Stage timings for one document, collected from every span recorded while it is active"""
+
+    def __init__(self, name=None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+
+    def add(self, stage, seconds):
+        self.spans.append((stage, seconds))
+
+    def breakdown(self):
+        """Total seconds and call count per stage, in order of first occurrence"""
+        stages = {}
+        for stage, seconds in self.spans:
+            entry = stages.setdefault(stage, {"stage": stage, "seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+        return [{**entry, "seconds": round(entry["seconds"], 4)} for entry in stages.values()]
+
+
+class _NullTrace:
+    trace_id = None
+    seconds = None
+
+    def breakdown(self):
+        return []
+
+
+class _TraceContext:
+    def __init__(self, name):
+        self.trace = DocumentTrace(name)
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_trace.reset(self._token)
+        self.trace.seconds = round(time.perf_counter() - self.trace.started, 4)
+        if METRICS_JSON_LOGS:
+            print(json.dumps({
+                "event": "document_timing",
+                "trace_id": self.trace.trace_id,
+                "document": self.trace.name,
+                "status": "error" if exc_type else "ok",
+                "seconds": self.trace.seconds,
+                "stages": self.trace.breakdown()
+            }, ensure_ascii=False))
+        return False
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "started")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def span(stage, **labels):
+    """Context manager timing one pipeline stage (e.g. "azure.poll")"""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Span(stage, labels)
+
+
+def record(stage, seconds, **labels):
+    """Record a stage duration measured elsewhere (e.g. time spent waiting in a queue)"""
+    if not METRICS_ENABLED:
+        return
+    registry.observe("stage_seconds", seconds, (("stage", stage),) + tuple(sorted(labels.items())))
+    if _collectors:
+        with _collectors_lock:
+            for durations in _collectors:
+                durations.setdefault(stage, []).append(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+def increment(name, value=1, **labels):
+    """Add value to a counter (e.g. increment("cache_requests_total", cache="ocr", result="hit"))"""
+    if not METRICS_ENABLED:
+        return
+    registry.increment(name, value, tuple(sorted(labels.items())))
+
+
+def trace_document(name=None):
+    """
+    Collect the spans of one document's processing
+
+    Use as `with trace_document(path) as trace: ...`; afterwards
+    trace.breakdown() lists the seconds per stage. Work submitted to other
+    threads is included when wrapped with propagate().
+    """
+    if not METRICS_ENABLED:
+        return nullcontext(_NullTrace())
+    return _TraceContext(name)
+
+
+@contextmanager
+def collect_spans():
+    """
+    Collect every stage duration recorded in the process while active
+
+    Use as `with collect_spans() as durations: ...`; durations maps each
+    stage to the list of its recorded seconds (from all threads), e.g.
+    for percentiles in a benchmark.
+    """
+    durations = {}
+    with _collectors_lock:
+        _collectors.append(durations)
+    try:
+        yield durations
+    finally:
+        with _collectors_lock:
+            _collectors.remove(durations)
+
+
+def propagate(fn):
+    """Wrap fn so spans it records in a worker thread count towards the caller's document trace"""
+    if not METRICS_ENABLED:
+        return fn
+    trace = _current_trace.get()
+    if trace is None:
+        return fn
+
+    def run_in_trace(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+    return run_in_trace
+
+
+def prometheus_text():
+    return registry.prometheus_text()
+
+
+def snapshot():
+    return registry.snapshot()
@@ -0,0 +1,350 @@
+"""
+Local stand-ins for Azure Document Intelligence and the OpenAI chat completions API
+Used by benchmark.py to exercise the whole pipeline without spending Azure or OpenAI quota
+
+Usage:
+    python mock_services.py --azure-port 8801 --openai-port 8802 --latency 1.5 --throttle-rate 0.05
+    AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT=http://127.0.0.1:8801 OPENAI_BASE_URL=http://127.0.0.1:8802/v1 ...
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pdf_splitter import count_pdf_pages
+
+ANALYZE_PATH = re.compile(r"^/documentintelligence/documentModels/([^/:]+):analyze$")
+RESULT_PATH = re.compile(r"^/documentintelligence/documentModels/([^/]+)/analyzeResults/([^/]+)$")
+DOCUMENT_SECTION = re.compile(r"=== DOCUMENT (\d+) ===")
+
+SAMPLE_LINES = [
+    "TAX INVOICE",
+    "Invoice No: INV-{document}-{page}",
+    "Invoice Date: 12/03/2024",
+    "Supplier: Gulf Office Supplies L.L.C",
+    "Customer: ACME General Trading",
+    "TRN: 100234567800003",
+    "Description Qty Unit Price Amount"
+] + [f"Item {i}: A4 paper ream, 80gsm 10 25.00 250.00" for i in range(1, 13)] + [
+    "Subtotal: 3,000.00",
+    "VAT 5%: 150.00",
+    "Total Due: 3,150.00",
+    "Page {page}"
+]
+
+
+def iso_timestamp(seconds):
+    """UTC ISO 8601 timestamp with milliseconds, as in analyze operation status responses"""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{int(seconds % 1 * 1000):03d}Z"
+
+
+def synthetic_analyze_result(page_count, model_id, document_id="0001"):
+    """Build an AnalyzeResult payload (REST JSON shape) with page_count invoice-like pages"""
+    content_lines = []
+    pages = []
+    offset = 0
+    for page_number in range(1, page_count + 1):
+        page_offset = offset
+        lines, words = [], []
+        for row, template in enumerate(SAMPLE_LINES):
+            text = template.format(document=document_id, page=page_number)
+            y = 0.5 + row * 0.4
+            lines.append({
+                "content": text,
+                "polygon": [0.5, y, 7.5, y, 7.5, y + 0.3, 0.5, y + 0.3],
+                "spans": [{"offset": offset, "length": len(text)}]
+            })
+            word_offset = offset
+            for word in text.split(" "):
+                x = 0.5 + (word_offset - offset) * 0.08
+                words.append({
+                    "content": word,
+                    "polygon": [x, y, x + len(word) * 0.08, y, x + len(word) * 0.08, y + 0.3, x, y + 0.3],
+                    "confidence": 0.99,
+                    "span": {"offset": word_offset, "length": len(word)}
+                })
+                word_offset += len(word) + 1
+            content_lines.append(text)
+            offset += len(text) + 1
+        pages.append({
+            "pageNumber": page_number,
+            "angle": 0,
+            "width": 8.5,
+            "height": 11,
+            "unit": "inch",
+            "spans": [{"offset": page_offset, "length": offset - page_offset}],
+            "lines": lines,
+            "words": words,
+            "barcodes": []
+        })
+
+    return {
+        "apiVersion": "2024-11-30",
+        "modelId": model_id,
+        "stringIndexType": "textElements",
+        "content": "\n".join(content_lines),
+        "pages": pages,
+        "paragraphs": [],
+        "styles": []
+    }
+
+
+class MockAzureDocumentIntelligence(ThreadingHTTPServer):
+    """
+    Serves the analyze / poll-result endpoints of Document Intelligence
+
+    Each analysis completes latency_seconds + latency_per_page * pages after
+    it was submitted; polls before that answer "running". A share of
+    requests (throttle_rate) is rejected with 429. PDFs are reported with
+    their real page count, other uploads with default_pages. A recorded
+    AnalyzeResult (e.g. json.dump(result.as_dict(), f)) is replayed as-is
+    when given as payload.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_seconds=1.0, latency_per_page=0.05, throttle_rate=0.0,
+                 default_pages=1, payload=None, retry_after=1, seed=None):
+        super().__init__(address, MockAzureRequestHandler)
+        self.latency_seconds = latency_seconds
+        self.latency_per_page = latency_per_page
+        self.throttle_rate = throttle_rate
+        self.default_pages = default_pages
+        self.payload = payload
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.operations = {}
+        self.stats = {"analyze_requests": 0, "poll_requests": 0, "throttled": 0, "pages": 0}
+        self.lock = threading.Lock()
+
+    def should_throttle(self):
+        with self.lock:
+            throttled = self.random.random() < self.throttle_rate
+            if throttled:
+                self.stats["throttled"] += 1
+            return throttled
+
+
+class MockAzureRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status_code, payload=None, headers=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _throttled(self):
+        if self.server.should_throttle():
+            self._send_json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}}, {"Retry-After": 1})
+            return True
+        return False
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        match = ANALYZE_PATH.match(url.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not match:
+            self._send_json(404, {"error": {"code": "NotFound", "message": url.path}})
+            return
+        if self._throttled():
+            return
+
+        model_id = match.group(1)
+        page_count = count_pdf_pages(body) if body[:5] == b"%PDF-" else None
+        page_count = page_count or self.server.default_pages
+        result_id = uuid.uuid4().hex
+        with self.server.lock:
+            self.server.stats["analyze_requests"] += 1
+            self.server.stats["pages"] += page_count
+            self.server.operations[result_id] = {
+                "model_id": model_id,
+                "pages": page_count,
+                "created_at": time.time(),
+                "ready_at": time.time() + self.server.latency_seconds + self.server.latency_per_page * page_count
+            }
+
+        host = self.headers.get("Host") or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+        location = f"http://{host}/documentintelligence/documentModels/{model_id}/analyzeResults/{result_id}?{url.query}"
+        self._send_json(202, None, {"Operation-Location": location, "apim-request-id": result_id})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = RESULT_PATH.match(url.path)
+        if not match:
+            self._send_json(404, {"error": {"code": "NotFound", "message": url.path}})
+            return
+        if self._throttled():
+            return
+
+        with self.server.lock:
+            self.server.stats["poll_requests"] += 1
+            operation = self.server.operations.get(match.group(2))
+        if operation is None:
+            self._send_json(404, {"error": {"code": "NotFound", "message": "Unknown result id"}})
+            return
+
+        created_iso = iso_timestamp(operation["created_at"])
+        if time.time() < operation["ready_at"]:
+            self._send_json(200, {"status": "running", "createdDateTime": created_iso,
+                                  "lastUpdatedDateTime": iso_timestamp(time.time())},
+                            {"Retry-After": self.server.retry_after})
+            return
+
+        analyze_result = self.server.payload or synthetic_analyze_result(
+            operation["pages"], operation["model_id"], match.group(2)[:8]
+        )
+        self._send_json(200, {
+            "status": "succeeded",
+            "createdDateTime": created_iso,
+            "lastUpdatedDateTime": iso_timestamp(operation["ready_at"]),
+            "analyzeResult": analyze_result
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+FAKE_EXTRACTION = {
+    "data": {
+        "invoice_number": "INV-0001-1",
+        "invoice_date": "12/03/2024",
+        "supplier": "Gulf Office Supplies L.L.C",
+        "customer": "ACME General Trading",
+        "total_due": "3,150.00"
+    }
+}
+
+
+class FakeChatCompletions(ThreadingHTTPServer):
+    """
+    Serves /v1/chat/completions with a fixed extraction answer
+
+    The reply is a ReAct-style "Final Answer" so CrewAI agents accept it.
+    Batched prompts ("=== DOCUMENT n ===" sections) get a JSON array with
+    the answer once per document.
+    Latency is latency_seconds plus seconds_per_output_token per output
+    token. Streaming requests ("stream": true) get server-sent events.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_seconds=0.5, seconds_per_output_token=0.0, answer=None):
+        super().__init__(address, FakeChatRequestHandler)
+        self.latency_seconds = latency_seconds
+        self.seconds_per_output_token = seconds_per_output_token
+        self.answer = answer or FAKE_EXTRACTION
+        self.stats = {"requests": 0, "prompt_characters": 0}
+        self.lock = threading.Lock()
+
+
+class FakeChatRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not urlparse(self.path).path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        prompt = "".join(str(message.get("content") or "") for message in request.get("messages", []))
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+            self.server.stats["prompt_characters"] += len(prompt)
+
+        answer = self.server.answer
+        sections = sorted({int(number) for number in DOCUMENT_SECTION.findall(prompt)})
+        if sections:
+            answer = [{"document": number, **answer} for number in sections]
+        content = "Thought: I now can give a great answer\nFinal Answer: " + json.dumps(answer, indent=2)
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        time.sleep(self.server.latency_seconds + self.server.seconds_per_output_token * completion_tokens)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model", "gpt-4o-mini")
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for start in range(0, len(content), 16):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}, "finish_reason": None}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            return
+
+        body = json.dumps({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_in_background(server):
+    """Serve in a daemon thread and return the server's base URL"""
+    threading.Thread(target=server.serve_forever, name=type(server).__name__, daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Azure Document Intelligence and OpenAI endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--azure-port", type=int, default=8801)
+    parser.add_argument("--openai-port", type=int, default=8802)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds before an analysis completes")
+    parser.add_argument("--latency-per-page", type=float, default=0.05, help="Extra analysis seconds per page")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of Azure requests answered with 429")
+    parser.add_argument("--pages", type=int, default=1, help="Page count reported for non-PDF uploads")
+    parser.add_argument("--payload", help="Recorded AnalyzeResult JSON file to replay")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per chat completion")
+    args = parser.parse_args()
+
+    payload = None
+    if args.payload:
+        with open(args.payload, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        payload = payload.get("analyzeResult", payload)
+
+    azure = MockAzureDocumentIntelligence(
+        (args.host, args.azure_port), latency_seconds=args.latency, latency_per_page=args.latency_per_page,
+        throttle_rate=args.throttle_rate, default_pages=args.pages, payload=payload
+    )
+    openai = FakeChatCompletions((args.host, args.openai_port), latency_seconds=args.llm_latency)
+    print(f"✅ Mock Azure Document Intelligence: {start_in_background(azure)}")
+    print(f"✅ Fake chat completions: {start_in_background(openai)}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
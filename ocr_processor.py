@@ -0,0 +1,680 @@
+"""
+OCR processing with Azure Document Intelligence
+Shared by the Streamlit app, example_usage.py and other programmatic callers
+"""
+
+import bisect
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from azure.ai.documentintelligence.models import DocumentAnalysisFeature
+
+import metrics
+from azure_client import endpoint, key
+from endpoint_pool import get_endpoint_pool
+from image_preprocessing import prepare_upload, preprocessing_signature
+from lro_polling import AdaptiveLROPolling, document_profile
+from ocr_routing import page_confidence, select_pages, routing_signature
+from page_geometry import PageGeometry, format_polygon, page_words
+from pdf_splitter import (
+    count_pdf_pages,
+    split_pdf,
+    extract_pages,
+    page_fingerprints,
+    shift_page,
+    shift_items,
+    split_pages,
+    merge_results,
+    format_pages_text
+)
+from result_cache import ResultCache
+from config import (
+    AZURE_DI_MODEL,
+    AZURE_DI_API_VERSION,
+    AZURE_DI_FEATURES,
+    AZURE_DI_ADAPTIVE_POLLING,
+    PDF_SPLIT_ENABLED,
+    PDF_SPLIT_PAGE_THRESHOLD,
+    PDF_SPLIT_PAGES_PER_CHUNK,
+    PDF_SPLIT_MAX_CONCURRENCY,
+    OCR_CACHE_ENABLED,
+    OCR_CACHE_PATH,
+    OCR_CACHE_MAX_BYTES,
+    OCR_CACHE_MAX_AGE_SECONDS,
+    OCR_PAGE_CACHE_ENABLED,
+    OCR_PAGE_CACHE_PATH,
+    OCR_PAGE_CACHE_MAX_BYTES,
+    OCR_ROUTING_ENABLED,
+    OCR_ROUTING_MODEL,
+    OCR_ROUTING_FEATURES
+)
+
+# Bump when the normalized result layout changes so stale cache entries are not reused
+RESULT_FORMAT_VERSION = 3
+
+_ocr_cache = None
+_page_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """Return the process-wide OCR result cache, or None if caching is disabled"""
+    global _ocr_cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    if _ocr_cache is None:
+        # Batch, page-range and job worker threads may get here at once; open the cache only once
+        with _cache_lock:
+            if _ocr_cache is None:
+                _ocr_cache = ResultCache(OCR_CACHE_PATH, OCR_CACHE_MAX_BYTES, OCR_CACHE_MAX_AGE_SECONDS)
+    return _ocr_cache
+
+
+def get_page_cache():
+    """Return the process-wide per-page OCR cache, or None if page reuse is disabled"""
+    global _page_cache
+    if not (OCR_CACHE_ENABLED and OCR_PAGE_CACHE_ENABLED):
+        return None
+    if _page_cache is None:
+        with _cache_lock:
+            if _page_cache is None:
+                _page_cache = ResultCache(OCR_PAGE_CACHE_PATH, OCR_PAGE_CACHE_MAX_BYTES, OCR_CACHE_MAX_AGE_SECONDS)
+    return _page_cache
+
+
+def analysis_settings(model_id=AZURE_DI_MODEL, api_version=AZURE_DI_API_VERSION, features=AZURE_DI_FEATURES):
+    """Every setting that changes the analysis result, as one string for cache keys"""
+    return "|".join([
+        model_id, api_version, ",".join(sorted(str(f) for f in features)), str(RESULT_FORMAT_VERSION),
+        preprocessing_signature(), routing_signature()
+    ])
+
+
+def ocr_cache_key(file_content, model_id=AZURE_DI_MODEL, api_version=AZURE_DI_API_VERSION, features=AZURE_DI_FEATURES):
+    """Build a cache key from the file bytes and every setting that changes the analysis result"""
+    digest = hashlib.sha256(file_content)
+    digest.update(b"\0" + analysis_settings(model_id, api_version, features).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def page_cache_key(fingerprint):
+    """Build a per-page cache key from a page fingerprint and the analysis settings"""
+    return hashlib.sha256(f"{fingerprint}|{analysis_settings()}".encode("utf-8")).hexdigest()
+
+
+def format_bounding_box(bounding_box):
+    """Format bounding box coordinates"""
+    if not bounding_box:
+        return "N/A"
+    return format_polygon(bounding_box)
+
+
+def analyze_document(file_content, page_count=None, model_id=AZURE_DI_MODEL, features=AZURE_DI_FEATURES):
+    """Send the document to Azure Document Intelligence and wait for the analysis result"""
+    # Debug: Log the request
+    print(f"File size: {len(file_content)} bytes")
+    profile = document_profile(file_content, page_count)
+
+    def analyze(document_analysis_client, abandoned):
+        # Poll on a schedule predicted from the document's size and page count (True: SDK default interval)
+        polling = AdaptiveLROPolling(*profile) if AZURE_DI_ADAPTIVE_POLLING else True
+
+        # Start analysis with file stream
+        metrics.increment("azure_bytes_sent_total", len(file_content))
+        with metrics.span("azure.upload"):
+            poller = document_analysis_client.begin_analyze_document(
+                model_id=model_id,
+                body=file_content,
+                features=[DocumentAnalysisFeature(f) for f in features],  # e.g. QR/barcode extraction
+                polling=polling
+            )
+        with metrics.span("azure.poll"):
+            # The poller polls on its own thread; stop waiting once a hedged duplicate has won
+            while not poller.done():
+                if abandoned.is_set():
+                    return None
+                poller.wait(0.1)
+            return poller.result()
+
+    # Shared clients: least busy healthy endpoint, hedged on a second one when the analysis runs late
+    _, pages, size_bytes = profile
+    return get_endpoint_pool().analyze(analyze, pages, size_bytes)
+
+
+def normalize_page(page):
+    """Convert one Azure DocumentPage into a normalized page record"""
+    return {
+        "page_number": page.page_number,
+        "width": page.width,
+        "height": page.height,
+        "unit": page.unit,
+        "spans": [{"offset": span.offset, "length": span.length} for span in (page.spans or [])],
+        "lines": [{"content": line.content} for line in page.lines],
+        # Word text, polygons, confidences and spans as arrays; word dicts and display strings are built on demand
+        "geometry": PageGeometry.from_page(page)
+    }
+
+
+def scale_page(page, scale):
+    """Return a copy of a page record with its size and polygons multiplied by the (x, y) scale"""
+    scale_x, scale_y = scale
+    page = {**page, "width": page["width"] * scale_x, "height": page["height"] * scale_y}
+    if page.get("geometry") is not None:
+        page["geometry"] = page["geometry"].scaled(scale_x, scale_y)
+    return page
+
+
+def scale_barcodes(barcodes, scale):
+    """Return copies of barcode records with their polygons multiplied by the (x, y) scale"""
+    scale_x, scale_y = scale
+    return [
+        {**barcode, "polygon": [value * (scale_y if i % 2 else scale_x) for i, value in enumerate(barcode["polygon"])]}
+        if barcode.get("polygon") else barcode
+        for barcode in barcodes
+    ]
+
+
+def iter_pages(result):
+    """Yield normalized page records of an Azure AnalyzeResult one at a time"""
+    for page in result.pages:
+        with metrics.span("ocr.normalize"):
+            record = normalize_page(page)
+        yield record
+
+
+def _region_page(element):
+    """Page number of an element's first bounding region, or None"""
+    regions = getattr(element, 'bounding_regions', None) if element else None
+    return regions[0].page_number if regions else None
+
+
+def summarize_result(result):
+    """Extract the document-level (non-page) parts of an Azure AnalyzeResult"""
+    # Styles only carry content spans; find their page from where each page's text starts
+    page_starts = sorted((page.spans[0].offset, page.page_number) for page in (result.pages or []) if page.spans)
+    start_offsets = [start for start, _ in page_starts]
+
+    def page_at(spans):
+        if not spans or not page_starts:
+            return None
+        return page_starts[max(bisect.bisect_right(start_offsets, spans[0].offset) - 1, 0)][1]
+
+    # Extract styles (handwritten detection)
+    styles_info = []
+    if hasattr(result, 'styles') and result.styles:
+        for style in result.styles:
+            styles_info.append({
+                "is_handwritten": style.is_handwritten if hasattr(style, 'is_handwritten') else False,
+                "page_number": page_at(getattr(style, 'spans', None))
+            })
+
+    # Extract barcodes and QR codes from Azure
+    barcodes_info = []
+    if hasattr(result, 'barcodes') and result.barcodes:
+        for barcode in result.barcodes:
+            barcodes_info.append({
+                "type": barcode.kind if hasattr(barcode, 'kind') else "Unknown",
+                "value": barcode.value if hasattr(barcode, 'value') else None,
+                "confidence": barcode.confidence if hasattr(barcode, 'confidence') else None,
+                "polygon": list(barcode.polygon) if getattr(barcode, 'polygon', None) else None,
+                "page_number": _region_page(barcode),
+                "source": "azure"
+            })
+
+    # Extract key-value pairs
+    key_value_pairs = []
+    if hasattr(result, 'key_value_pairs') and result.key_value_pairs:
+        for kv_pair in result.key_value_pairs:
+            key_content = kv_pair.key.content if kv_pair.key else None
+            value_content = kv_pair.value.content if kv_pair.value else None
+            key_value_pairs.append({
+                "key": key_content,
+                "value": value_content,
+                "confidence": kv_pair.confidence if hasattr(kv_pair, 'confidence') else None,
+                "page_number": _region_page(kv_pair.key) or _region_page(kv_pair.value)
+            })
+
+    return {
+        "full_content": result.content if hasattr(result, 'content') else "",
+        "styles": styles_info,
+        "barcodes": barcodes_info,
+        "key_value_pairs": key_value_pairs
+    }
+
+
+def normalize_result(result, file_extension):
+    """Convert an Azure AnalyzeResult into the result dict used by the app and CrewAI"""
+    pages_data = list(iter_pages(result))
+    return {
+        "status": "success",
+        **summarize_result(result),
+        "text": format_pages_text(pages_data),
+        "pages": pages_data,
+        "document_type": file_extension.upper(),
+        "raw_result": result
+    }
+
+
+def iter_analysis_results(file_content, file_extension):
+    """
+    Yield (first_page_number, AnalyzeResult) pairs in page order
+
+    PDFs above PDF_SPLIT_PAGE_THRESHOLD pages are split into page ranges that
+    are analyzed concurrently; each range is yielded as soon as it and all
+    earlier ranges are done. Other documents are analyzed in one request.
+    """
+    if PDF_SPLIT_ENABLED and file_extension.lower() == ".pdf":
+        page_count = count_pdf_pages(file_content)
+        if page_count and page_count > PDF_SPLIT_PAGE_THRESHOLD:
+            chunks = split_pdf(file_content, PDF_SPLIT_PAGES_PER_CHUNK)
+            print(f"Splitting PDF into {len(chunks)} page ranges of up to {PDF_SPLIT_PAGES_PER_CHUNK} pages")
+
+            with ThreadPoolExecutor(max_workers=PDF_SPLIT_MAX_CONCURRENCY) as executor:
+                analyze = metrics.propagate(analyze_document)
+                futures = [
+                    executor.submit(analyze, chunk_content, min(PDF_SPLIT_PAGES_PER_CHUNK, page_count - first_page + 1))
+                    for first_page, chunk_content in chunks
+                ]
+                for i, (first_page, _) in enumerate(chunks):
+                    result = futures[i].result()
+                    futures[i] = None  # Let the range's result be freed once consumed
+                    yield first_page, result
+            return
+
+        yield 1, analyze_document(file_content, page_count)
+        return
+
+    yield 1, analyze_document(file_content)
+
+
+def lookup_cached_pages(fingerprints, page_cache):
+    """
+    Look up a PDF's pages in the per-page cache by fingerprint
+
+    Returns {fingerprint: cached part} (still in its cacheable form), or None
+    when no page is cached and the whole document should be analyzed.
+    """
+    parts = {}
+    with metrics.span("ocr.cache_lookup"):
+        for fingerprint in set(fingerprints):
+            cached = page_cache.get(page_cache_key(fingerprint))
+            if cached is not None:
+                parts[fingerprint] = cached
+    reused = sum(1 for fingerprint in fingerprints if fingerprint in parts)
+    metrics.increment("cache_requests_total", reused, cache="ocr_page", result="hit")
+    metrics.increment("cache_requests_total", len(fingerprints) - reused, cache="ocr_page", result="miss")
+    return parts or None
+
+
+def _split_range(result, page_count):
+    """
+    Split a page range's normalized result into single-page parts
+
+    Styles, barcodes and key-value pairs without a page number are returned
+    separately instead of failing the split.
+    """
+    loose = {kind: [item for item in result[kind] if not item.get("page_number")]
+             for kind in ("styles", "barcodes", "key_value_pairs")}
+    parts = split_pages({
+        **result,
+        **{kind: [item for item in result[kind] if item.get("page_number")] for kind in loose}
+    })
+    if len(parts) != page_count:
+        raise RuntimeError(f"Expected {page_count} analyzed pages, got {len(parts)}")
+    return parts, loose
+
+
+def iter_changed_pages(file_content, file_extension, fingerprints, cached_parts):
+    """
+    Stream a PDF's records from cached pages, analyzing only the pages that changed
+
+    cached_parts comes from lookup_cached_pages. The pages missing from it are
+    extracted into one PDF and analyzed (split into ranges like any large
+    PDF). Records are yielded in page order like iter_document's: cached pages
+    as soon as every earlier page is available, analyzed pages as their range
+    completes.
+    """
+    # Identical pages (e.g. repeated blank or cover pages) are analyzed once
+    changed = {}
+    for page_number, fingerprint in enumerate(fingerprints, 1):
+        if fingerprint not in cached_parts:
+            changed.setdefault(fingerprint, page_number)
+    changed_fingerprints = list(changed)
+    reused = sum(1 for fingerprint in fingerprints if fingerprint in cached_parts)
+    remaining = Counter(fingerprints)
+    print(f"Reusing {reused} of {len(fingerprints)} pages, analyzing {len(changed)} changed pages")
+
+    parts = {}
+    ranges = iter(())
+    if changed:
+        changed_content = extract_pages(file_content, list(changed.values()))
+        ranges = iter_analysis_results(changed_content, file_extension)
+
+    content_parts = []
+    styles, barcodes, key_value_pairs = [], [], []
+    offset = 0
+
+    for page_number, fingerprint in enumerate(fingerprints, 1):
+        if fingerprint in cached_parts and fingerprint not in parts:
+            parts[fingerprint] = from_cacheable(cached_parts.pop(fingerprint))
+        while fingerprint not in parts:
+            # Analyzed ranges arrive in page order, so the next one holds this page
+            first_page, result = next(ranges, (None, None))
+            if result is None:
+                raise RuntimeError(f"Page {page_number} is missing from the analyzed pages")
+            with metrics.span("ocr.normalize"):
+                analyzed = normalize_result(result, file_extension)
+            range_fingerprints = changed_fingerprints[first_page - 1:first_page - 1 + len(analyzed["pages"])]
+            range_parts, loose = _split_range(analyzed, len(range_fingerprints))
+            metrics.increment("pages_analyzed_total", len(range_parts))
+            parts.update(zip(range_fingerprints, range_parts))
+            styles.extend(loose["styles"])
+            barcodes.extend(loose["barcodes"])
+            key_value_pairs.extend(loose["key_value_pairs"])
+
+        remaining[fingerprint] -= 1
+        # Release a page's part once no later page shares its fingerprint
+        part = parts[fingerprint] if remaining[fingerprint] else parts.pop(fingerprint)
+        if content_parts:
+            # Pages are separated by a newline in Azure's content
+            content_parts.append("\n")
+            offset += 1
+        yield {"type": "page", "page": shift_page(part["pages"][0], page_number, offset)}
+
+        content_parts.append(part["full_content"])
+        offset += len(part["full_content"])
+        styles.extend(shift_items(part["styles"], page_number))
+        barcodes.extend(shift_items(part["barcodes"], page_number))
+        key_value_pairs.extend(shift_items(part["key_value_pairs"], page_number))
+
+    yield {
+        "type": "document",
+        "full_content": "".join(content_parts),
+        "styles": styles,
+        "barcodes": barcodes,
+        "key_value_pairs": key_value_pairs,
+        "document_type": file_extension.upper(),
+        "analyzed_pages": {page_number: fingerprint for fingerprint, page_number in changed.items()},
+        "reused_pages": reused,
+        "cached": False
+    }
+
+
+def cache_pages(ocr_result, analyzed_pages):
+    """Store the analyzed pages ({page_number: fingerprint}) of a result in the per-page cache"""
+    page_cache = get_page_cache()
+    parts = split_pages(ocr_result) if page_cache else None
+    if parts is None:
+        return
+    parts_by_number = {page["page_number"]: part for page, part in zip(ocr_result["pages"], parts)}
+    for page_number, fingerprint in analyzed_pages.items():
+        if page_number in parts_by_number:
+            page_cache.set(page_cache_key(fingerprint), to_cacheable(parts_by_number[page_number]))
+
+
+def route_low_confidence_pages(file_content, file_extension, ocr_result, page_numbers=None):
+    """
+    Analyze the pages the fast model read poorly again with OCR_ROUTING_MODEL and OCR_ROUTING_FEATURES
+
+    Pages are picked by ocr_routing.select_pages (only among page_numbers
+    when given). A page is replaced when the second pass reads it with at
+    least the same mean confidence. Returns the result with a "routing"
+    report, or the unchanged result when no page qualifies.
+    """
+    selected = select_pages(ocr_result, page_numbers)
+    parts = split_pages(ocr_result) if selected else None
+    if not parts:
+        return ocr_result
+
+    numbers = [page_number for page_number, _, _ in selected]
+    print(f"Re-analyzing pages {numbers} with {OCR_ROUTING_MODEL} ({', '.join(OCR_ROUTING_FEATURES)})")
+    for _, reason, _ in selected:
+        metrics.increment("pages_routed_total", reason=reason)
+
+    with metrics.span("ocr.route"):
+        # Images are sent as uploaded, without the downscaling applied for the fast pass
+        content = extract_pages(file_content, numbers) if file_extension.lower() == ".pdf" else file_content
+        routed = normalize_result(
+            analyze_document(content, len(numbers), model_id=OCR_ROUTING_MODEL, features=OCR_ROUTING_FEATURES),
+            file_extension
+        )
+        routed_parts = split_pages(routed)
+    if routed_parts is None or len(routed_parts) != len(numbers):
+        print("Re-analyzed pages could not be matched to the document; keeping the first pass")
+        return ocr_result
+
+    index = {page["page_number"]: i for i, page in enumerate(ocr_result["pages"])}
+    report = []
+    for (page_number, reason, before), part in zip(selected, routed_parts):
+        after = page_confidence(part["pages"][0])
+        replaced = after is not None and (before is None or after["mean"] >= before)
+        if replaced:
+            parts[index[page_number]] = part
+        report.append({
+            "page_number": page_number,
+            "reason": reason,
+            "confidence_before": before,
+            "confidence_after": after["mean"] if after else None,
+            "replaced": replaced
+        })
+
+    merged = merge_results(
+        [(page["page_number"], part) for page, part in zip(ocr_result["pages"], parts)], file_extension
+    )
+    return {
+        **ocr_result,
+        **merged,
+        "routing": {"model": OCR_ROUTING_MODEL, "features": list(OCR_ROUTING_FEATURES), "pages": report}
+    }
+
+
+def iter_document(file_content, file_extension, use_cache=True):
+    """
+    Analyze a document and stream its normalized records
+
+    Yields {"type": "page", "page": {...}} for each page in order while later
+    pages (or PDF page ranges) are still being converted, then one final
+    {"type": "document", ...} record with full_content, styles, barcodes and
+    key_value_pairs. Only one page record is built at a time, and the SDK
+    result of a page range is released once its pages have been yielded.
+    PDFs with some pages already in the per-page cache are analyzed
+    incrementally (see iter_changed_pages).
+    """
+    cache = get_ocr_cache() if use_cache else None
+    if cache:
+        with metrics.span("ocr.cache_lookup"):
+            cached = cache.get(ocr_cache_key(file_content))
+        metrics.increment("cache_requests_total", cache="ocr", result="miss" if cached is None else "hit")
+        if cached is not None:
+            print(f"OCR cache hit ({len(file_content)} bytes)")
+            # Rebuild each page's geometry only as the page is yielded
+            pages = cached.pop("pages")
+            for i, page in enumerate(pages):
+                pages[i] = None
+                yield {"type": "page", "page": page_from_cacheable(page)}
+            yield {
+                "type": "document",
+                "full_content": cached["full_content"],
+                "styles": cached["styles"],
+                "barcodes": cached["barcodes"],
+                "key_value_pairs": cached["key_value_pairs"],
+                "document_type": file_extension.upper(),
+                "cached": True
+            }
+            return
+
+    page_cache = get_page_cache() if use_cache and file_extension.lower() == ".pdf" else None
+    fingerprints = page_fingerprints(file_content) if page_cache else None
+    if fingerprints:
+        cached_parts = lookup_cached_pages(fingerprints, page_cache)
+        if cached_parts is not None:
+            yield from iter_changed_pages(file_content, file_extension, fingerprints, cached_parts)
+            return
+
+    # Shrink large images before upload (the cache key above uses the original bytes)
+    with metrics.span("ocr.preprocess"):
+        file_content, preprocessing = prepare_upload(file_content, file_extension)
+    # Azure measures a downscaled image in its own pixels; report geometry in the original's
+    scale = preprocessing["scale"] if preprocessing and preprocessing["scale"] != [1.0, 1.0] else None
+
+    content_parts = []
+    styles, barcodes, key_value_pairs = [], [], []
+    offset = 0
+
+    for first_page, result in iter_analysis_results(file_content, file_extension):
+        if content_parts:
+            # Pages are separated by a newline in Azure's content
+            content_parts.append("\n")
+            offset += 1
+
+        for page in iter_pages(result):
+            if first_page > 1 or offset:
+                page = shift_page(page, first_page, offset)
+            if scale:
+                page = scale_page(page, scale)
+            metrics.increment("pages_analyzed_total")
+            yield {"type": "page", "page": page}
+
+        with metrics.span("ocr.normalize"):
+            summary = summarize_result(result)
+        content_parts.append(summary["full_content"])
+        offset += len(summary["full_content"])
+        styles.extend(shift_items(summary["styles"], first_page))
+        barcodes.extend(shift_items(scale_barcodes(summary["barcodes"], scale) if scale else summary["barcodes"],
+                                    first_page))
+        key_value_pairs.extend(shift_items(summary["key_value_pairs"], first_page))
+
+    yield {
+        "type": "document",
+        "full_content": "".join(content_parts),
+        "styles": styles,
+        "barcodes": barcodes,
+        "key_value_pairs": key_value_pairs,
+        "document_type": file_extension.upper(),
+        "preprocessing": preprocessing,
+        "analyzed_pages": dict(enumerate(fingerprints, 1)) if fingerprints else None,
+        "cached": False
+    }
+
+
+def to_cacheable(ocr_result):
+    """Return a JSON-serializable copy of a normalized result (without the SDK object)"""
+    cacheable = {k: v for k, v in ocr_result.items() if k != "raw_result"}
+    cacheable["pages"] = [
+        {**page, "geometry": page["geometry"].to_dict()} if isinstance(page.get("geometry"), PageGeometry) else page
+        for page in ocr_result.get("pages", [])
+    ]
+    return cacheable
+
+
+def client_result(ocr_result, cache_key=None):
+    """
+    A normalized result without per-word data and geometry, for job results and progress
+
+    Pages are reduced to summaries (number, size, line and word counts);
+    cache_key, when given, lets a client fetch a page's words and geometry
+    from the OCR cache with cached_page().
+    """
+    result = {k: v for k, v in ocr_result.items() if k not in ("raw_result", "pages")}
+    result["pages"] = [
+        {
+            "page_number": page["page_number"],
+            "width": page.get("width"),
+            "height": page.get("height"),
+            "unit": page.get("unit"),
+            "line_count": len(page.get("lines", [])),
+            "word_count": len(page_words(page))
+        }
+        for page in ocr_result.get("pages", [])
+    ]
+    result["cache_key"] = cache_key
+    return result
+
+
+def cached_page(cache_key, page_number):
+    """A page record with words and geometry (JSON-serializable) from the OCR cache, or None"""
+    cache = get_ocr_cache()
+    cached = cache.get(cache_key) if cache and cache_key else None
+    if cached is None:
+        return None
+    page = next((page for page in cached.get("pages", []) if page.get("page_number") == page_number), None)
+    return {**page, "words": page_words(page)} if page else None
+
+
+def from_cacheable(cached):
+    """Rebuild a normalized result from its JSON-serializable form"""
+    cached["pages"] = [page_from_cacheable(page) for page in cached.get("pages", [])]
+    return cached
+
+
+def page_from_cacheable(page):
+    """Rebuild one page record from its JSON-serializable form"""
+    if isinstance(page.get("geometry"), dict):
+        return {**page, "geometry": PageGeometry.from_dict(page["geometry"])}
+    return page
+
+
+def process_document(file_content, file_extension, use_cache=True, on_page=None):
+    """
+    Process the uploaded document using Azure Document Intelligence
+
+    on_page, if given, is called with each page record as soon as it is
+    available (see iter_document).
+    """
+    try:
+        pages_data = []
+        document = None
+
+        # Thin wrapper that collects the streamed records into one dict
+        for record in iter_document(file_content, file_extension, use_cache=use_cache):
+            if record["type"] == "page":
+                pages_data.append(record["page"])
+                if on_page:
+                    on_page(record["page"])
+            else:
+                document = record
+
+        ocr_result = {
+            "status": "success",
+            "full_content": document["full_content"],
+            "text": format_pages_text(pages_data),
+            "pages": pages_data,
+            "styles": document["styles"],
+            "barcodes": document["barcodes"],
+            "key_value_pairs": document["key_value_pairs"],
+            "document_type": document["document_type"],
+            "raw_result": None
+        }
+
+        if document.get("preprocessing"):
+            ocr_result["preprocessing"] = document["preprocessing"]
+        if document.get("reused_pages"):
+            ocr_result["reused_pages"] = document["reused_pages"]
+
+        if document["cached"]:
+            ocr_result["cached"] = True
+        else:
+            if OCR_ROUTING_ENABLED:
+                # Pages reused from the page cache were already routed when they were first analyzed
+                analyzed_pages = document.get("analyzed_pages")
+                try:
+                    ocr_result = route_low_confidence_pages(
+                        file_content, file_extension, ocr_result, set(analyzed_pages) if analyzed_pages is not None else None
+                    )
+                except Exception as e:
+                    print(f"Page routing failed, keeping the first pass: {str(e)}")
+
+            cache = get_ocr_cache() if use_cache else None
+            if cache:
+                with metrics.span("ocr.cache_write"):
+                    cache.set(ocr_cache_key(file_content), to_cacheable(ocr_result))
+                    if document.get("analyzed_pages"):
+                        cache_pages(ocr_result, document["analyzed_pages"])
+
+        metrics.increment("documents_total", stage="ocr", status="success")
+        return ocr_result
+
+    except Exception as e:
+        metrics.increment("documents_total", stage="ocr", status="error")
+        return {"status": "error", "message": str(e)}
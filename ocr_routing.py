@@ -0,0 +1,78 @@
+"""
+Confidence-based routing of OCR pages
+Scores each page of a fast-model result from its word confidences and handwriting styles, and
+picks the pages worth analyzing again with a stronger model or add-on features
+"""
+
+import numpy as np
+from page_geometry import PageGeometry, page_words
+from config import (
+    OCR_ROUTING_ENABLED,
+    OCR_ROUTING_MODEL,
+    OCR_ROUTING_FEATURES,
+    OCR_ROUTING_MIN_MEAN_CONFIDENCE,
+    OCR_ROUTING_LOW_WORD_CONFIDENCE,
+    OCR_ROUTING_MAX_LOW_WORD_SHARE,
+    OCR_ROUTING_HANDWRITTEN,
+    OCR_ROUTING_MAX_PAGES
+)
+
+
+def routing_signature():
+    """The routing settings as a string for cache keys ("" when routing is off)"""
+    if not OCR_ROUTING_ENABLED:
+        return ""
+    return ":".join(str(setting) for setting in [
+        OCR_ROUTING_MODEL, ",".join(sorted(OCR_ROUTING_FEATURES)), OCR_ROUTING_MIN_MEAN_CONFIDENCE,
+        OCR_ROUTING_LOW_WORD_CONFIDENCE, OCR_ROUTING_MAX_LOW_WORD_SHARE, OCR_ROUTING_HANDWRITTEN
+    ])
+
+
+def page_confidence(page):
+    """Mean word confidence and share of poorly read words of a page, or None for a page without words"""
+    geometry = page.get("geometry")
+    if isinstance(geometry, dict):
+        geometry = PageGeometry.from_dict(geometry)
+    if geometry is not None:
+        confidences = geometry.word_confidences
+    else:
+        confidences = np.array([word["confidence"] or 0.0 for word in page_words(page)], dtype=np.float32)
+    if not len(confidences):
+        return None
+    return {
+        "mean": float(confidences.mean()),
+        "low_share": float((confidences < OCR_ROUTING_LOW_WORD_CONFIDENCE).mean()),
+        "words": len(confidences)
+    }
+
+
+def select_pages(ocr_result, page_numbers=None):
+    """
+    Pages to analyze again, lowest confidence first
+
+    Only pages in page_numbers are considered when it is given (e.g. the
+    pages not reused from the page cache). Returns at most
+    OCR_ROUTING_MAX_PAGES (page_number, reason, mean_confidence) tuples.
+    """
+    handwritten = {
+        style["page_number"] for style in ocr_result.get("styles", [])
+        if style.get("is_handwritten") and style.get("page_number")
+    }
+
+    candidates = []
+    for page in ocr_result["pages"]:
+        if page_numbers is not None and page["page_number"] not in page_numbers:
+            continue
+        stats = page_confidence(page)
+        if OCR_ROUTING_HANDWRITTEN and page["page_number"] in handwritten:
+            reason = "handwritten"
+        elif stats and stats["mean"] < OCR_ROUTING_MIN_MEAN_CONFIDENCE:
+            reason = "low mean confidence"
+        elif stats and stats["low_share"] > OCR_ROUTING_MAX_LOW_WORD_SHARE:
+            reason = "many low-confidence words"
+        else:
+            continue
+        candidates.append((page["page_number"], reason, stats["mean"] if stats else None))
+
+    candidates.sort(key=lambda candidate: 1.0 if candidate[2] is None else candidate[2])
+    return candidates[:OCR_ROUTING_MAX_PAGES]
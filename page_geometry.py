@@ -0,0 +1,225 @@
+"""
+Columnar, array-backed geometry for OCR pages
+Keeps polygons, confidences and content spans as contiguous NumPy arrays so
+post-processing stays cheap and geometry can be queried in a vectorized way
+"""
+
+import numpy as np
+
+
+def _pack_polygons(polygons):
+    """
+    Pack flat [x1, y1, x2, y2, ...] polygons of any length into one float32 array
+
+    Returns (coordinates, offsets): polygon i is coordinates[offsets[i]:offsets[i + 1]];
+    a missing polygon is empty.
+    """
+    offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(polygon) for polygon in polygons])
+    coordinates = np.array([value for polygon in polygons for value in polygon], dtype=np.float32)
+    return coordinates, offsets
+
+
+def _polygon_array(items):
+    """Pack the polygons of Azure items (lines or words); see _pack_polygons"""
+    return _pack_polygons([list(getattr(item, "polygon", None) or []) for item in items])
+
+
+def _polygon_rows(coordinates, offsets):
+    """Unpack polygons as lists of floats (the inverse of _pack_polygons)"""
+    values = coordinates.tolist()
+    return [values[start:end] for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def _span_array(items):
+    """Pack (offset, length) into full_content for each item into an (N, 2) int64 array"""
+    spans = np.zeros((len(items), 2), dtype=np.int64)
+    for i, item in enumerate(items):
+        if getattr(item, "spans", None):
+            first, last = item.spans[0], item.spans[-1]
+            spans[i] = (first.offset, last.offset + last.length - first.offset)
+        elif getattr(item, "span", None):
+            spans[i] = (item.span.offset, item.span.length)
+    return spans
+
+
+def format_polygon(polygon):
+    """Format a flat [x1, y1, x2, y2, ...] polygon as "[x1, y1], [x2, y2], ..." """
+    return ", ".join("[{}, {}]".format(x, y) for x, y in zip(polygon[0::2], polygon[1::2]))
+
+
+class PageGeometry:
+    """
+    Geometry of one page's lines and words, and the words' text
+
+    Page records hold this instead of one dict per word (see page_words).
+    Polygons keep every point Azure returns (usually four, sometimes more),
+    packed into one flat array per element type plus offsets.
+
+    Attributes:
+        line_polygons: float32 coordinates of all line polygons, one after another
+        line_polygon_offsets: (N + 1,) int64; line i's polygon is line_polygons[offsets[i]:offsets[i + 1]]
+        line_spans: (N, 2) int64 (offset, length) of each line in full_content
+        word_polygons: float32 coordinates of all word polygons, one after another
+        word_polygon_offsets: (M + 1,) int64 offsets into word_polygons
+        word_confidences: (M,) float32 word confidences
+        word_spans: (M, 2) int64 (offset, length) of each word in full_content
+        word_contents: list of the M words' text, or None for geometry cached without it
+    """
+
+    def __init__(self, line_polygons, line_polygon_offsets, line_spans, word_polygons, word_polygon_offsets,
+                 word_confidences, word_spans, word_contents=None):
+        self.line_polygons = line_polygons
+        self.line_polygon_offsets = line_polygon_offsets
+        self.line_spans = line_spans
+        self.word_polygons = word_polygons
+        self.word_polygon_offsets = word_polygon_offsets
+        self.word_confidences = word_confidences
+        self.word_spans = word_spans
+        self.word_contents = word_contents
+
+    @classmethod
+    def from_page(cls, page):
+        """Build the geometry arrays from an Azure DocumentPage"""
+        lines = page.lines or []
+        words = page.words or []
+        return cls(
+            *_polygon_array(lines),
+            _span_array(lines),
+            *_polygon_array(words),
+            np.array([word.confidence or 0.0 for word in words], dtype=np.float32),
+            _span_array(words),
+            [word.content for word in words]
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild geometry from the JSON-friendly form produced by to_dict()"""
+        def polygons(rows):
+            # Older entries padded every polygon to eight values with nulls
+            return _pack_polygons([[value for value in row if value is not None] for row in rows])
+
+        return cls(
+            *polygons(data["line_polygons"]),
+            np.array(data["line_spans"], dtype=np.int64).reshape(-1, 2),
+            *polygons(data["word_polygons"]),
+            np.array(data["word_confidences"], dtype=np.float32),
+            np.array(data["word_spans"], dtype=np.int64).reshape(-1, 2),
+            data.get("word_contents")
+        )
+
+    def to_dict(self):
+        """Return a JSON-serializable copy (polygons as lists of coordinates)"""
+        return {
+            "line_polygons": _polygon_rows(self.line_polygons, self.line_polygon_offsets),
+            "line_spans": self.line_spans.tolist(),
+            "word_polygons": _polygon_rows(self.word_polygons, self.word_polygon_offsets),
+            "word_confidences": self.word_confidences.tolist(),
+            "word_spans": self.word_spans.tolist(),
+            "word_contents": self.word_contents
+        }
+
+    def _replace(self, **arrays):
+        fields = {name: getattr(self, name) for name in (
+            "line_polygons", "line_polygon_offsets", "line_spans",
+            "word_polygons", "word_polygon_offsets", "word_confidences", "word_spans", "word_contents"
+        )}
+        return PageGeometry(**{**fields, **arrays})
+
+    def shifted(self, offset):
+        """Return a copy whose content spans are moved by offset characters"""
+        line_spans = self.line_spans.copy()
+        word_spans = self.word_spans.copy()
+        line_spans[:, 0] += offset
+        word_spans[:, 0] += offset
+        return self._replace(line_spans=line_spans, word_spans=word_spans)
+
+    def scaled(self, scale_x, scale_y):
+        """Return a copy whose polygons are multiplied by scale_x / scale_y (e.g. back to the original image's pixels)"""
+        factors = np.array([scale_x, scale_y], dtype=np.float32)
+        return self._replace(line_polygons=(self.line_polygons.reshape(-1, 2) * factors).ravel(),
+                             word_polygons=(self.word_polygons.reshape(-1, 2) * factors).ravel())
+
+    def line_bounding_boxes(self):
+        """Human-readable bounding box strings for each line (built on demand)"""
+        return [
+            format_polygon(polygon) if polygon else "N/A"
+            for polygon in _polygon_rows(self.line_polygons, self.line_polygon_offsets)
+        ]
+
+    def word_line_indices(self):
+        """Index of the line containing each word (by content span), or -1"""
+        if not len(self.line_spans) or not len(self.word_spans):
+            return np.full(len(self.word_spans), -1, dtype=np.int64)
+
+        order = np.argsort(self.line_spans[:, 0], kind="stable")
+        starts = self.line_spans[order, 0]
+        ends = starts + self.line_spans[order, 1]
+        word_offsets = self.word_spans[:, 0]
+
+        position = np.searchsorted(starts, word_offsets, side="right") - 1
+        clipped = np.clip(position, 0, None)
+        inside = (position >= 0) & (word_offsets < ends[clipped])
+        return np.where(inside, order[clipped], -1)
+
+    def mean_confidence_per_line(self):
+        """Mean word confidence for each line (NaN for lines without words)"""
+        line_index = self.word_line_indices()
+        matched = line_index >= 0
+        count = np.bincount(line_index[matched], minlength=len(self.line_spans))
+        total = np.bincount(line_index[matched], weights=self.word_confidences[matched], minlength=len(self.line_spans))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (total / count).astype(np.float32)
+
+    def word_centres(self):
+        """(M, 2) float32 mean point of each word polygon (NaN for words without one)"""
+        points = self.word_polygons.reshape(-1, 2)
+        starts = self.word_polygon_offsets[:-1] // 2
+        counts = np.diff(self.word_polygon_offsets) // 2
+        centres = np.full((len(counts), 2), np.nan, dtype=np.float32)
+        present = counts > 0
+        if present.any():
+            # Empty polygons have no points, so consecutive non-empty starts delimit each polygon
+            centres[present] = np.add.reduceat(points, starts[present], axis=0) / counts[present, None]
+        return centres
+
+    def words_in_region(self, x0, y0, x1, y1):
+        """Indices of the words whose polygon centre lies inside the given rectangle"""
+        centres = self.word_centres()
+        with np.errstate(invalid="ignore"):
+            inside = (
+                (centres[:, 0] >= x0) & (centres[:, 0] <= x1) &
+                (centres[:, 1] >= y0) & (centres[:, 1] <= y1)
+            )
+        return np.flatnonzero(inside)
+
+
+def page_words(page):
+    """
+    The words of a normalized page as [{"content", "confidence"}], built from its geometry on demand
+
+    Pages cached before word text moved into the geometry still carry a "words" list.
+    """
+    if "words" in page:
+        return page["words"]
+    geometry = page.get("geometry")
+    if isinstance(geometry, dict):
+        geometry = PageGeometry.from_dict(geometry)
+    if geometry is None or geometry.word_contents is None:
+        return []
+    return [
+        {"content": content, "confidence": round(float(confidence), 4)}
+        for content, confidence in zip(geometry.word_contents, geometry.word_confidences.tolist())
+    ]
+
+
+def page_line_confidences(page):
+    """Mean word confidence per line of a normalized page (NaN where unknown)"""
+    if "line_confidences" in page:
+        return np.array([np.nan if c is None else c for c in page["line_confidences"]], dtype=np.float32)
+    geometry = page.get("geometry")
+    if isinstance(geometry, dict):
+        geometry = PageGeometry.from_dict(geometry)
+    if geometry is None or len(geometry.line_spans) != len(page.get("lines", [])):
+        return np.full(len(page.get("lines", [])), np.nan, dtype=np.float32)
+    return geometry.mean_confidence_per_line()
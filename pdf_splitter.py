@@ -0,0 +1,213 @@
+"""
+Page-range splitting of large PDFs and ordered merging of the per-range OCR results
+Also fingerprints pages and splits results into per-page units, so unchanged pages of a
+revised PDF can be reused instead of analyzed again
+"""
+
+import io
+import hashlib
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import IndirectObject, DictionaryObject, ArrayObject, StreamObject
+
+# Keys that point back into the page tree or depend on the page's position in the document
+_UNHASHED_KEYS = {"/Parent", "/P", "/StructParents"}
+
+
+def count_pdf_pages(file_content):
+    """Return the number of pages in a PDF, or None if it can't be read (e.g. encrypted)"""
+    try:
+        reader = PdfReader(io.BytesIO(file_content))
+        if reader.is_encrypted:
+            return None
+        return len(reader.pages)
+    except Exception:
+        return None
+
+
+def split_pdf(file_content, pages_per_chunk):
+    """
+    Split a PDF into consecutive page ranges
+
+    Returns:
+        list: (first_page_number, pdf_bytes) tuples in page order, 1-based
+    """
+    reader = PdfReader(io.BytesIO(file_content))
+    chunks = []
+
+    for start in range(0, len(reader.pages), pages_per_chunk):
+        writer = PdfWriter()
+        for page in reader.pages[start:start + pages_per_chunk]:
+            writer.add_page(page)
+
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append((start + 1, buffer.getvalue()))
+
+    return chunks
+
+
+def extract_pages(file_content, page_numbers):
+    """Return a PDF with only the given 1-based pages, in the given order"""
+    reader = PdfReader(io.BytesIO(file_content))
+    writer = PdfWriter()
+    for page_number in page_numbers:
+        writer.add_page(reader.pages[page_number - 1])
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _object_digest(obj, memo):
+    """Hash of a PDF object and everything it references; shared objects (fonts, images) are hashed once"""
+    if isinstance(obj, IndirectObject):
+        reference = (obj.idnum, obj.generation)
+        if reference not in memo:
+            memo[reference] = b"cycle"
+            memo[reference] = _object_digest(obj.get_object(), memo)
+        return memo[reference]
+
+    digest = hashlib.sha256(type(obj).__name__.encode("utf-8"))
+    if isinstance(obj, DictionaryObject):
+        for name in sorted(obj):
+            if name not in _UNHASHED_KEYS:
+                digest.update(name.encode("utf-8"))
+                digest.update(_object_digest(obj.raw_get(name), memo))
+        if isinstance(obj, StreamObject):
+            # The raw (still encoded) bytes; no need to decode streams just to compare them
+            digest.update(obj._data or b"")
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            digest.update(_object_digest(item, memo))
+    else:
+        digest.update(repr(obj).encode("utf-8"))
+    return digest.digest()
+
+
+def page_fingerprints(file_content):
+    """
+    Return a fingerprint per page, or None if the PDF can't be read (e.g. encrypted)
+
+    A fingerprint covers the page's content streams, resources (fonts,
+    images), annotations and page box, but not its position, so a page
+    that is unchanged in a revised PDF keeps its fingerprint.
+    """
+    try:
+        reader = PdfReader(io.BytesIO(file_content))
+        if reader.is_encrypted:
+            return None
+        memo = {}
+        return [_object_digest(page, memo).hex() for page in reader.pages]
+    except Exception:
+        return None
+
+
+def format_pages_text(pages):
+    """Build the per-page text view ("--- Page N ---" followed by the page's lines)"""
+    parts = []
+    for page in pages:
+        parts.append(f"\n--- Page {page['page_number']} ---\n")
+        parts.extend(f"{line['content']}\n" for line in page["lines"])
+    return "".join(parts)
+
+
+def shift_page(page, first_page, offset):
+    """
+    Return a copy of a page record moved into the original document
+
+    first_page is the 1-based number of the range's first page; offset is the
+    number of content characters that precede the range.
+    """
+    page = dict(page)
+    page["page_number"] = first_page - 1 + page["page_number"]
+    page["spans"] = [
+        {"offset": span["offset"] + offset, "length": span["length"]}
+        for span in page.get("spans", [])
+    ]
+    if page.get("geometry") is not None:
+        page["geometry"] = page["geometry"].shifted(offset)
+    return page
+
+
+def shift_items(items, first_page):
+    """Copies of styles, barcodes or key-value pairs with their page_number moved like shift_page"""
+    return [
+        {**item, "page_number": first_page - 1 + item["page_number"]} if item.get("page_number") else item
+        for item in items
+    ]
+
+
+def split_pages(result):
+    """
+    Split a normalized result into single-page results
+
+    Each part is numbered page 1 with spans relative to the page's own
+    text, so merge_results can put it back at any position. Returns None
+    when a style, barcode or key-value pair can't be attributed to a page.
+    """
+    for kind in ("styles", "barcodes", "key_value_pairs"):
+        if any(not item.get("page_number") for item in result[kind]):
+            return None
+
+    parts = []
+    for page in result["pages"]:
+        spans = page.get("spans") or []
+        start = spans[0]["offset"] if spans else 0
+        end = spans[-1]["offset"] + spans[-1]["length"] if spans else 0
+        # A trailing newline is the separator to the next page, which merge_results adds back
+        content = result["full_content"][start:end].rstrip("\n")
+
+        page_number = page["page_number"]
+        parts.append({
+            "full_content": content,
+            # Renumber to page 1 and make spans relative to the page's own text
+            "pages": [shift_page(page, 2 - page_number, -start)],
+            **{
+                kind: shift_items([item for item in result[kind] if item["page_number"] == page_number], 2 - page_number)
+                for kind in ("styles", "barcodes", "key_value_pairs")
+            }
+        })
+    return parts
+
+
+def merge_results(chunk_results, file_extension):
+    """
+    Merge normalized results of consecutive page ranges into one document result
+
+    chunk_results is a list of (first_page_number, normalized_result) in page
+    order. Page numbers are shifted to the original document and every content
+    span is offset by the length of the content that precedes it.
+    """
+    content_parts = []
+    pages = []
+    styles = []
+    barcodes = []
+    key_value_pairs = []
+    offset = 0
+
+    for first_page, result in chunk_results:
+        if content_parts:
+            # Pages are separated by a newline in Azure's content
+            content_parts.append("\n")
+            offset += 1
+
+        pages.extend(shift_page(page, first_page, offset) for page in result["pages"])
+
+        content_parts.append(result["full_content"])
+        offset += len(result["full_content"])
+
+        styles.extend(shift_items(result["styles"], first_page))
+        barcodes.extend(shift_items(result["barcodes"], first_page))
+        key_value_pairs.extend(shift_items(result["key_value_pairs"], first_page))
+
+    return {
+        "status": "success",
+        "full_content": "".join(content_parts),
+        "text": format_pages_text(pages),
+        "pages": pages,
+        "styles": styles,
+        "barcodes": barcodes,
+        "key_value_pairs": key_value_pairs,
+        "document_type": file_extension.upper(),
+        "raw_result": None
+    }
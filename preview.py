@@ -0,0 +1,129 @@
+"""
+Cached, background-rendered document previews for the Streamlit UI
+Thumbnails are keyed by content hash and page number, so Streamlit reruns reuse them
+"""
+
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from PIL import Image, ImageOps
+from pdf_splitter import count_pdf_pages
+from config import (
+    PREVIEW_DPI,
+    PREVIEW_MAX_WIDTH,
+    PREVIEW_CACHE_ENTRIES,
+    PREVIEW_WORKERS
+)
+
+
+def render_preview(file_content, file_extension, page_number=1, dpi=PREVIEW_DPI, max_width=PREVIEW_MAX_WIDTH):
+    """Render one page of a PDF or an image as JPEG thumbnail bytes"""
+    if file_extension.lower() == ".pdf":
+        from pdf2image import convert_from_bytes
+        images = convert_from_bytes(file_content, dpi=dpi, first_page=page_number, last_page=page_number)
+        if not images:
+            raise ValueError(f"PDF has no page {page_number}")
+        image = images[0]
+    else:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(file_content)))
+
+    if image.width > max_width:
+        image.thumbnail((max_width, max_width * image.height // image.width), Image.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+class PreviewRenderer:
+    """
+    LRU cache of rendered previews with background rendering
+
+    request() returns a Future: it is already resolved when the preview is
+    cached, otherwise rendering runs in a worker thread. Concurrent requests
+    for the same page share one render.
+    """
+
+    def __init__(self, max_entries=PREVIEW_CACHE_ENTRIES, workers=PREVIEW_WORKERS):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._page_counts = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview")
+
+    @staticmethod
+    def content_key(file_content):
+        return hashlib.sha256(file_content).hexdigest()
+
+    def request(self, file_content, file_extension, page_number=1, content_key=None):
+        """Return a Future resolving to JPEG bytes for the given page"""
+        cache_key = (content_key or self.content_key(file_content), page_number)
+
+        with self._lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                future = Future()
+                future.set_result(self._cache[cache_key])
+                return future
+
+            if cache_key in self._pending:
+                return self._pending[cache_key]
+
+            future = self._executor.submit(render_preview, file_content, file_extension, page_number)
+            self._pending[cache_key] = future
+
+        future.add_done_callback(lambda f: self._store(cache_key, f))
+        return future
+
+    def _store(self, cache_key, future):
+        with self._lock:
+            self._pending.pop(cache_key, None)
+            if future.exception() is not None:
+                return
+            self._cache[cache_key] = future.result()
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def page_count(self, file_content, file_extension, content_key=None):
+        """Number of previewable pages (cached per content hash)"""
+        if file_extension.lower() != ".pdf":
+            return 1
+
+        content_key = content_key or self.content_key(file_content)
+        with self._lock:
+            if content_key in self._page_counts:
+                return self._page_counts[content_key]
+
+        count = count_pdf_pages(file_content) or 1
+        with self._lock:
+            self._page_counts[content_key] = count
+            while len(self._page_counts) > self.max_entries:
+                self._page_counts.popitem(last=False)
+        return count
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": sum(len(v) for v in self._cache.values()),
+                "rendering": len(self._pending)
+            }
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_preview_renderer():
+    """Return the process-wide preview renderer shared by all sessions"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PreviewRenderer()
+    return _renderer
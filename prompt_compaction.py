@@ -0,0 +1,104 @@
+"""
+Local prompt compaction and token accounting for LLM calls
+Removes OCR content the extraction prompt tells the model to ignore, so it is never sent
+"""
+
+import re
+from collections import Counter
+from page_geometry import page_line_confidences
+from config import HEADER_FOOTER_MIN_PAGE_RATIO
+
+# Optional dependency: exact token counts when tiktoken is installed
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+ARABIC_SCRIPT = r"\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF"
+ARABIC_RUN = re.compile(rf"[{ARABIC_SCRIPT}]+(?:[\s\u200C\u200F]+[{ARABIC_SCRIPT}]+)*")
+WHITESPACE_RUN = re.compile(r"[ \t\u00A0\u200C\u200E\u200F]+")
+PAGE_SEPARATOR = re.compile(
+    r"^(?:-{2,}\s*Page \d+\s*-{2,}|<!--\s*Page(?:Break|Number|Header|Footer)[^>]*-->)$", re.IGNORECASE
+)
+EDGE_LINES = 3  # Lines at the top and bottom of a page considered for header/footer detection
+
+
+def count_tokens(text):
+    """Token count of text (exact with tiktoken, otherwise about four characters per token)"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def compact_line(line):
+    """Drop Arabic-script runs and collapse whitespace in one line"""
+    line = ARABIC_RUN.sub(" ", line)
+    return WHITESPACE_RUN.sub(" ", line).strip()
+
+
+def _header_footer_lines(pages):
+    """Lines repeated at the top or bottom of most pages"""
+    if len(pages) < 2:
+        return set()
+
+    counts = Counter()
+    for lines in pages:
+        edge = lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+        counts.update(set(line for line in edge if line))
+
+    min_pages = max(2, HEADER_FOOTER_MIN_PAGE_RATIO * len(pages))
+    return {line for line, count in counts.items() if count >= min_pages}
+
+
+def compact_pages(ocr_result):
+    """
+    Return the OCR result's pages with ignorable content removed
+
+    Arabic-script text, redundant whitespace, empty lines and page separators
+    are dropped, and header/footer lines repeated across pages are kept only
+    on their first page. Each page is
+    {"page_number", "lines": [{"content"}], "line_confidences"} where
+    line_confidences are the original per-line OCR confidences (or None).
+    """
+    pages = ocr_result.get("pages")
+    if not isinstance(pages, list) or not pages:
+        pages = [{
+            "page_number": 1,
+            "lines": [{"content": line} for line in ocr_result.get("full_content", "").splitlines()]
+        }]
+
+    compacted_lines = []
+    for page in pages:
+        confidences = _line_confidences(page)
+        compacted_lines.append([
+            (compact_line(line["content"]), confidence)
+            for line, confidence in zip(page.get("lines", []), confidences)
+        ])
+
+    repeated = _header_footer_lines([[line for line, _ in lines] for lines in compacted_lines])
+
+    compacted = []
+    seen_repeated = set()
+    for page, lines in zip(pages, compacted_lines):
+        kept = []
+        for line, confidence in lines:
+            if not line or PAGE_SEPARATOR.match(line):
+                continue
+            if line in repeated:
+                # Keep a header/footer line once; it may carry document facts
+                if line in seen_repeated:
+                    continue
+                seen_repeated.add(line)
+            kept.append((line, confidence))
+        compacted.append({
+            "page_number": page.get("page_number", len(compacted) + 1),
+            "lines": [{"content": line} for line, _ in kept],
+            "line_confidences": [confidence for _, confidence in kept]
+        })
+    return compacted
+
+
+def _line_confidences(page):
+    """Per-line mean word confidence for a normalized page (None where unknown)"""
+    return [None if confidence != confidence else float(confidence) for confidence in page_line_confidences(page)]
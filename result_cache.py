@@ -0,0 +1,138 @@
+"""
+Persistent result cache backed by SQLite
+Stores JSON-serializable results keyed by a content hash, with size- and age-based eviction
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class ResultCache:
+    """
+    Key/value cache for JSON-serializable results
+
+    Entries older than max_age_seconds are treated as missing and removed.
+    When the stored payloads exceed max_bytes, the least recently used
+    entries are evicted first. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, path, max_bytes, max_age_seconds):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._conn.commit()
+
+    def _is_expired(self, created_at, now):
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                self.evictions += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(value)
+
+    def set(self, key, value):
+        """Store value under key and evict old entries if the cache is over budget"""
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        if self.max_age_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE created_at < ?", (now - self.max_age_seconds,)
+            )
+            self.evictions += cursor.rowcount
+
+        if self.max_bytes is None:
+            return
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC"):
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", stale_keys)
+        self.evictions += len(stale_keys)
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total_bytes
+        }
@@ -0,0 +1,276 @@
+"""
+Persistent, indexed store of processed documents
+Keeps normalized OCR text per page (SQLite FTS5 full-text index), extracted key-values and
+barcodes, so processed documents can be found again without calling Azure or the LLM
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from config import RESULT_STORE_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id INTEGER PRIMARY KEY,
+    document_key TEXT NOT NULL UNIQUE,
+    source TEXT,
+    document_type TEXT,
+    page_count INTEGER NOT NULL,
+    full_content TEXT NOT NULL,
+    extraction TEXT,
+    extraction_source TEXT,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    document_id INTEGER NOT NULL REFERENCES documents (document_id) ON DELETE CASCADE,
+    origin TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    normalized_value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fields_normalized_value ON fields (normalized_value);
+CREATE INDEX IF NOT EXISTS fields_field_normalized_value ON fields (field, normalized_value);
+CREATE INDEX IF NOT EXISTS fields_document_id ON fields (document_id);
+CREATE TABLE IF NOT EXISTS barcodes (
+    document_id INTEGER NOT NULL REFERENCES documents (document_id) ON DELETE CASCADE,
+    page_number INTEGER,
+    type TEXT,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS barcodes_value ON barcodes (value);
+CREATE INDEX IF NOT EXISTS barcodes_document_id ON barcodes (document_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5 (
+    content,
+    document_id UNINDEXED,
+    page_number UNINDEXED,
+    tokenize = 'unicode61'
+);
+"""
+
+
+def document_key(file_content):
+    """Identity of a document in the store: the hash of its bytes"""
+    return hashlib.sha256(file_content).hexdigest()
+
+
+def normalize_value(value):
+    """Case- and whitespace-insensitive form used for field lookups"""
+    return re.sub(r"\s+", " ", str(value)).strip().casefold()
+
+
+def flatten_fields(value, prefix=""):
+    """Yield (dotted.path, scalar) pairs of a nested JSON object; list items share their parent's path"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten_fields(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from flatten_fields(item, prefix)
+    elif value is not None and str(value).strip():
+        yield prefix, str(value)
+
+
+def fts_query(text):
+    """Quote each term so identifiers like 2202163.01 are matched as phrases, not FTS syntax"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+class ResultStore:
+    """
+    SQLite store of processed documents
+
+    Saving a document with a key that is already stored replaces it.
+    Writes from several threads are serialized; reads share the same
+    connection under the lock.
+    """
+
+    def __init__(self, path=RESULT_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _insert(self, key, source, ocr_result, extraction=None, extraction_source=None):
+        self._delete_key(key)
+        pages = ocr_result.get("pages") or []
+        cursor = self._conn.execute(
+            "INSERT INTO documents (document_key, source, document_type, page_count, full_content, "
+            "extraction, extraction_source, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, source, ocr_result.get("document_type"), len(pages), ocr_result.get("full_content") or "",
+             json.dumps(extraction, ensure_ascii=False) if extraction is not None else None,
+             extraction_source, time.time())
+        )
+        document_id = cursor.lastrowid
+
+        self._conn.executemany(
+            "INSERT INTO pages_fts (content, document_id, page_number) VALUES (?, ?, ?)",
+            [
+                ("\n".join(line["content"] for line in page.get("lines", [])), document_id, page.get("page_number"))
+                for page in pages
+            ]
+        )
+
+        fields = [
+            ("ocr", kv["key"], kv["value"])
+            for kv in ocr_result.get("key_value_pairs") or []
+            if kv.get("key") and kv.get("value")
+        ]
+        if isinstance(extraction, dict):
+            fields.extend(("extraction", field, value) for field, value in flatten_fields(extraction))
+        self._conn.executemany(
+            "INSERT INTO fields (document_id, origin, field, value, normalized_value) VALUES (?, ?, ?, ?, ?)",
+            [(document_id, origin, field, value, normalize_value(value)) for origin, field, value in fields]
+        )
+
+        self._conn.executemany(
+            "INSERT INTO barcodes (document_id, page_number, type, value) VALUES (?, ?, ?, ?)",
+            [
+                (document_id, barcode.get("page_number"), barcode.get("type"),
+                 barcode.get("value") or barcode.get("data"))
+                for barcode in ocr_result.get("barcodes") or []
+            ]
+        )
+        return document_id
+
+    def _delete_key(self, key):
+        row = self._conn.execute("SELECT document_id FROM documents WHERE document_key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM pages_fts WHERE document_id = ?", (row[0],))
+            self._conn.execute("DELETE FROM documents WHERE document_id = ?", (row[0],))
+
+    def save(self, key, source, ocr_result, extraction=None, extraction_source=None):
+        """Store one document and return its document_id"""
+        with self._lock:
+            try:
+                document_id = self._insert(key, source, ocr_result, extraction, extraction_source)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return document_id
+
+    def save_many(self, documents):
+        """
+        Store many documents in one transaction
+
+        documents: iterable of dicts with "key", "source", "ocr_result" and
+        optionally "extraction" and "extraction_source". Returns the number stored.
+        """
+        count = 0
+        with self._lock:
+            try:
+                for document in documents:
+                    self._insert(document["key"], document.get("source"), document["ocr_result"],
+                                 document.get("extraction"), document.get("extraction_source"))
+                    count += 1
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return count
+
+    def find_by_field(self, value, field=None, limit=50):
+        """Documents with a key-value (OCR or extracted) or barcode equal to value, optionally only for one field"""
+        normalized = normalize_value(value)
+        params = [normalized]
+        field_filter = ""
+        if field:
+            field_filter = " AND (f.field = ? OR f.field LIKE ?)"
+            params.extend([field, f"%.{field}"])
+        query = (
+            "SELECT d.document_id, d.source, d.document_type, f.origin, f.field, f.value "
+            "FROM fields f JOIN documents d ON d.document_id = f.document_id "
+            f"WHERE f.normalized_value = ?{field_filter}"
+        )
+        if not field:
+            query += (
+                " UNION ALL SELECT d.document_id, d.source, d.document_type, 'barcode', b.type, b.value "
+                "FROM barcodes b JOIN documents d ON d.document_id = b.document_id WHERE b.value = ?"
+            )
+            params.append(str(value).strip())
+        query += " LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"document_id": row[0], "source": row[1], "document_type": row[2],
+             "origin": row[3], "field": row[4], "value": row[5]}
+            for row in rows
+        ]
+
+    def search(self, text, limit=20, raw=False):
+        """
+        Full-text search over page text, best matches first
+
+        Terms are ANDed and each is matched as a phrase; pass raw=True to
+        use FTS5 query syntax directly. Returns one hit per matching page
+        with a highlighted snippet.
+        """
+        query = text if raw else fts_query(text)
+        if not query:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.document_id, p.page_number, d.source, "
+                "snippet(pages_fts, 0, '**', '**', '…', 12), bm25(pages_fts) AS rank "
+                "FROM pages_fts p JOIN documents d ON d.document_id = p.document_id "
+                "WHERE pages_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        return [
+            {"document_id": row[0], "page_number": row[1], "source": row[2], "snippet": row[3], "rank": row[4]}
+            for row in rows
+        ]
+
+    def get(self, document_id):
+        """Stored summary of one document (without page text), or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT document_id, document_key, source, document_type, page_count, extraction, "
+                "extraction_source, stored_at FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "document_id": row[0],
+            "document_key": row[1],
+            "source": row[2],
+            "document_type": row[3],
+            "page_count": row[4],
+            "extraction": json.loads(row[5]) if row[5] else None,
+            "extraction_source": row[6],
+            "stored_at": row[7]
+        }
+
+    def stats(self):
+        with self._lock:
+            documents, pages = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(page_count), 0) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "pages": pages}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Return the process-wide result store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+    return _store
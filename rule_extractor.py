@@ -0,0 +1,156 @@
+"""
+Deterministic, rule-based field extraction from OCR results
+Finds common fields (e.g. trade licence numbers and dates) from Azure
+key-value pairs and label/regex rules over page lines, with a confidence per field
+"""
+
+import re
+from page_geometry import page_line_confidences
+
+DATE_PATTERN = (
+    r"(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}"
+    r"|\d{4}[/.-]\d{1,2}[/.-]\d{1,2}"
+    r"|\d{1,2}[\s-][A-Za-z]{3,9}[\s-]\d{4}"
+    r"|[A-Za-z]{3,9}\s+\d{1,2},?\s+\d{4})"
+)
+
+FIELD_RULES = {
+    "license_number": {
+        # A number cue is required: a bare "Trade Licence" is usually the document title
+        "labels": [r"licen[cs]e\s*(?:no\b\.?|number|#)", r"registration\s+(?:no\b\.?|number)"],
+        "value": r"([A-Z0-9][A-Z0-9./-]*\d[A-Z0-9./-]*)",
+        "reject": DATE_PATTERN  # Dates also match the value pattern
+    },
+    "issue_date": {
+        "labels": [r"issue\s+date", r"date\s+of\s+issue", r"issued\s+on", r"issuance\s+date"],
+        "value": DATE_PATTERN
+    },
+    "expiry_date": {
+        "labels": [r"expiry\s+date", r"expiration\s+date", r"date\s+of\s+expiry", r"valid\s+(?:until|till|up\s+to)", r"expires\s+on"],
+        "value": DATE_PATTERN
+    },
+    "company_name": {
+        "labels": [r"company\s+name", r"trade\s+name", r"name\s+of\s+(?:the\s+)?company"],
+        "value": r"([A-Za-z0-9&][A-Za-z0-9&.,'()\- ]{1,}[A-Za-z0-9.)])"
+    }
+}
+
+DOCUMENT_TYPES = {
+    "trade_license": {
+        "keywords": [r"trade\s+licen[cs]e", r"commercial\s+licen[cs]e", r"economic\s+(?:department|development)", r"licen[cs]e\s+(?:no|number)"],
+        "fields": ["license_number", "issue_date", "expiry_date", "company_name"]
+    }
+}
+
+_compiled_rules = {
+    field: {
+        "labels": [re.compile(label, re.IGNORECASE) for label in rule["labels"]],
+        "value": re.compile(rule["value"]),
+        "reject": re.compile(rule["reject"]) if "reject" in rule else None
+    }
+    for field, rule in FIELD_RULES.items()
+}
+
+# Any field's label; a value ends where the next label starts (OCR often puts several fields on one line)
+_any_label = re.compile("|".join(label for rule in FIELD_RULES.values() for label in rule["labels"]), re.IGNORECASE)
+
+
+def detect_document_type(content):
+    """Return the recognised document type for the text, or None"""
+    for document_type, spec in DOCUMENT_TYPES.items():
+        if any(re.search(keyword, content, re.IGNORECASE) for keyword in spec["keywords"]):
+            return document_type
+    return None
+
+
+def _match_value(field, text):
+    rule = _compiled_rules[field]
+    next_label = _any_label.search(text)
+    if next_label:
+        text = text[:next_label.start()]
+    match = rule["value"].search(text)
+    if not match:
+        return None
+    value = match.group(1).strip()
+    if rule["reject"] is not None and rule["reject"].fullmatch(value):
+        return None
+    return value
+
+
+def _kv_candidates(ocr_result):
+    """Candidates from Azure key_value_pairs (only present for models that return them)"""
+    for kv in ocr_result.get("key_value_pairs") or []:
+        if not kv.get("key") or not kv.get("value"):
+            continue
+        for field, rule in _compiled_rules.items():
+            if any(label.search(kv["key"]) for label in rule["labels"]):
+                value = _match_value(field, kv["value"])
+                if value:
+                    yield field, value, kv.get("confidence") or 0.9
+
+
+def _line_candidates(ocr_result):
+    """Candidates from "Label: value" on one line, or a label followed by the value on the next line"""
+    for page in ocr_result.get("pages") or []:
+        lines = [line["content"] for line in page.get("lines", [])]
+        confidences = page_line_confidences(page)
+
+        for i, line in enumerate(lines):
+            for field, rule in _compiled_rules.items():
+                for label in rule["labels"]:
+                    match = label.search(line)
+                    if not match:
+                        continue
+
+                    line_confidence = confidences[i] if confidences[i] == confidences[i] else 1.0
+                    rest = line[match.end():].lstrip(" \t:.-#")
+                    value = _match_value(field, rest) if rest else None
+                    if value:
+                        yield field, value, float(line_confidence) * 0.95
+                    elif i + 1 < len(lines):
+                        value = _match_value(field, lines[i + 1])
+                        if value:
+                            next_confidence = confidences[i + 1] if confidences[i + 1] == confidences[i + 1] else 1.0
+                            yield field, value, float(min(line_confidence, next_confidence)) * 0.85
+                    break
+
+
+def extract_with_rules(ocr_result, min_confidence):
+    """
+    Extract known fields with label/regex rules
+
+    Returns:
+        dict: "document_type" (or None if unrecognised), "data" with the best
+        value per field, "confidence" per field and "uncertain", the fields
+        of the document type that are missing, below min_confidence or found
+        with conflicting values
+    """
+    content = ocr_result.get("full_content") or ocr_result.get("text") or ""
+    document_type = detect_document_type(content)
+
+    candidates = {}
+    for field, value, confidence in list(_kv_candidates(ocr_result)) + list(_line_candidates(ocr_result)):
+        candidates.setdefault(field, []).append((value, confidence))
+
+    data = {}
+    field_confidence = {}
+    conflicting = set()
+    for field, values in candidates.items():
+        value, confidence = max(values, key=lambda candidate: candidate[1])
+        data[field] = value
+        field_confidence[field] = round(confidence, 4)
+        if any(other != value and other_confidence >= min_confidence for other, other_confidence in values):
+            conflicting.add(field)
+
+    expected = DOCUMENT_TYPES[document_type]["fields"] if document_type else list(FIELD_RULES)
+    uncertain = [
+        field for field in expected
+        if field not in data or field_confidence[field] < min_confidence or field in conflicting
+    ]
+
+    return {
+        "document_type": document_type,
+        "data": data,
+        "confidence": field_confidence,
+        "uncertain": uncertain
+    }
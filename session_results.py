@@ -0,0 +1,228 @@
+"""
+Memory-bounded storage of per-session results for the Streamlit app
+Results are kept as compressed binary blobs (word text, confidences and geometry packed into
+arrays, SDK objects dropped) under a per-process memory budget; least recently used blobs are
+spilled to local disk and read back when a session needs them again
+"""
+
+import os
+import time
+import zlib
+import atexit
+import pickle
+import uuid
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import metrics
+from page_geometry import PageGeometry, page_words
+from config import SESSION_MEMORY_BUDGET_BYTES, SESSION_SPILL_DIR, SESSION_RESULT_TTL_SECONDS
+
+# Optional dependency (in requirements.txt): msgpack is smaller, faster to load and, unlike pickle, can't run code
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_GEOMETRY_ARRAYS = {
+    "line_polygons": (np.float32, None),
+    "line_polygon_offsets": (np.int64, None),
+    "line_spans": (np.int64, 2),
+    "word_polygons": (np.float32, None),
+    "word_polygon_offsets": (np.int64, None),
+    "word_confidences": (np.float32, None),
+    "word_spans": (np.int64, 2)
+}
+
+
+def _pack_page(page):
+    """Page record with lines/words as plain lists and arrays as raw bytes"""
+    packed = {k: v for k, v in page.items() if k not in ("lines", "words", "geometry")}
+    packed["lines"] = [line["content"] for line in page.get("lines", [])]
+
+    geometry = page.get("geometry")
+    if isinstance(geometry, dict):
+        geometry = PageGeometry.from_dict(geometry)
+    if geometry is not None and geometry.word_contents is not None and "words" not in page:
+        # Word text and confidences travel with the geometry
+        packed["geometry"] = {name: np.ascontiguousarray(getattr(geometry, name)).tobytes() for name in _GEOMETRY_ARRAYS}
+        packed["word_contents"] = geometry.word_contents
+        return packed
+
+    words = page_words(page)
+    packed["word_contents"] = [word["content"] for word in words]
+    packed["word_confidences"] = np.array(
+        [np.nan if word.get("confidence") is None else word["confidence"] for word in words], dtype=np.float32
+    ).tobytes()
+    if geometry is not None:
+        packed["geometry"] = {name: np.ascontiguousarray(getattr(geometry, name)).tobytes() for name in _GEOMETRY_ARRAYS}
+    return packed
+
+
+def _unpack_page(packed):
+    page = {k: v for k, v in packed.items() if k not in ("word_contents", "word_confidences", "geometry")}
+    page["lines"] = [{"content": content} for content in packed["lines"]]
+    if "word_confidences" in packed:
+        confidences = np.frombuffer(packed["word_confidences"], dtype=np.float32)
+        page["words"] = [
+            {"content": content, "confidence": None if np.isnan(confidence) else round(float(confidence), 4)}
+            for content, confidence in zip(packed["word_contents"], confidences)
+        ]
+    if packed.get("geometry") is not None:
+        arrays = {}
+        for name, (dtype, width) in _GEOMETRY_ARRAYS.items():
+            array = np.frombuffer(packed["geometry"][name], dtype=dtype)
+            arrays[name] = array.reshape(-1, width) if width else array
+        page["geometry"] = PageGeometry(**arrays, word_contents=None if "words" in page else packed["word_contents"])
+    return page
+
+
+def pack_result(value):
+    """
+    Serialize a result dict into a compact blob
+
+    The SDK object (raw_result) is dropped, and OCR pages are packed so
+    word text, confidences and geometry are stored as arrays instead of
+    one Python object per word.
+    """
+    data = {k: v for k, v in value.items() if k != "raw_result"} if isinstance(value, dict) else value
+    if isinstance(data, dict) and isinstance(data.get("pages"), list):
+        data["pages"] = [_pack_page(page) for page in data["pages"]]
+    if msgpack is not None:
+        return b"M" + zlib.compress(msgpack.packb(data, use_bin_type=True), 1)
+    return b"P" + zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def unpack_result(blob):
+    """Rebuild a result from pack_result(); pages get PageGeometry objects back"""
+    payload = zlib.decompress(blob[1:])
+    data = msgpack.unpackb(payload, raw=False) if blob[:1] == b"M" else pickle.loads(payload)
+    if isinstance(data, dict) and isinstance(data.get("pages"), list):
+        data["pages"] = [_unpack_page(page) for page in data["pages"]]
+    return data
+
+
+class SessionResultStore:
+    """
+    Per-session results under a per-process memory budget
+
+    Each session stores named results (e.g. "ocr_result"); storing a name
+    again replaces its previous value. When the blobs in memory exceed
+    budget_bytes, the least recently used ones are written to a spill
+    directory and read back on the next get(). Entries not used for
+    ttl_seconds are dropped, since sessions end without notice.
+    """
+
+    def __init__(self, budget_bytes=SESSION_MEMORY_BUDGET_BYTES, spill_dir=SESSION_SPILL_DIR,
+                 ttl_seconds=SESSION_RESULT_TTL_SECONDS):
+        os.makedirs(spill_dir, exist_ok=True)
+        self.budget_bytes = budget_bytes
+        self.ttl_seconds = ttl_seconds
+        # One directory per process, so several app processes can share SESSION_SPILL_DIR.
+        # mkdtemp creates it with mode 0700: without msgpack the spill files are pickles,
+        # and only files this process wrote there (tracked per entry) are ever loaded
+        self.spill_dir = tempfile.mkdtemp(prefix="session-results-", dir=spill_dir)
+        atexit.register(shutil.rmtree, self.spill_dir, True)
+
+        self.memory_bytes = 0
+        self.spills = 0
+        self._entries = OrderedDict()  # (session_id, name) -> entry, least recently used first
+        self._lock = threading.Lock()
+
+    def put(self, session_id, name, value):
+        """Store a result for a session (None removes it)"""
+        key = (session_id, name)
+        blob = pack_result(value) if value is not None else None
+        with self._lock:
+            self._remove(key)
+            if blob is not None:
+                self._entries[key] = {"blob": blob, "size": len(blob), "path": None, "accessed_at": time.time()}
+                self.memory_bytes += len(blob)
+            self._expire()
+            self._enforce_budget()
+
+    def get(self, session_id, name):
+        """Return a session's result, reading it back from disk if it was spilled, or None"""
+        key = (session_id, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["blob"] is None:
+                with open(entry["path"], "rb") as f:
+                    entry["blob"] = f.read()
+                os.remove(entry["path"])
+                entry["path"] = None
+                self.memory_bytes += entry["size"]
+            entry["accessed_at"] = time.time()
+            self._entries.move_to_end(key)
+            blob = entry["blob"]
+            self._enforce_budget(keep=key)
+        return unpack_result(blob)
+
+    def usage(self, session_id):
+        """Bytes a session holds in memory and on disk"""
+        with self._lock:
+            entries = [entry for (owner, _), entry in self._entries.items() if owner == session_id]
+        return {
+            "entries": len(entries),
+            "memory_bytes": sum(entry["size"] for entry in entries if entry["blob"] is not None),
+            "disk_bytes": sum(entry["size"] for entry in entries if entry["blob"] is None)
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len({owner for owner, _ in self._entries}),
+                "entries": len(self._entries),
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": sum(entry["size"] for entry in self._entries.values() if entry["blob"] is None),
+                "budget_bytes": self.budget_bytes,
+                "spills": self.spills
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry["blob"] is not None:
+            self.memory_bytes -= entry["size"]
+        elif entry["path"]:
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for key in [key for key, entry in self._entries.items() if entry["accessed_at"] < cutoff]:
+            self._remove(key)
+
+    def _enforce_budget(self, keep=None):
+        for key, entry in list(self._entries.items()):
+            if self.memory_bytes <= self.budget_bytes:
+                break
+            if entry["blob"] is None or key == keep:
+                continue
+            path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.bin")
+            with open(path, "wb") as f:
+                f.write(entry["blob"])
+            entry["blob"], entry["path"] = None, path
+            self.memory_bytes -= entry["size"]
+            self.spills += 1
+            metrics.increment("session_results_spilled_total")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_results():
+    """Return the process-wide session result store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionResultStore()
+    return _store
@@ -0,0 +1,62 @@
+"""
+Tests for planning batched extraction calls and splitting their answers per document
+"""
+
+import json
+import pytest
+from batched_extraction import plan_batches, format_document_sections, parse_batch_output, split_token_usage
+
+
+def test_plan_batches_respects_budget_and_count():
+    assert plan_batches([40, 40, 40, 10], token_budget=100, max_documents=10) == [[0, 1], [2, 3]]
+    assert plan_batches([1, 1, 1, 1, 1], token_budget=100, max_documents=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_plan_batches_oversized_document_gets_its_own_batch():
+    assert plan_batches([10, 500, 10], token_budget=100, max_documents=10) == [[0], [1], [2]]
+    assert plan_batches([], token_budget=100, max_documents=10) == []
+
+
+def test_format_document_sections():
+    sections = format_document_sections(["alpha", "bravo"])
+    assert sections.startswith("=== DOCUMENT 1 ===\nalpha\n=== END OF DOCUMENT 1 ===")
+    assert sections.endswith("=== DOCUMENT 2 ===\nbravo\n=== END OF DOCUMENT 2 ===")
+
+
+def test_parse_batch_output_matches_document_numbers():
+    output = json.dumps([
+        {"document": 2, "data": {"name": "B"}},
+        {"document": 1, "data": {"name": "A"}}
+    ])
+    assert parse_batch_output(output, 2) == [{"data": {"name": "A"}}, {"data": {"name": "B"}}]
+
+
+def test_parse_batch_output_after_final_answer():
+    output = 'Thought: [not this]\nFinal Answer: ```json\n[{"document": 1, "data": {"name": "A"}}]\n```'
+    assert parse_batch_output(output, 1) == [{"data": {"name": "A"}}]
+
+
+def test_parse_batch_output_falls_back_to_position():
+    output = json.dumps([{"data": {"name": "A"}}, {"document": 9, "data": {"name": "B"}}, "junk"])
+    assert parse_batch_output(output, 3) == [{"data": {"name": "A"}}, {"data": {"name": "B"}}, None]
+
+
+def test_parse_batch_output_keeps_the_first_answer_per_document():
+    output = json.dumps([{"document": 1, "data": {"name": "A"}}, {"document": 1, "data": {"name": "again"}}])
+    assert parse_batch_output(output, 2) == [{"data": {"name": "A"}}, None]
+
+
+def test_parse_batch_output_without_array():
+    with pytest.raises(json.JSONDecodeError):
+        parse_batch_output("I could not read these documents.", 2)
+    with pytest.raises(json.JSONDecodeError):
+        parse_batch_output('[{"document": 1', 1)
+
+
+def test_split_token_usage():
+    shares = split_token_usage({"input_tokens": 1000, "output_tokens": 100}, [300, 100])
+    assert shares == [{"input_tokens": 750, "output_tokens": 75}, {"input_tokens": 250, "output_tokens": 25}]
+    # Without weights the usage is shared evenly
+    assert split_token_usage({"input_tokens": 10, "output_tokens": 4}, [0, 0]) == [
+        {"input_tokens": 5, "output_tokens": 2}, {"input_tokens": 5, "output_tokens": 2}
+    ]
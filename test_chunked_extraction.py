@@ -0,0 +1,80 @@
+"""
+Tests for chunking long OCR results and merging per-chunk extractions
+"""
+
+from chunked_extraction import split_into_chunks, merge_extractions
+
+
+def test_nested_conflict_keeps_higher_confidence_chunk():
+    merged = merge_extractions([
+        ({"data": {"a": "hi", "addr": {"city": "X"}}}, 0.99),
+        ({"data": {"a": "lo", "addr": {"city": "Y"}}}, 0.5)
+    ])
+    assert merged == {"data": {"a": "hi", "addr": {"city": "X"}}}
+
+
+def test_nested_conflict_takes_later_chunk_with_higher_confidence():
+    merged = merge_extractions([
+        ({"data": {"a": "lo", "addr": {"city": "Y"}}}, 0.5),
+        ({"data": {"a": "hi", "addr": {"city": "X", "zip": "1"}}}, 0.99)
+    ])
+    assert merged == {"data": {"a": "hi", "addr": {"city": "X", "zip": "1"}}}
+
+
+def test_conflict_after_three_chunks_uses_per_key_confidence():
+    merged = merge_extractions([
+        ({"data": {"a": "first"}}, 0.6),
+        ({"data": {"b": "second"}}, 0.9),
+        ({"data": {"a": "third", "b": "third"}}, 0.7)
+    ])
+    assert merged == {"data": {"a": "third", "b": "second"}}
+
+
+def test_tie_keeps_earlier_chunk():
+    merged = merge_extractions([({"name": "first"}, 0.8), ({"name": "second"}, 0.8)])
+    assert merged == {"name": "first"}
+
+
+def test_missing_and_null_values_are_filled():
+    merged = merge_extractions([({"name": None, "id": "1"}, 0.9), ({"name": "ACME"}, 0.1)])
+    assert merged == {"name": "ACME", "id": "1"}
+
+
+def test_arrays_concatenate_without_duplicates():
+    merged = merge_extractions([
+        ({"items": [{"sku": 1}, {"sku": 2}]}, 0.9),
+        ({"items": [{"sku": 2}, {"sku": 3}]}, 0.4)
+    ])
+    assert merged == {"items": [{"sku": 1}, {"sku": 2}, {"sku": 3}]}
+
+
+def test_array_and_scalar_combine():
+    assert merge_extractions([({"tags": "a"}, 0.5), ({"tags": ["a", "b"]}, 0.5)]) == {"tags": ["a", "b"]}
+
+
+def test_non_dict_partials_are_ignored():
+    assert merge_extractions([(None, 0.9), (["x"], 0.9), ({"a": 1}, 0.2)]) == {"a": 1}
+
+
+def test_chunks_respect_budget_and_page_boundaries():
+    pages = [
+        {"page_number": number, "lines": [{"content": "word " * 20}] * 3, "line_confidences": [0.9, 0.8, None]}
+        for number in (1, 2)
+    ]
+    chunks = split_into_chunks({"pages": pages}, max_tokens=60)
+    assert [chunk["pages"] for chunk in chunks] == [[1], [1], [2], [2]]
+    assert all(chunk["text"] for chunk in chunks)
+    assert abs(chunks[0]["confidence"] - 0.85) < 1e-6
+
+
+def test_whole_pages_pack_together():
+    pages = [{"page_number": number, "lines": [{"content": "short line"}]} for number in (1, 2, 3)]
+    chunks = split_into_chunks({"pages": pages}, max_tokens=1000)
+    assert len(chunks) == 1
+    assert chunks[0]["pages"] == [1, 2, 3]
+    assert chunks[0]["confidence"] is None
+
+
+def test_full_content_fallback():
+    chunks = split_into_chunks({"full_content": "one\ntwo"}, max_tokens=1000)
+    assert chunks == [{"text": "one\ntwo", "pages": [1], "confidence": None}]
@@ -0,0 +1,53 @@
+"""
+Tests for parsing the JSON answer out of crew output
+"""
+
+from crewai_processor import parse_json_output, parse_partial_json
+
+REACT_PREFIX = 'Thought: The licence shows {"company_name": "draft"}; I now can give a great answer\nFinal Answer: '
+
+
+def test_complete_object():
+    assert parse_partial_json('{"a": "x", "b": [1, 2]}') == {"a": "x", "b": [1, 2]}
+
+
+def test_nothing_before_the_object_starts():
+    assert parse_partial_json("") is None
+    assert parse_partial_json("```json\n") is None
+
+
+def test_truncated_string_value_is_left_out():
+    assert parse_partial_json('{"a": "done", "b": "half wri') == {"a": "done"}
+
+
+def test_truncated_key_is_left_out():
+    assert parse_partial_json('{"a": "done", "bb') == {"a": "done"}
+
+
+def test_number_waits_for_the_comma():
+    assert parse_partial_json('{"a": 12') == {}
+    assert parse_partial_json('{"a": 12, "b": ') == {"a": 12}
+
+
+def test_truncated_nested_containers_are_closed():
+    assert parse_partial_json('{"a": {"b": ["x", "y') == {"a": {"b": ["x"]}}
+
+
+def test_code_fence_prefix():
+    assert parse_partial_json('```json\n{"a": "x"}\n```') == {"a": "x"}
+
+
+def test_react_thought_is_not_parsed():
+    # The object in the thought is not the answer, and the answer hasn't started yet
+    assert parse_partial_json(REACT_PREFIX.split("\nFinal Answer:")[0]) is None
+    assert parse_partial_json(REACT_PREFIX) is None
+
+
+def test_react_answer_is_parsed_after_final_answer():
+    assert parse_partial_json(REACT_PREFIX + '{"company_name": "ACME", "lic') == {"company_name": "ACME"}
+    assert parse_partial_json(REACT_PREFIX + '{"company_name": "ACME"}') == {"company_name": "ACME"}
+
+
+def test_parse_json_output_with_prefix():
+    assert parse_json_output(REACT_PREFIX + '{"company_name": "ACME"}\n') == {"company_name": "ACME"}
+    assert parse_json_output('Here it is:\n```json\n{"a": 1}\n```') == {"a": 1}
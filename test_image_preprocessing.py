@@ -0,0 +1,54 @@
+"""
+Tests for image preprocessing before upload
+"""
+
+import io
+from PIL import Image
+from image_preprocessing import preprocess_image
+
+
+def _png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _decode(data):
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+
+def _noisy_rgba(size, alpha):
+    image = Image.effect_noise(size, 80).convert("RGBA")
+    image.putalpha(alpha)
+    return image
+
+
+def test_transparent_areas_become_white():
+    image = _noisy_rgba((400, 300), 0)
+    # Opaque black "text" in the middle of a transparent page
+    image.paste((0, 0, 0, 255), (150, 100, 250, 200))
+    output, stats = preprocess_image(_png(image), max_dimension=1000, grayscale=False, quality=90)
+    assert stats["applied"]
+    decoded = _decode(output)
+    assert min(decoded.getpixel((10, 10))) > 240
+    assert max(decoded.getpixel((200, 150))) < 15
+
+
+def test_palette_transparency_becomes_white():
+    image = _noisy_rgba((400, 300), 0).convert("P")
+    image.info["transparency"] = 0
+    image = Image.open(io.BytesIO(_png(image)))
+    output, _ = preprocess_image(_png(image), max_dimension=1000, grayscale=True, quality=90)
+    decoded = _decode(output)
+    transparent = [xy for xy in ((x, y) for x in range(0, 400, 7) for y in range(0, 300, 7))
+                   if image.getpixel(xy) == 0]
+    assert transparent
+    assert all(min(decoded.getpixel(xy)) > 200 for xy in transparent[:20])
+
+
+def test_downscale_records_scale_to_original():
+    image = Image.effect_noise((2000, 1000), 80).convert("RGB")
+    output, stats = preprocess_image(_png(image), max_dimension=500, grayscale=False, quality=80)
+    assert stats["processed_size"] == [500, 250]
+    assert stats["scale"] == [4.0, 4.0]
+    assert _decode(output).size == (500, 250)
@@ -0,0 +1,97 @@
+"""
+Tests for the in-process and SQLite job queues and progress reporting
+"""
+
+import time
+import pytest
+from job_queue import MemoryJobQueue, SQLiteJobQueue, ProgressReporter, QueueFullError, new_job
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def job_queue(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobQueue(max_size=2)
+    return SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), max_size=2)
+
+
+def test_claim_returns_oldest_job_with_content(job_queue):
+    first, second = new_job(b"one", ".PDF", False), new_job(b"two", ".pdf", True)
+    job_queue.put(first)
+    job_queue.put(second)
+    claimed = job_queue.claim(timeout=0)
+    assert claimed["job_id"] == first["job_id"]
+    assert claimed["status"] == "running"
+    assert claimed["file_content"] == b"one"
+    assert claimed["file_extension"] == ".pdf"
+
+
+def test_full_queue_rejects_jobs(job_queue):
+    job_queue.put(new_job(b"1", ".pdf", False))
+    job_queue.put(new_job(b"2", ".pdf", False))
+    with pytest.raises(QueueFullError):
+        job_queue.put(new_job(b"3", ".pdf", False))
+
+
+def test_claim_times_out_on_empty_queue(job_queue):
+    assert job_queue.claim(timeout=0.1) is None
+
+
+def test_finish_drops_upload_and_progress(job_queue):
+    job = new_job(b"content", ".pdf", False)
+    job_queue.put(job)
+    job_queue.claim(timeout=0)
+    job_queue.report_progress(job["job_id"], {"stage": "ocr", "pages": []})
+    job_queue.finish(job["job_id"], "succeeded", {"ocr_result": {"text": "hi"}})
+    finished = job_queue.get(job["job_id"])
+    assert finished["status"] == "succeeded"
+    assert finished["result"] == {"ocr_result": {"text": "hi"}}
+    assert finished["progress"] is None
+    assert finished["file_content"] is None
+
+
+def test_progress_reporter_publishes_ocr_result_once(job_queue):
+    job = new_job(b"content", ".pdf", True)
+    job_queue.put(job)
+    job_queue.claim(timeout=0)
+    reporter = ProgressReporter(job_queue, job["job_id"], interval=0)
+    reporter.add_page({"page_number": 1, "lines": [{"content": "a"}, {"content": "b"}]})
+    assert job_queue.get(job["job_id"])["progress"] == {"stage": "ocr", "pages": [{"page_number": 1, "text": "a\nb"}]}
+
+    reporter.start_extraction({"text": "a\nb"})
+    reporter.add_token('{"name": ')
+    reporter.add_token('"ACME"}')
+    assert job_queue.get(job["job_id"])["progress"] == {
+        "stage": "extraction", "ocr_result": {"text": "a\nb"}, "llm_output": '{"name": "ACME"}'
+    }
+
+
+def test_sqlite_running_job_is_not_taken_while_leased(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    owner, other = SQLiteJobQueue(path, lease_seconds=30), SQLiteJobQueue(path, lease_seconds=30)
+    job = new_job(b"content", ".pdf", False)
+    owner.put(job)
+    assert owner.claim(timeout=0)["job_id"] == job["job_id"]
+    # A second process starting up must not requeue a job whose owner is alive
+    SQLiteJobQueue(path, lease_seconds=30)
+    assert other.claim(timeout=0) is None
+    assert other.get(job["job_id"])["status"] == "running"
+
+
+def test_sqlite_expired_lease_is_claimed_again(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    crashed, survivor = SQLiteJobQueue(path, lease_seconds=0.2), SQLiteJobQueue(path, lease_seconds=0.2)
+    job = new_job(b"content", ".pdf", False)
+    crashed.put(job)
+    crashed.claim(timeout=0)
+    # Simulate a crash: the heartbeat no longer renews the job's lease
+    crashed.owner = "stopped renewing"
+    time.sleep(0.3)
+    reclaimed = survivor.claim(timeout=0)
+    assert reclaimed["job_id"] == job["job_id"]
+    assert reclaimed["file_content"] == b"content"
+
+    # The previous owner can no longer finish the job
+    crashed.finish(job["job_id"], "failed", message="late")
+    assert survivor.get(job["job_id"])["status"] == "running"
+    survivor.finish(job["job_id"], "succeeded", {"ok": True})
+    assert survivor.get(job["job_id"])["status"] == "succeeded"
@@ -0,0 +1,98 @@
+"""
+Tests for the array-backed page geometry and its storage in the session result store
+"""
+
+import json
+from types import SimpleNamespace
+import numpy as np
+from page_geometry import PageGeometry, page_words, page_line_confidences
+from session_results import pack_result, unpack_result
+
+
+def _spans(offset, length):
+    return [SimpleNamespace(offset=offset, length=length)]
+
+
+def _azure_page():
+    lines = [
+        SimpleNamespace(polygon=[0, 0, 10, 0, 10, 5, 0, 5], spans=_spans(0, 9)),
+        # Azure returns more than four points for curved or rotated text
+        SimpleNamespace(polygon=[0, 10, 4, 10, 8, 12, 8, 15, 4, 16, 0, 15], spans=_spans(10, 3)),
+        SimpleNamespace(polygon=None, spans=_spans(14, 2))
+    ]
+    words = [
+        SimpleNamespace(content="ACME", polygon=[0, 0, 4, 0, 4, 4, 0, 4], confidence=0.9, spans=_spans(0, 4)),
+        SimpleNamespace(content="LLC", polygon=[6, 0, 10, 0, 10, 4, 6, 4], confidence=0.7, spans=_spans(5, 4)),
+        SimpleNamespace(content="No", polygon=None, confidence=0.5, spans=_spans(10, 3)),
+        SimpleNamespace(content="12", polygon=[0, 10, 4, 10, 8, 12, 8, 15, 4, 16, 0, 15], confidence=None,
+                        spans=_spans(14, 2))
+    ]
+    return SimpleNamespace(lines=lines, words=words)
+
+
+def test_polygons_keep_every_point():
+    geometry = PageGeometry.from_page(_azure_page())
+    assert geometry.to_dict()["line_polygons"][1] == [0, 10, 4, 10, 8, 12, 8, 15, 4, 16, 0, 15]
+    assert geometry.line_bounding_boxes()[2] == "N/A"
+
+
+def test_dict_round_trip_through_json():
+    geometry = PageGeometry.from_page(_azure_page())
+    data = json.loads(json.dumps(geometry.to_dict()))
+    assert PageGeometry.from_dict(data).to_dict() == data
+
+
+def test_from_dict_reads_padded_polygons_of_older_entries():
+    data = {
+        "line_polygons": [[0, 0, 1, 0, 1, 1, 0, 1], [None] * 8],
+        "line_spans": [[0, 1], [2, 1]],
+        "word_polygons": [],
+        "word_confidences": [],
+        "word_spans": []
+    }
+    geometry = PageGeometry.from_dict(data)
+    assert geometry.to_dict()["line_polygons"] == [[0, 0, 1, 0, 1, 1, 0, 1], []]
+    assert geometry.word_contents is None
+
+
+def test_scaled_and_shifted():
+    geometry = PageGeometry.from_page(_azure_page())
+    scaled = geometry.scaled(2, 3)
+    assert scaled.to_dict()["word_polygons"][1] == [12, 0, 20, 0, 20, 12, 12, 12]
+    shifted = geometry.shifted(100)
+    assert shifted.word_spans[:, 0].tolist() == [100, 105, 110, 114]
+    assert shifted.word_contents == ["ACME", "LLC", "No", "12"]
+
+
+def test_words_in_region_uses_polygon_centres():
+    geometry = PageGeometry.from_page(_azure_page())
+    np.testing.assert_allclose(geometry.word_centres()[3], [4, 13])
+    assert np.isnan(geometry.word_centres()[2]).all()
+    assert geometry.words_in_region(0, 0, 5, 5).tolist() == [0]
+    assert geometry.words_in_region(0, 0, 10, 20).tolist() == [0, 1, 3]
+    assert geometry.words_in_region(20, 20, 30, 30).tolist() == []
+
+
+def test_page_words_are_built_from_geometry():
+    page = {"page_number": 1, "lines": [], "geometry": PageGeometry.from_page(_azure_page())}
+    assert page_words(page) == [
+        {"content": "ACME", "confidence": 0.9}, {"content": "LLC", "confidence": 0.7},
+        {"content": "No", "confidence": 0.5}, {"content": "12", "confidence": 0.0}
+    ]
+    # Pages cached with a words list keep it
+    assert page_words({"words": [{"content": "x", "confidence": 1.0}]}) == [{"content": "x", "confidence": 1.0}]
+
+
+def test_line_confidences_follow_word_spans():
+    page = {"lines": [{"content": "ACME LLC"}, {"content": "No"}, {"content": "12"}],
+            "geometry": PageGeometry.from_page(_azure_page())}
+    np.testing.assert_allclose(page_line_confidences(page), [0.8, 0.5, 0.0])
+
+
+def test_session_store_round_trip():
+    geometry = PageGeometry.from_page(_azure_page())
+    result = {"status": "success", "pages": [{"page_number": 1, "lines": [{"content": "ACME LLC"}], "geometry": geometry}]}
+    page = unpack_result(pack_result(result))["pages"][0]
+    assert "words" not in page
+    assert page["geometry"].to_dict() == geometry.to_dict()
+    assert page["lines"] == [{"content": "ACME LLC"}]
@@ -0,0 +1,131 @@
+"""
+Tests for PDF page-range splitting, page fingerprints and merging of per-range results
+"""
+
+import io
+from PyPDF2 import PdfReader, PdfWriter
+from page_geometry import PageGeometry
+from pdf_splitter import (
+    count_pdf_pages,
+    split_pdf,
+    extract_pages,
+    page_fingerprints,
+    shift_page,
+    split_pages,
+    merge_results
+)
+
+
+def _pdf(*widths):
+    writer = PdfWriter()
+    for width in widths:
+        writer.add_blank_page(width=width, height=100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _page_widths(file_content):
+    return [float(page.mediabox.width) for page in PdfReader(io.BytesIO(file_content)).pages]
+
+
+def _geometry(offset, length):
+    return PageGeometry.from_dict({
+        "line_polygons": [[0, 0, 1, 0, 1, 1, 0, 1]],
+        "line_spans": [[offset, length]],
+        "word_polygons": [[0, 0, 1, 0, 1, 1, 0, 1]],
+        "word_confidences": [0.9],
+        "word_spans": [[offset, length]]
+    })
+
+
+def _result(*page_texts, styles=(), barcodes=()):
+    """A normalized result whose pages hold one line each, separated by a newline like Azure's content"""
+    pages, offset = [], 0
+    for number, text in enumerate(page_texts, 1):
+        pages.append({
+            "page_number": number,
+            "spans": [{"offset": offset, "length": len(text)}],
+            "lines": [{"content": text}],
+            "geometry": _geometry(offset, len(text))
+        })
+        offset += len(text) + 1
+    return {
+        "full_content": "\n".join(page_texts),
+        "pages": pages,
+        "styles": list(styles),
+        "barcodes": list(barcodes),
+        "key_value_pairs": []
+    }
+
+
+def test_count_and_split():
+    content = _pdf(100, 200, 300, 400, 500)
+    assert count_pdf_pages(content) == 5
+    assert count_pdf_pages(b"not a pdf") is None
+
+    chunks = split_pdf(content, 2)
+    assert [first_page for first_page, _ in chunks] == [1, 3, 5]
+    assert [_page_widths(chunk) for _, chunk in chunks] == [[100, 200], [300, 400], [500]]
+
+
+def test_extract_pages_keeps_the_given_order():
+    content = _pdf(100, 200, 300)
+    assert _page_widths(extract_pages(content, [3, 1])) == [300, 100]
+
+
+def test_fingerprints_ignore_page_position():
+    original = page_fingerprints(_pdf(100, 200, 300))
+    revised = page_fingerprints(_pdf(100, 250, 300))
+    assert original[0] == revised[0] and original[2] == revised[2]
+    assert original[1] != revised[1]
+    assert page_fingerprints(b"not a pdf") is None
+
+
+def test_shift_page_moves_spans_and_geometry():
+    page = _result("abc")["pages"][0]
+    shifted = shift_page(page, 4, 10)
+    assert shifted["page_number"] == 4
+    assert shifted["spans"] == [{"offset": 10, "length": 3}]
+    assert shifted["geometry"].to_dict()["line_spans"] == [[10, 3]]
+    # The original is left untouched
+    assert page["page_number"] == 1 and page["spans"] == [{"offset": 0, "length": 3}]
+
+
+def test_merge_shifts_page_numbers_and_offsets():
+    merged = merge_results(
+        [
+            (1, _result("first", "second", styles=[{"is_handwritten": True, "page_number": 2}])),
+            (3, _result("third", barcodes=[{"type": "QRCode", "value": "x", "page_number": 1}]))
+        ],
+        ".pdf"
+    )
+    assert merged["full_content"] == "first\nsecond\nthird"
+    assert [page["page_number"] for page in merged["pages"]] == [1, 2, 3]
+    for page, text in zip(merged["pages"], ["first", "second", "third"]):
+        span = page["spans"][0]
+        assert merged["full_content"][span["offset"]:span["offset"] + span["length"]] == text
+        assert page["geometry"].to_dict()["line_spans"] == [[span["offset"], span["length"]]]
+    assert merged["styles"] == [{"is_handwritten": True, "page_number": 2}]
+    assert merged["barcodes"][0]["page_number"] == 3
+    assert merged["document_type"] == ".PDF"
+    assert "--- Page 3 ---\nthird\n" in merged["text"]
+
+
+def test_split_then_merge_round_trip():
+    result = _result("first", "second", "third", styles=[{"is_handwritten": False, "page_number": 3}])
+    parts = split_pages(result)
+    assert [part["full_content"] for part in parts] == ["first", "second", "third"]
+    assert all(part["pages"][0]["page_number"] == 1 for part in parts)
+    assert parts[1]["pages"][0]["spans"] == [{"offset": 0, "length": 6}]
+    assert parts[2]["styles"] == [{"is_handwritten": False, "page_number": 1}]
+
+    merged = merge_results([(number, part) for number, part in enumerate(parts, 1)], ".pdf")
+    assert merged["full_content"] == result["full_content"]
+    assert [page["spans"] for page in merged["pages"]] == [page["spans"] for page in result["pages"]]
+    assert merged["styles"] == result["styles"]
+
+
+def test_split_needs_every_item_on_a_page():
+    result = _result("first", "second", barcodes=[{"type": "QRCode", "value": "x", "page_number": None}])
+    assert split_pages(result) is None
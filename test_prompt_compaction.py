@@ -0,0 +1,60 @@
+"""
+Tests for compacting OCR pages before they are sent to the LLM
+"""
+
+from prompt_compaction import compact_line, compact_pages, count_tokens
+
+
+def _page(number, *lines):
+    return {"page_number": number, "lines": [{"content": line} for line in lines]}
+
+
+def test_compact_line_drops_arabic_and_collapses_whitespace():
+    assert compact_line("Trade  Name:\tالاسم التجاري  ACME LLC ") == "Trade Name: ACME LLC"
+    assert compact_line("شركة") == ""
+
+
+def test_empty_lines_and_page_separators_are_dropped():
+    pages = compact_pages({"pages": [_page(1, "Licence No: 1", "   ", "--- Page 1 ---", "<!-- PageBreak -->", "End")]})
+    assert [line["content"] for line in pages[0]["lines"]] == ["Licence No: 1", "End"]
+    assert pages[0]["line_confidences"] == [None, None]
+
+
+def test_repeated_header_is_kept_once():
+    pages = compact_pages({"pages": [
+        _page(1, "DUBAI ECONOMY", "Licence No: 1"),
+        _page(2, "DUBAI ECONOMY", "Activities"),
+        _page(3, "DUBAI ECONOMY", "Partners")
+    ]})
+    assert [[line["content"] for line in page["lines"]] for page in pages] == [
+        ["DUBAI ECONOMY", "Licence No: 1"], ["Activities"], ["Partners"]
+    ]
+
+
+def test_line_on_too_few_pages_is_not_a_header():
+    pages = compact_pages({"pages": [
+        _page(1, "Same", "a"), _page(2, "Same", "b"), _page(3, "c"), _page(4, "d"), _page(5, "e")
+    ]})
+    assert [line["content"] for line in pages[1]["lines"]] == ["Same", "b"]
+
+
+def test_full_content_fallback_without_pages():
+    pages = compact_pages({"full_content": "Licence No: 1\n\nCompany: ACME"})
+    assert pages == [{
+        "page_number": 1,
+        "lines": [{"content": "Licence No: 1"}, {"content": "Company: ACME"}],
+        "line_confidences": [None, None]
+    }]
+
+
+def test_confidences_follow_the_kept_lines():
+    page = _page(1, "", "Licence No: 1", "--- Page 1 ---", "Company: ACME")
+    page["line_confidences"] = [0.25, 0.5, None, 0.75]
+    pages = compact_pages({"pages": [page]})
+    assert [line["content"] for line in pages[0]["lines"]] == ["Licence No: 1", "Company: ACME"]
+    assert pages[0]["line_confidences"] == [0.5, 0.75]
+
+
+def test_count_tokens_grows_with_text():
+    assert count_tokens("") >= 0
+    assert count_tokens("Licence number 123456 " * 20) > count_tokens("Licence number 123456")
@@ -0,0 +1,89 @@
+"""
+Tests for the SQLite store of processed documents
+"""
+
+import pytest
+from result_store import ResultStore, document_key, flatten_fields, normalize_value
+
+
+def _ocr_result(*page_texts, key_value_pairs=(), barcodes=()):
+    return {
+        "full_content": "\n".join(page_texts),
+        "document_type": ".PDF",
+        "pages": [
+            {"page_number": number, "lines": [{"content": line} for line in text.splitlines()]}
+            for number, text in enumerate(page_texts, 1)
+        ],
+        "key_value_pairs": list(key_value_pairs),
+        "barcodes": list(barcodes)
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results.db"))
+
+
+def test_flatten_and_normalize():
+    assert list(flatten_fields({"company": {"name": "ACME"}, "partners": [{"name": "A"}, {"name": "B"}],
+                                "empty": " ", "missing": None})) == [
+        ("company.name", "ACME"), ("partners.name", "A"), ("partners.name", "B")
+    ]
+    assert normalize_value("  ACME   Trading\nLLC ") == "acme trading llc"
+
+
+def test_save_and_get(store):
+    document_id = store.save(document_key(b"doc"), "licence.pdf", _ocr_result("page one", "page two"),
+                             extraction={"license_number": "123"}, extraction_source="llm")
+    stored = store.get(document_id)
+    assert stored["source"] == "licence.pdf"
+    assert stored["page_count"] == 2
+    assert stored["extraction"] == {"license_number": "123"}
+    assert stored["extraction_source"] == "llm"
+    assert store.get(document_id + 1) is None
+    assert store.stats() == {"documents": 1, "pages": 2}
+
+
+def test_find_by_field(store):
+    document_id = store.save(
+        "a", "a.pdf",
+        _ocr_result("text", key_value_pairs=[{"key": "Licence No", "value": "2202163.01"}],
+                    barcodes=[{"type": "QRCode", "value": "https://example.com/x", "page_number": 1}]),
+        extraction={"company": {"name": "ACME  Trading"}}
+    )
+    assert [hit["origin"] for hit in store.find_by_field("2202163.01")] == ["ocr"]
+    hits = store.find_by_field("acme trading", field="name")
+    assert [(hit["document_id"], hit["field"]) for hit in hits] == [(document_id, "company.name")]
+    assert store.find_by_field("acme trading", field="other") == []
+    assert [hit["origin"] for hit in store.find_by_field("https://example.com/x")] == ["barcode"]
+
+
+def test_search_matches_identifiers_as_phrases(store):
+    store.save("a", "a.pdf", _ocr_result("cover", "Licence No 2202163.01\nACME Trading"))
+    store.save("b", "b.pdf", _ocr_result("Licence No 99"))
+    hits = store.search("2202163.01")
+    assert [(hit["source"], hit["page_number"]) for hit in hits] == [("a.pdf", 2)]
+    assert "**2202163.01**" in hits[0]["snippet"]
+    assert {hit["source"] for hit in store.search("licence")} == {"a.pdf", "b.pdf"}
+    assert store.search("   ") == []
+
+
+def test_saving_a_key_again_replaces_it(store):
+    store.save("a", "old.pdf", _ocr_result("old text", key_value_pairs=[{"key": "Name", "value": "Old"}]))
+    store.save("a", "new.pdf", _ocr_result("new text"))
+    assert store.stats() == {"documents": 1, "pages": 1}
+    assert store.search("old") == []
+    assert store.find_by_field("Old") == []
+
+
+def test_save_many_is_one_transaction(store):
+    documents = [
+        {"key": "a", "source": "a.pdf", "ocr_result": _ocr_result("one")},
+        {"key": "b", "source": "b.pdf", "ocr_result": None}
+    ]
+    with pytest.raises(AttributeError):
+        store.save_many(documents)
+    assert store.stats()["documents"] == 0
+
+    assert store.save_many(documents[:1]) == 1
+    assert store.stats()["documents"] == 1
@@ -0,0 +1,76 @@
+"""
+Tests for rule-based field extraction
+"""
+
+from rule_extractor import extract_with_rules, detect_document_type
+
+
+def _ocr_result(*lines):
+    return {
+        "full_content": "\n".join(lines),
+        "pages": [{"page_number": 1, "lines": [{"content": line} for line in lines]}]
+    }
+
+
+def test_detect_document_type():
+    assert detect_document_type("DUBAI ECONOMY\nTRADE LICENCE\n...") == "trade_license"
+    assert detect_document_type("Commercial License issued by ...") == "trade_license"
+    assert detect_document_type("License Number: 123") == "trade_license"
+    assert detect_document_type("Invoice #42\nTotal due") is None
+
+
+def test_fields_on_separate_lines():
+    result = extract_with_rules(_ocr_result(
+        "TRADE LICENCE",
+        "Licence No: 123456",
+        "Company Name: ACME Trading LLC",
+        "Issue Date: 01/02/2023",
+        "Expiry Date: 31/01/2024"
+    ), min_confidence=0.8)
+    assert result["document_type"] == "trade_license"
+    assert result["data"] == {
+        "license_number": "123456",
+        "company_name": "ACME Trading LLC",
+        "issue_date": "01/02/2023",
+        "expiry_date": "31/01/2024"
+    }
+    assert result["uncertain"] == []
+
+
+def test_value_stops_at_next_label_on_same_line():
+    result = extract_with_rules(_ocr_result(
+        "Company Name: ACME LLC License No 123 Issue Date: 01/02/2023"
+    ), min_confidence=0.8)
+    assert result["data"]["company_name"] == "ACME LLC"
+    assert result["data"]["license_number"] == "123"
+    assert result["data"]["issue_date"] == "01/02/2023"
+
+
+def test_value_on_next_line():
+    result = extract_with_rules(_ocr_result("Trade Name", "Gulf Star Foodstuff L.L.C."), min_confidence=0.8)
+    assert result["data"]["company_name"] == "Gulf Star Foodstuff L.L.C."
+    # Values from the next line are less certain than "Label: value"
+    assert result["confidence"]["company_name"] < 0.9
+
+
+def test_title_and_dates_are_not_licence_numbers():
+    result = extract_with_rules(_ocr_result("Trade Licence", "12/05/2023"), min_confidence=0.8)
+    assert "license_number" not in result["data"]
+    assert "license_number" in result["uncertain"]
+
+
+def test_key_value_pairs_are_used():
+    result = extract_with_rules({
+        "full_content": "",
+        "pages": [],
+        "key_value_pairs": [{"key": "Licence Number", "value": "CN-1234567", "confidence": 0.97}]
+    }, min_confidence=0.8)
+    assert result["data"] == {"license_number": "CN-1234567"}
+    assert result["confidence"]["license_number"] == 0.97
+
+
+def test_conflicting_values_are_uncertain():
+    result = extract_with_rules(_ocr_result(
+        "Trade Licence", "Licence No: 111111", "License Number: 222222"
+    ), min_confidence=0.8)
+    assert "license_number" in result["uncertain"]
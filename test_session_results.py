@@ -0,0 +1,64 @@
+"""
+Tests for the per-session result store and its spilling to disk
+"""
+
+import os
+import pytest
+from session_results import SessionResultStore, pack_result, unpack_result
+
+
+def _result(text):
+    return {"status": "success", "full_content": text, "raw_result": object(), "pages": []}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionResultStore(budget_bytes=10 ** 6, spill_dir=str(tmp_path), ttl_seconds=3600)
+
+
+def test_pack_drops_the_sdk_object():
+    assert unpack_result(pack_result(_result("text"))) == {"status": "success", "full_content": "text", "pages": []}
+    assert unpack_result(pack_result({"status": "success", "result": "{}"})) == {"status": "success", "result": "{}"}
+
+
+def test_put_get_and_replace(store):
+    store.put("s1", "ocr_result", _result("first"))
+    store.put("s1", "ocr_result", _result("second"))
+    store.put("s2", "ocr_result", _result("other"))
+    assert store.get("s1", "ocr_result")["full_content"] == "second"
+    assert store.get("s1", "crew_result") is None
+    assert store.stats()["entries"] == 2
+
+    store.put("s1", "ocr_result", None)
+    assert store.get("s1", "ocr_result") is None
+    assert store.usage("s1")["entries"] == 0
+
+
+def test_spills_least_recently_used_over_budget(store):
+    # Random hex only compresses to about half, so each blob is about 3500 bytes and two fit the budget
+    texts = [os.urandom(3000).hex() for _ in range(3)]
+    store.budget_bytes = 9000
+    for number, text in enumerate(texts):
+        store.put(f"s{number}", "ocr_result", _result(text))
+
+    assert store.usage("s0")["disk_bytes"] > 0 and store.usage("s0")["memory_bytes"] == 0
+    assert store.usage("s2")["disk_bytes"] == 0
+    assert store.stats()["memory_bytes"] <= store.budget_bytes
+    assert len(os.listdir(store.spill_dir)) == store.stats()["spills"]
+
+    # Reading a spilled result brings it back and spills another one instead
+    assert store.get("s0", "ocr_result")["full_content"] == texts[0]
+    assert store.usage("s0")["memory_bytes"] > 0
+    assert store.usage("s1")["disk_bytes"] > 0
+
+
+def test_spill_dir_is_private(store):
+    assert os.stat(store.spill_dir).st_mode & 0o777 == 0o700
+
+
+def test_idle_sessions_expire(store):
+    store.put("idle", "ocr_result", _result("old"))
+    store._entries[("idle", "ocr_result")]["accessed_at"] -= store.ttl_seconds + 1
+    store.put("active", "ocr_result", _result("new"))
+    assert store.get("idle", "ocr_result") is None
+    assert store.get("active", "ocr_result")["full_content"] == "new"